@@ -3,19 +3,28 @@ from dotenv import load_dotenv
 load_dotenv()
 import eventlet
 eventlet.monkey_patch()
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
 from bson.objectid import ObjectId
-from netmiko import ConnectHandler
 import datetime as dt  # ✅ ใช้ dt เพื่อป้องกัน Error 500
-import certifi
 import concurrent.futures 
 import traceback 
 from flask import send_file # ✅ สำหรับส่งไฟล์ดาวน์โหลด
 from converter import ConfigConverter # ✅ Import Class ใหม่
+from conversion_cache import ConversionCache
+from config_model import model_to_doc, model_from_doc, port_state_summary
+from lazy_db import LazyDatabase
+from ssh_pool import SSHPool
+from device_scheduler import DeviceScheduler
+from jobs import JobManager
+from backup_store import BackupStore
+from bulk_writer import BufferedWriter
+import batch_convert
+import ssh_async
+import time
 import io
-from flask_socketio import SocketIO, emit 
+import atexit
+from flask_socketio import SocketIO, emit, join_room
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 
@@ -39,16 +48,72 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 MONGO_URI = env.get_env_variable('PYTHON_MONGODB_URI')
 
 
-users_col = None
-db = None
-
-try:
-    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
-    db = client['net_automation']
-    users_col = db['users'] 
-    print("✅ Connected to MongoDB Atlas")
-except Exception as e:
-    print(f"❌ MongoDB Connection Error: {e}")
+# ✅ Lazy: ยังไม่ต่อ Mongo ตอน import (ต่อเมื่อใช้งาน collection ครั้งแรก)
+db = LazyDatabase(MONGO_URI, 'net_automation')
+users_col = db['users'] 
+
+# --- CONVERSION CACHE ---
+# LRU ใน memory (จำกัดเป็น MB) + เก็บลง Mongo พร้อม TTL เพื่อให้อยู่รอดหลัง restart
+conversion_cache = ConversionCache(
+    max_bytes=int(os.getenv('CONVERT_CACHE_MAX_MB', '64')) * 1024 * 1024,
+    collection=db['conversion_cache'] if os.getenv('CONVERT_CACHE_PERSIST', '1') == '1' else None,
+    ttl_seconds=int(os.getenv('CONVERT_CACHE_TTL_HOURS', '168')) * 3600
+)
+
+# --- PARSED MODEL STORE ---
+# Parse ครั้งเดียว -> คืน handle ให้ Convert / Export / Target อื่นๆ render จาก model เดิม
+model_store = ConversionCache(
+    max_bytes=int(os.getenv('MODEL_STORE_MAX_MB', '128')) * 1024 * 1024,
+    collection=db['parsed_models'] if os.getenv('MODEL_STORE_PERSIST', '1') == '1' else None,
+    ttl_seconds=int(os.getenv('MODEL_STORE_TTL_HOURS', '24')) * 3600,
+    dump=model_to_doc,
+    load=model_from_doc
+)
+
+# --- SSH SESSION POOL ---
+# ใช้ session เดิมซ้ำสำหรับคำสั่งถัดไปบนอุปกรณ์เดียวกัน (ไม่ต้อง handshake/auth ใหม่ทุกครั้ง)
+def _open_ssh(driver):
+    # ✅ Lazy import: netmiko/paramiko โหลดเฉพาะตอนต่อ SSH จริง
+    from netmiko import ConnectHandler
+    return ConnectHandler(**driver)
+
+ssh_pool = SSHPool(
+    connect=_open_ssh,
+    idle_timeout=int(os.getenv('SSH_POOL_IDLE_TIMEOUT', '300')),
+    keepalive=int(os.getenv('SSH_POOL_KEEPALIVE', '30')),
+    max_per_device=int(os.getenv('SSH_POOL_MAX_PER_DEVICE', '2')),
+    max_total=int(os.getenv('SSH_POOL_MAX_TOTAL', '100'))
+)
+atexit.register(ssh_pool.close_all)   # logout จากอุปกรณ์ให้เรียบร้อยตอนปิด server
+
+# --- DEVICE OPERATION SCHEDULER ---
+# คิวกลางของงานต่ออุปกรณ์ทุก endpoint: จำกัดรวมทั้ง server + โควต้าต่อผู้ใช้/profile + round-robin ระหว่างผู้ใช้
+scheduler = DeviceScheduler(
+    max_concurrent=int(os.getenv('DEVICE_SCHED_MAX_CONCURRENT', '40')),
+    per_user=int(os.getenv('DEVICE_SCHED_PER_USER', '20')),
+    per_profile=int(os.getenv('DEVICE_SCHED_PER_PROFILE', '20'))
+)
+
+# --- BACKUP STORE ---
+# config เก็บเป็น blob บีบอัดตาม hash (db.backup_blobs) -> config ที่ไม่เปลี่ยนไม่ถูกเก็บซ้ำ
+# history ต่ออุปกรณ์: snapshot เต็มทุก BACKUP_SNAPSHOT_INTERVAL version ระหว่างนั้นเก็บแค่บรรทัดที่เปลี่ยน
+backup_store = BackupStore(db, snapshot_interval=int(os.getenv('BACKUP_SNAPSHOT_INTERVAL', '30')))
+
+# ผล backup จาก worker เข้าคิว -> เขียนลง Mongo เป็นก้อน (ไม่ต้องรอ DB ในแต่ละ task)
+backup_writer = BufferedWriter(
+    backup_store.insert_many,
+    batch_size=int(os.getenv('BACKUP_WRITE_BATCH', '200')),
+    flush_interval=float(os.getenv('BACKUP_WRITE_INTERVAL', '1.0')),
+    max_queue=int(os.getenv('BACKUP_WRITE_QUEUE', '2000')),
+    retries=int(os.getenv('BACKUP_WRITE_RETRIES', '3')),
+    name='backup-writer'
+)
+atexit.register(backup_writer.close)   # เขียนของที่ค้างในคิวให้หมดก่อนปิด server
+
+# --- BACKGROUND JOBS ---
+# งาน bulk (backup/command/push) คืน job_id ทันที -> progress ทาง socketio room + poll ที่ /api/jobs/<id>
+job_manager = JobManager(db, socketio, ttl_days=int(os.getenv('JOB_TTL_DAYS', '30')),
+                         heartbeat=int(os.getenv('JOB_HEARTBEAT_SECONDS', '15')))
 
 # api to save logs
 
@@ -69,30 +134,26 @@ def handle_realtime_backup(data):
         emit('backup_update', {'status': 'running', 'msg': f'Connecting to {device["hostname"]}...', 'percent': 10})
         eventlet.sleep(0) # Yield ให้ Socket ทำงาน
         
-        driver = get_device_driver(device)
-        net_connect = ConnectHandler(**driver)
-        
-        # [Step 2] Login สำเร็จ (40%)
-        emit('backup_update', {'status': 'running', 'msg': 'Logged in! Fetching config...', 'percent': 40})
-        eventlet.sleep(0)
-
-        # [Step 3] ส่งคำสั่ง (70%)
-        cmd = get_backup_command(device['device_type'])
-        output = net_connect.send_command(cmd, read_timeout=60)
-        net_connect.disconnect()
+        with device_session(device) as net_connect:
+            # [Step 2] Login สำเร็จ (40%)
+            emit('backup_update', {'status': 'running', 'msg': 'Logged in! Fetching config...', 'percent': 40})
+            eventlet.sleep(0)
+
+            # [Step 3] ส่งคำสั่ง (70%)
+            cmd = get_backup_command(device['device_type'])
+            output = net_connect.send_command(cmd, read_timeout=60)
         
         emit('backup_update', {'status': 'running', 'msg': 'Saving to database...', 'percent': 80})
         eventlet.sleep(0)
 
-        # [Step 4] บันทึกลง DB
-        db.backups.insert_one({
+        # [Step 4] บันทึกลง DB (config เดิม = ไม่เก็บเนื้อซ้ำ)
+        backup_store.insert({
             'device_id': str(device['_id']),
             'hostname': device['hostname'],
             'owner': username,
-            'config_data': output,
             'timestamp': dt.datetime.now(),
             'status': 'Success'
-        })
+        }, config=output)
 
         # [Step 5] เสร็จสิ้น (100%)
         emit('backup_update', {'status': 'success', 'msg': 'Backup Complete!', 'percent': 100, 'output': output})
@@ -117,90 +178,349 @@ def handle_realtime_backup(data):
 
 
 
+# ✅ Helper: อ่าน input ของการแปลง (รองรับทั้ง Excel Upload และ Text JSON)
+def _read_convert_request():
+    # CASE 1: Excel Upload
+    if request.content_type and 'multipart/form-data' in request.content_type:
+        form = request.form
+        content = request.files['file'].read() if 'file' in request.files else None # bytes
+    # CASE 2: Text JSON
+    else:
+        form = request.json or {}
+        content = form.get('log_content') # string
+    return form.get('source_type'), form.get('target_type'), content, form.get('handle')
+
+
+# ✅ Helper: client ขอแบบ streaming ไหม (?stream=1 หรือ field 'stream' ใน JSON / form)
+def _stream_requested():
+    flag = request.args.get('stream')
+    if flag is None:
+        if request.content_type and 'multipart/form-data' in request.content_type:
+            flag = request.form.get('stream')
+        else:
+            flag = (request.get_json(silent=True) or {}).get('stream')
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+# ✅ Helper: query param ที่เป็นตัวเลข -> (ค่า, None) หรือ (None, ข้อความ error) ให้ route ตอบ 400 แทน 500
+def _int_arg(name, default, low=0):
+    raw = request.args.get(name)
+    if raw is None:
+        return default, None
+    try:
+        value = int(raw)
+    except ValueError:
+        return None, f'{name} must be an integer'
+    if value < low:
+        return None, f'{name} must be >= {low}'
+    return value, None
+
+
+# ✅ Helper: Parse ครั้งเดียวแล้วเก็บ model ไว้ใน model_store -> คืน (handle, data, error)
+def _parse_to_handle(source_type, content):
+    handle = ConversionCache.make_key(source_type, 'model', content)
+    data = model_store.get(handle)
+    if data is not None:
+        return handle, data, None
+
+    converter = ConfigConverter(source_type, None, content)
+    error = converter.parse()
+    if error:
+        return None, None, error
+
+    # Parse ไม่จบเพราะเกิน CPU budget -> ไม่เก็บลง store (ลองใหม่ทีหลังจะได้ parse ใหม่) และไม่มี handle
+    if converter.partial:
+        return None, converter.data, None
+
+    # ขนาดของ input ใช้เป็นตัวประมาณขนาด model ใน memory
+    model_store.put(handle, converter.data, size=len(content))
+    return handle, converter.data, None
+
+
+# ✅ Helper: ข้อมูลประกอบผล parse ที่ส่งกลับทุก API (partial / diagnostics / สถานะพอร์ต)
+def _model_report(data):
+    diagnostics = data.get('diagnostics', [])
+    return {
+        'partial': any(d['code'] == 'parse_budget' for d in diagnostics),
+        'diagnostics': diagnostics,
+        # สถานะพอร์ตจาก display interface brief ใน log เดียวกัน (down = ไม่ shutdown แต่ไม่มีอะไรต่อ)
+        'port_status': port_state_summary(data)
+    }
+
+
+# ✅ Helper: หา model จาก handle หรือ parse จาก content (ถ้าไม่มี handle)
+def _resolve_model(source_type, content, handle):
+    if handle:
+        data = model_store.get(handle)
+        if data is not None:
+            return handle, data, None
+        if not content:
+            return None, None, 'Handle not found or expired'
+    if not source_type or not content:
+        return None, None, 'Missing parameters'
+    return _parse_to_handle(source_type, content)
+
+
+# ✅ API: Parse Config -> คืน handle ให้ Convert / Export ใช้ต่อโดยไม่ต้อง Parse ซ้ำ
+@app.route('/api/parse_config', methods=['POST'])
+def parse_config_api():
+    current_user = request.headers.get('X-Username')
+    if not current_user: return jsonify({'msg': 'Unauthorized'}), 401
+
+    source_type, _, log_content, _ = _read_convert_request()
+    if not source_type or not log_content:
+        return jsonify({'status': 'error', 'msg': 'Missing parameters'}), 400
+
+    try:
+        handle, data, error = _parse_to_handle(source_type, log_content)
+        if error:
+            return jsonify({'status': 'error', 'msg': error}), 400
+
+        return jsonify({
+            'status': 'success',
+            'handle': handle,
+            'summary': {
+                'hostname': data['hostname'],
+                'vlans': len(data['vlans']),
+                'interfaces': len(data['interfaces']),
+                'routes': len(data['routes'])
+            },
+            **_model_report(data)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'status': 'error', 'msg': str(e)}), 500
+
+
 # ✅ API: Convert Config
 @app.route('/api/convert_config', methods=['POST'])
 def convert_config_api():
     current_user = request.headers.get('X-Username')
     if not current_user: return jsonify({'msg': 'Unauthorized'}), 401
 
-    source_type = None
-    target_type = None
-    log_content = None
+    source_type, target_type, log_content, handle = _read_convert_request()
 
-    # CASE 1: Excel Upload
-    if request.content_type and 'multipart/form-data' in request.content_type:
-        source_type = request.form.get('source_type')
-        target_type = request.form.get('target_type')
-        if 'file' not in request.files: return jsonify({'msg': 'No file'}), 400
-        log_content = request.files['file'].read() # bytes
-
-    # CASE 2: Text JSON
-    else:
-        data = request.json
-        source_type = data.get('source_type')
-        target_type = data.get('target_type')
-        log_content = data.get('log_content') # string
-
-    if not source_type or not target_type or not log_content:
+    if not target_type or not (handle or (source_type and log_content)):
         return jsonify({'status': 'error', 'msg': 'Missing parameters'}), 400
 
     try:
-        # ✅ เรียกใช้ Class (ตอนนี้ __init__ รับ 3 ค่าแล้ว ถูกต้อง)
-        converter = ConfigConverter(source_type, target_type, log_content)
-        result_config = converter.process()
+        # ✅ Parse ครั้งเดียว (หรือดึง model เดิมจาก handle)
+        handle, data, error = _resolve_model(source_type, log_content, handle)
+        if error == 'Handle not found or expired':
+            return jsonify({'status': 'error', 'msg': error}), 404
+        if error:
+            return jsonify({'status': 'success', 'output': error})
+
+        # ✅ เช็ค Cache ของผลลัพธ์ (key = handle + target) -- ผล partial ไม่มี handle จึงไม่ Cache
+        cache_key = ConversionCache.make_key('handle', target_type, handle) if handle else None
+        cached = conversion_cache.get(cache_key) if cache_key else None
+        report = _model_report(data)
+
+        # ✅ Streaming mode: ส่ง config เป็น text/plain ทีละ chunk ระหว่าง generate (ไม่ห่อ JSON)
+        if _stream_requested():
+            headers = {'X-Model-Handle': handle or '', 'X-Cache': 'HIT' if cached is not None else 'MISS',
+                       'X-Parse-Partial': '1' if report['partial'] else '0'}
+            if cached is not None:
+                return Response(cached, mimetype='text/plain', headers=headers)
+            converter = ConfigConverter.from_model(data, target_type, source_type)
+            return Response(stream_with_context(_stream_and_cache(converter, cache_key)),
+                            mimetype='text/plain', headers=headers)
+
+        if cached is not None:
+            return jsonify({'status': 'success', 'output': cached, 'handle': handle, 'cached': True, **report})
+
+        result_config = ConfigConverter.from_model(data, target_type, source_type).render()
+
+        # ไม่ Cache ผลที่เป็น Error
+        if cache_key and not result_config.startswith("Error"):
+            conversion_cache.put(cache_key, result_config)
+
+        return jsonify({'status': 'success', 'output': result_config, 'handle': handle, 'cached': False, **report})
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'status': 'error', 'msg': str(e)}), 500
 
-        return jsonify({'status': 'success', 'output': result_config})
 
+# ✅ Helper: yield chunk ของ iter_render() ให้ client แล้วเก็บผลรวมลง Cache เมื่อส่งครบ
+# เก็บ chunk ไว้ทำ Cache ได้ไม่เกิน STREAM_CACHE_MAX_BYTES -> ผลใหญ่กว่านั้นไม่ Cache (memory ไม่โตตามขนาด output)
+STREAM_CACHE_MAX_BYTES = int(os.getenv('CONVERT_STREAM_CACHE_MAX_KB', '2048')) * 1024
+
+def _stream_and_cache(converter, cache_key):
+    chunks = [] if cache_key else None
+    size = 0
+    for chunk in converter.iter_render():
+        if chunks is not None:
+            size += len(chunk.encode("utf-8"))
+            if size > STREAM_CACHE_MAX_BYTES:
+                chunks = None   # เกินเพดาน -> ทิ้งที่เก็บไว้ แล้วส่งต่ออย่างเดียว
+            else:
+                chunks.append(chunk)
+        yield chunk
+
+    if chunks and not chunks[0].startswith("Error"):
+        conversion_cache.put(cache_key, "".join(chunks), size=size)
+
+
+# ✅ Helper: ดึง config จาก db.backups -> (content, source_type) ของอุปกรณ์นั้น
+def _load_backup_config(backup_id, owner):
+    if not isinstance(backup_id, str) or not ObjectId.is_valid(backup_id): return None, None   # id เสีย = ไม่พบ (404)
+    backup = db.backups.find_one({'_id': ObjectId(backup_id), 'owner': owner, 'status': 'Success'})
+    if not backup:
+        return None, None
+    device = db.devices.find_one({'_id': ObjectId(backup['device_id'])}, {'device_type': 1})
+    return backup_store.load(backup), (device or {}).get('device_type')
+
+
+# ✅ API: Delta Config (เทียบ 2 เวอร์ชัน -> เฉพาะคำสั่งที่เปลี่ยน)
+# รับได้ 3 แบบ: old/new_backup_id (จาก db.backups), old/new_handle, หรือ old/new_log_content
+@app.route('/api/convert_diff', methods=['POST'])
+def convert_diff_api():
+    current_user = request.headers.get('X-Username')
+    if not current_user: return jsonify({'msg': 'Unauthorized'}), 401
+
+    data = request.json or {}
+    source_type = data.get('source_type')
+    target_type = data.get('target_type', 'aruba_cx')
+
+    try:
+        models = {}
+        for side in ('old', 'new'):
+            content = data.get(f'{side}_log_content')
+            side_source = source_type
+
+            backup_id = data.get(f'{side}_backup_id')
+            if backup_id:
+                content, device_type = _load_backup_config(backup_id, current_user)
+                if content is None:
+                    return jsonify({'status': 'error', 'msg': f'{side} backup not found'}), 404
+                side_source = source_type or device_type
+
+            handle, model, error = _resolve_model(side_source, content, data.get(f'{side}_handle'))
+            if error == 'Handle not found or expired':
+                return jsonify({'status': 'error', 'msg': f'{side}: {error}'}), 404
+            if error:
+                return jsonify({'status': 'error', 'msg': f'{side}: {error}'}), 400
+            # model ไม่ครบ -> delta จะสั่งลบทุกอย่างที่ parse ไม่ทัน ห้ามส่งออกไป
+            if _model_report(model)['partial']:
+                return jsonify({'status': 'error', 'msg': f'{side}: Parse time budget exceeded',
+                                'diagnostics': model['diagnostics']}), 422
+            models[side] = (handle, model)
+
+        converter = ConfigConverter.from_model(models['new'][1], target_type, source_type)
+        output = converter.render_delta(models['old'][1])
+
+        return jsonify({
+            'status': 'success',
+            'output': output,
+            'old_handle': models['old'][0],
+            'new_handle': models['new'][0]
+        })
     except Exception as e:
         traceback.print_exc()
         return jsonify({'status': 'error', 'msg': str(e)}), 500
 
 
-# ✅ API: Export Excel (แก้เพิ่ม Route และ Clean Header)
+# ✅ API: สถิติ Cache ของการแปลง Config
+@app.route('/api/convert_config/cache', methods=['GET'])
+def convert_cache_stats():
+    return jsonify({'output': conversion_cache.stats(), 'models': model_store.stats()})
+
+
+# ✅ API: Export Excel (รับได้ทั้ง handle จาก /api/parse_config หรือ log_content เดิม)
 @app.route('/api/export_excel', methods=['POST'])
 def export_excel_api():
     current_user = request.headers.get('X-Username')
     
-    log_content = request.json.get('log_content')
-    source_type = request.json.get('source_type')
+    data = request.json or {}
+    log_content = data.get('log_content')
+    source_type = data.get('source_type')
+    handle = data.get('handle')
     
-    if not log_content: return jsonify({'msg': 'No content'}), 400
+    if not log_content and not handle: return jsonify({'msg': 'No content'}), 400
 
     try:
-        # 1. Init Converter
-        converter = ConfigConverter(source_type, "aruba_cx", log_content)
-        
-        # 2. ✅ Clean Header ก่อน Parse (สำคัญ! ไม่งั้น Parse ไม่เจอ)
-        if isinstance(converter.raw_log, str):
-            for header in ["display current-configuration", "show running-config"]:
-                if header in converter.raw_log:
-                    converter.raw_log = converter.raw_log.split(header, 1)[1]
-
-        # 3. Parse ตาม Source Type
-        if source_type == "hp_comware":
-            converter._parse_comware()
-        elif source_type == "cisco_ios":
-            converter._parse_cisco_ios()
-        
-        # 4. Export
-        excel_data = converter.export_to_excel()
+        handle, model, error = _resolve_model(source_type, log_content, handle)
+        if error == 'Handle not found or expired':
+            return jsonify({'status': 'error', 'msg': error}), 404
+        if error:
+            return jsonify({'status': 'error', 'msg': error}), 400
+
+        excel_data = ConfigConverter.from_model(model, "aruba_cx", source_type).export_to_excel()
         
-        return send_file(
+        response = send_file(
             io.BytesIO(excel_data),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=f"network_spec_{converter.data['hostname']}.xlsx"
+            download_name=f"network_spec_{model['hostname']}.xlsx"
+        )
+        response.headers['X-Model-Handle'] = handle or ''
+        response.headers['X-Parse-Partial'] = '1' if _model_report(model)['partial'] else '0'
+        return response
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'status': 'error', 'msg': str(e)}), 500
+
+
+
+# ✅ API: Batch Convert (หลายไฟล์ / zip -> zip ของ Aruba Config + Excel)
+@app.route('/api/batch_convert', methods=['POST'])
+def batch_convert_api():
+    current_user = request.headers.get('X-Username')
+    if not current_user: return jsonify({'msg': 'Unauthorized'}), 401
+
+    source_type = request.form.get('source_type')
+    target_type = request.form.get('target_type', 'aruba_cx')
+    with_excel = request.form.get('excel', '1') != '0'
+
+    uploads = [(f.filename or 'config.log', f.read()) for f in request.files.getlist('files')]
+    if 'file' in request.files:
+        f = request.files['file']
+        uploads.append((f.filename or 'config.zip', f.read()))
+
+    if not source_type or not uploads:
+        return jsonify({'status': 'error', 'msg': 'Missing parameters'}), 400
+
+    try:
+        try:
+            items = batch_convert.collect_inputs(uploads)
+        except ValueError as e:   # เกินจำนวนไฟล์ / ขนาดหลังแตก zip
+            return jsonify({'status': 'error', 'msg': str(e)}), 413
+        if not items:
+            return jsonify({'status': 'error', 'msg': 'No files found'}), 400
+
+        t0 = time.perf_counter()
+        results = batch_convert.run_batch(items, source_type, target_type, with_excel)
+        elapsed_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+        zip_data, summary = batch_convert.build_zip(results, elapsed_ms)
+        response = send_file(
+            io.BytesIO(zip_data),
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name=f"batch_convert_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
         )
+        response.headers['X-Batch-Total'] = str(summary['total'])
+        response.headers['X-Batch-Failed'] = str(summary['failed'])
+        return response
     except Exception as e:
         traceback.print_exc()
         return jsonify({'status': 'error', 'msg': str(e)}), 500
 
 
 
+# ✅ API: Health / Readiness (ping Mongo จริง)
+@app.route('/api/health', methods=['GET'])
+def health():
+    ready = db.ready(force=True)
+    # backup ที่เขียนลง DB ไม่ได้ค้างอยู่ใน writer -> degraded (ดูจำนวนที่ backup_writer.failed)
+    ok = ready and not backup_writer.failed
+    return jsonify({'status': 'ok' if ok else 'degraded', 'db': ready, 'ssh_pool': ssh_pool.stats(), 'scheduler': scheduler.stats(), 'backup_writer': backup_writer.stats()}), (200 if ready else 503)
+
+
 # --- ADMIN USER MANAGEMENT API ---
 @app.route('/api/users', methods=['GET'])
 def get_users():
-    if users_col is None: return jsonify([]), 500
+    if not db.ready(): return jsonify([]), 500
     users = list(users_col.find())
     for u in users:
         u['_id'] = str(u['_id'])
@@ -273,7 +593,7 @@ def delete_profile(id):
     # แปลง ObjectId เป็น String List
     device_ids_to_delete = [str(d['_id']) for d in devices_in_profile]
     if device_ids_to_delete:
-        db.backups.delete_many({'device_id': {'$in': device_ids_to_delete}})
+        backup_store.delete_many({'device_id': {'$in': device_ids_to_delete}})
     # 2. ลบอุปกรณ์ทั้งหมดใน Profile นั้นด้วย (Clean up)
     db.devices.delete_many({'profile_id': id, 'owner': current_user})
 
@@ -288,7 +608,7 @@ def login():
         username = data.get('username')
         password = data.get('password')
 
-        if users_col is None:
+        if not db.ready():
             return jsonify({'status': 'error', 'msg': '❌ Database connection failed'}), 500
 
         user = users_col.find_one({'username': username, 'password': password})
@@ -343,21 +663,25 @@ def run_single_command():
     data = request.json
     device_id = data.get('device_id')
     command = data.get('command') # รับคำสั่งที่ User พิมพ์มา เช่น "show ip route"
+    commands, error = parse_command_list(data) # หรือหลายคำสั่ง: ["display version", "display vlan", ...]
+    if error:
+        return jsonify({'status': 'Failed', 'output': error}), 400
     
     # 1. หาอุปกรณ์
     device = db.devices.find_one({'_id': ObjectId(device_id), 'owner': current_user})
     if not device:
         return jsonify({'status': 'Failed', 'output': 'Device not found'}), 404
 
+    if commands:
+        # ทุกคำสั่งบน session เดียว -> output + เวลาแยกรายคำสั่ง
+        return jsonify(task_send_commands(device, commands))
+
     try:
-        # 2. ต่ออุปกรณ์
-        driver = get_device_driver(device)
-        net_connect = ConnectHandler(**driver)
-        
-        # 3. ส่งคำสั่งที่ User ขอมา
-        # (เพิ่ม read_timeout เผื่อคำสั่งพวก ping มันนาน)
-        output = net_connect.send_command(command, read_timeout=10) 
-        net_connect.disconnect()
+        # 2. ต่ออุปกรณ์ (ใช้ session เดิมจาก pool ถ้ายังเปิดอยู่)
+        with device_session(device) as net_connect:
+            # 3. ส่งคำสั่งที่ User ขอมา
+            # (เพิ่ม read_timeout เผื่อคำสั่งพวก ping มันนาน)
+            output = net_connect.send_command(command, read_timeout=10)
         
         # 4. ส่งผลลัพธ์กลับไปหน้าเว็บทันที (ไม่บันทึกลง DB)
         return jsonify({'status': 'Success', 'output': output})
@@ -388,12 +712,14 @@ def update_device(id):
         update_data['secret'] = data['secret']
 
     # สั่ง Update โดยต้องเช็คว่าเป็นของ Owner คนนี้จริงๆ
-    result = db.devices.update_one(
+    old = db.devices.find_one_and_update(
         {'_id': ObjectId(id), 'owner': current_user},
         {'$set': update_data}
     )
     
-    if result.matched_count > 0:
+    if old is not None:
+        # ปิด session เก่าใน pool (IP / credential อาจเปลี่ยน)
+        ssh_pool.close_host(old['ip_address'])
         return jsonify({'msg': 'Device updated successfully'})
     else:
         return jsonify({'msg': 'Device not found or permission denied'}), 404
@@ -520,9 +846,6 @@ def config_vlan_ip():
     if not device: return jsonify({'status': 'Failed', 'msg': 'Device not found'}), 404
 
     try:
-        driver = get_device_driver(device)
-        net_connect = ConnectHandler(**driver)
-        
         # เรียกใช้ฟังก์ชันใหม่
         config_set = generate_bulk_vlan_config(
             device['device_type'], 
@@ -533,15 +856,14 @@ def config_vlan_ip():
             subnet_mask
         )
         
-        output = net_connect.send_config_set(config_set)
-        
-        # Save
-        if "cisco" in device['device_type'] or "aruba" in device['device_type']:
-            output += "\n" + net_connect.send_command("write memory")
-        elif "hp_comware" in device['device_type'] or "huawei" in device['device_type']:
-            output += "\n" + net_connect.send_command("save force") 
-            
-        net_connect.disconnect()
+        with device_session(device) as net_connect:
+            output = net_connect.send_config_set(config_set)
+
+            # Save
+            if "cisco" in device['device_type'] or "aruba" in device['device_type']:
+                output += "\n" + net_connect.send_command("write memory")
+            elif "hp_comware" in device['device_type'] or "huawei" in device['device_type']:
+                output += "\n" + net_connect.send_command("save force") 
         
         return jsonify({'status': 'Success', 'output': output})
 
@@ -570,6 +892,10 @@ def parse_vlan_range(vlan_str):
 
 
 
+def device_session(device):
+    # ✅ ยืม SSH session จาก pool: with device_session(device) as net_connect: ...
+    return ssh_pool.session(get_device_driver(device))
+
 def get_device_driver(device):
     return {
         'device_type': device['device_type'],
@@ -585,63 +911,198 @@ def get_device_driver(device):
     }
 def task_backup(device):
     try:
-        driver = get_device_driver(device)
-        net_connect = ConnectHandler(**driver)
-        
         # ดึงคำสั่งจากฟังก์ชันกลาง (ไม่ต้องเขียน If-Else ซ้ำ)
         cmd = get_backup_command(device['device_type'])
         
         # ส่งคำสั่ง (ครั้งเดียวพอ)
-        output = net_connect.send_command(cmd, read_timeout=90)
-        net_connect.disconnect()
-        
-        # บันทึกลง DB
-        db.backups.insert_one({
-            'device_id': str(device['_id']),
-            'hostname': device['hostname'],
-            'owner': device.get('owner'), 
-            'config_data': output,
-            'timestamp': dt.datetime.now(),
-            'status': 'Success'
-        })
-        return {'host': device['hostname'], 'status': 'Success'}
+        with device_session(device) as net_connect:
+            output = net_connect.send_command(cmd, read_timeout=90)
+        return record_backup(device, output)
         
     except Exception as e:
-        # ถ้าพัง ให้บันทึก Error
-        db.backups.insert_one({
-            'device_id': str(device['_id']),
-            'hostname': device['hostname'],
-            'owner': device.get('owner'),
-            'config_data': str(e),
-            'timestamp': dt.datetime.now(),
-            'status': 'Failed'
-        })
-        return {'host': device['hostname'], 'status': 'Failed', 'error': str(e)}
+        return record_backup(device, error=str(e))
+
+class BackupNotSaved(RuntimeError):
+    pass
+
+def _flush_backups():
+    # รอ backup_writer เขียนของที่ค้างให้หมด -> เขียนไม่ได้ (DB ล่มเกิน retry) = error ไม่ใช่ Success เงียบๆ
+    if not backup_writer.flush():
+        raise BackupNotSaved(f"Backup results could not be saved to database ({backup_writer.failed} waiting for retry)")
+
+def record_backup(device, output=None, error=None):
+    # บันทึกลง DB (ถ้าพัง ให้บันทึก Error แทน config)
+    record = {
+        'device_id': str(device['_id']),
+        'hostname': device['hostname'],
+        'owner': device.get('owner'), 
+        'timestamp': dt.datetime.now(),
+        'status': 'Success' if error is None else 'Failed'
+    }
+    # เข้าคิว backup_writer (เขียนเป็นก้อน) -> ถ้าต้องอ่านกลับทันทีให้เรียก backup_writer.flush()
+    if error is None:
+        backup_writer.put((record, output))
+    else:
+        backup_writer.put((dict(record, config_data=error), None))
+    if error is None:
+        return {'host': device['hostname'], 'status': 'Success'}
+    return {'host': device['hostname'], 'status': 'Failed', 'error': error}
 
 def task_send_command(device, command):
+    if isinstance(command, list):
+        return task_send_commands(device, command)
     try:
-        driver = get_device_driver(device)
-        net_connect = ConnectHandler(**driver)
-        output = net_connect.send_command(command)
-        net_connect.disconnect()
+        with device_session(device) as net_connect:
+            output = net_connect.send_command(command)
         return {'host': device['hostname'], 'status': 'Success', 'output': output}
     except Exception as e:
         return {'host': device['hostname'], 'status': 'Failed', 'error': str(e)}
+
+MAX_COMMANDS_PER_REQUEST = int(os.getenv('MAX_COMMANDS_PER_REQUEST', '50'))
+
+def parse_command_list(data):
+    # รับ 'commands': [...] (หรือ 'command' เดี่ยวแบบเดิม) -> (commands หรือ None, error)
+    commands = data.get('commands')
+    if commands is None:
+        return None, None
+    if not isinstance(commands, list) or not all(isinstance(c, str) and c.strip() for c in commands):
+        return None, 'commands must be a list of non-empty strings'
+    if not commands or len(commands) > MAX_COMMANDS_PER_REQUEST:
+        return None, f'commands must contain 1-{MAX_COMMANDS_PER_REQUEST} entries'
+    return [c.strip() for c in commands], None
+
+def task_send_commands(device, commands, read_timeout=10):
+    # ✅ หลายคำสั่งต่อเนื่องบน session เดียว -> login ครั้งเดียว, ได้ output + เวลาแยกรายคำสั่ง
+    t_start = time.perf_counter()
+    results = []
+    connect_ms = None
+    error = None
+    try:
+        with device_session(device) as net_connect:
+            connect_ms = round((time.perf_counter() - t_start) * 1000, 2)
+            for cmd in commands:
+                t0 = time.perf_counter()
+                try:
+                    output = net_connect.send_command(cmd, read_timeout=read_timeout)
+                except Exception as e:
+                    results.append({'command': cmd, 'status': 'Failed', 'error': str(e),
+                                    'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2)})
+                    raise   # session อาจค้างกลางคำสั่ง -> ไม่คืนเข้า pool, คำสั่งที่เหลือข้าม
+                results.append({'command': cmd, 'status': 'Success', 'output': output,
+                                'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2)})
+    except Exception as e:
+        error = str(e)
+
+    results.extend({'command': cmd, 'status': 'Skipped'} for cmd in commands[len(results):])
+    result = {
+        'host': device['hostname'],
+        'status': 'Success' if error is None else 'Failed',
+        'commands': results,
+        'connect_ms': connect_ms,
+        'total_ms': round((time.perf_counter() - t_start) * 1000, 2),
+    }
+    if error is not None:
+        result['error'] = error
+    return result
 # ---------------------------------------------------------
 # 1. Worker Function: ฟังก์ชันสำหรับ Config อุปกรณ์ 1 ตัว
 # ---------------------------------------------------------
 def task_push_config(device, config_lines):
     try:
-        driver = get_device_driver(device)
-        net_connect = ConnectHandler(**driver)
-        output = net_connect.send_config_set(config_lines)
-        if "cisco" in device['device_type']:
-            net_connect.send_command("write memory")
-        net_connect.disconnect()
+        with device_session(device) as net_connect:
+            output = net_connect.send_config_set(config_lines)
+            if "cisco" in device['device_type']:
+                net_connect.send_command("write memory")
         return {'host': device['hostname'], 'status': 'Success', 'log': output}
     except Exception as e:
         return {'host': device['hostname'], 'status': 'Failed', 'error': str(e)}
     
+# ---------------------------------------------------------
+# Fleet runner: งานเดียวกันบนหลายอุปกรณ์
+# ---------------------------------------------------------
+# SSH_ENGINE=thread  (default) -> ThreadPool + netmiko (ใช้ SSH pool ร่วมกับคำสั่งเดี่ยว)
+# SSH_ENGINE=asyncio           -> ssh_async (asyncssh ใน process แยก, หลักร้อย-พัน session พร้อมกัน)
+# ทั้งสองแบบผ่าน scheduler ตัวเดียวกัน (โควต้ารวม / ต่อผู้ใช้ / ต่อ profile + round-robin)
+# asyncio: ส่งเป็นก้อนละไม่เกิน ASYNC_CHUNK_SIZE เครื่อง (weight = จำนวนอุปกรณ์ในก้อน, profile ละไม่เกิน per_profile ต่อก้อน)
+#   ก้อนรวมหลาย profile ได้ -> profile เล็กๆ ไม่ทำให้ได้ก้อนเล็กจน session พร้อมกันต่ำกว่าโควต้า
+#   worker process รันทีละก้อน -> default จำนวน worker = ก้อนเต็มที่ scheduler ปล่อยพร้อมกันได้ (40 / 20 = 2)
+#   session พร้อมกันทั้ง server จึงได้ถึง DEVICE_SCHED_MAX_CONCURRENT จริง -> อยากได้หลักร้อยให้เพิ่ม DEVICE_SCHED_* อย่างเดียว
+#   ก้อนอยู่ใน lane 'ssh_async' (ช่อง = จำนวน worker) -> scheduler นับ running เฉพาะก้อนที่มี worker รันจริง
+SSH_ENGINE = os.getenv('SSH_ENGINE', 'thread')
+ASYNC_CHUNK_SIZE = min(scheduler.max_weight(), ssh_async.MAX_IN_FLIGHT)
+SSH_ASYNC_WORKERS = int(os.getenv('SSH_ASYNC_WORKERS', '0')) or -(-scheduler.max_concurrent // ASYNC_CHUNK_SIZE)
+scheduler.set_lane('ssh_async', SSH_ASYNC_WORKERS)
+FLEET_TASKS = {'backup': task_backup, 'command': task_send_command, 'config': task_push_config}
+
+def _async_chunk(ssh_jobs):
+    return list(ssh_async.run_fleet(ssh_jobs, max_in_flight=len(ssh_jobs), workers=SSH_ASYNC_WORKERS))
+
+def _async_chunks(devices):
+    # เรียงตาม profile แล้วบรรจุลงก้อน -> [(index ของอุปกรณ์, {profile: จำนวน})]
+    by_profile = {}
+    for i, dev in enumerate(devices):
+        by_profile.setdefault(dev.get('profile_id'), []).append(i)
+
+    chunks = []
+    chunk, counts = [], {}
+    for profile, indexes in by_profile.items():
+        for i in indexes:
+            if len(chunk) == ASYNC_CHUNK_SIZE or (profile is not None and counts.get(profile) == scheduler.per_profile):
+                chunks.append((chunk, counts))
+                chunk, counts = [], {}
+            chunk.append(i)
+            counts[profile] = counts.get(profile, 0) + 1
+    if chunk:
+        chunks.append((chunk, counts))
+    return chunks
+
+def iter_on_devices(op, devices, payload=None, user=None):
+    # yield ผลทีละเครื่องตามลำดับที่เสร็จ (job runner บันทึกผลได้ทันที)
+    if SSH_ENGINE == 'asyncio':
+        futures = {}
+        for chunk, counts in _async_chunks(devices):
+            ssh_jobs = [
+                ssh_async.make_job(op, get_device_driver(devices[i]), devices[i]['hostname'],
+                                   get_backup_command(devices[i]['device_type']) if op == 'backup' else payload)
+                for i in chunk
+            ]
+            future = scheduler.submit(_async_chunk, ssh_jobs, user=user, profile=counts, weight=len(chunk),
+                                      lane='ssh_async')
+            futures[future] = chunk
+
+        for future in as_completed(futures):
+            chunk = futures[future]
+            for j, result in future.result():
+                if op == 'backup':
+                    result = record_backup(devices[chunk[j]], result.get('output'), result.get('error'))
+                yield result
+    else:
+        args = () if op == 'backup' else (payload,)
+        yield from scheduler.map(FLEET_TASKS[op], devices, *args, user=user)
+
+    if op == 'backup':
+        _flush_backups()   # job จบ = backup ทุกตัวอยู่ใน DB แล้ว (ไม่งั้น job = failed)
+
+def run_on_devices(op, devices, payload=None, user=None):
+    return list(iter_on_devices(op, devices, payload, user))
+
+def _wait_requested():
+    flag = request.args.get('wait')
+    if flag is None:
+        flag = (request.get_json(silent=True) or {}).get('wait')
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+def start_fleet_job(op, devices, payload, current_user, meta=None):
+    # ?wait=1 -> รอผลแบบเดิม (script/CLI), ไม่งั้นคืน job_id ทันทีแล้วรันใน background
+    if _wait_requested():
+        try:
+            return jsonify(run_on_devices(op, devices, payload, user=current_user))
+        except BackupNotSaved as e:
+            return jsonify({'status': 'error', 'msg': str(e)}), 500
+    job_id = job_manager.start(op, current_user, len(devices),
+                               lambda: iter_on_devices(op, devices, payload, user=current_user), meta)
+    return jsonify({'status': 'queued', 'job_id': job_id, 'total': len(devices)}), 202
+
 # ---------------------------------------------------------
 # 2. API Route: รับคำสั่ง Batch Config
 # ---------------------------------------------------------
@@ -658,29 +1119,28 @@ def api_batch_config():
         return jsonify({"error": "Missing devices or commands"}), 400
 
     results = []
+    current_user = request.headers.get('X-Username')
     
-    # 🔥 เริ่มทำงานแบบ ThreadPool (Parallel)
-    # max_workers=10 คือทำพร้อมกันสูงสุด 10 ตัว (ปรับได้ตามความแรงเครื่อง Server)
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        # สร้าง List ของงาน (Future objects)
-        future_to_device = {
-            executor.submit(task_push_config, device, config_commands): device 
-            for device in target_devices
-        }
-        
-        # รอรับผลลัพธ์เมื่องานเสร็จ (as_completed)
-        for future in as_completed(future_to_device):
-            device = future_to_device[future]
-            try:
-                data = future.result()
-                results.append(data)
-            except Exception as exc:
-                # กันเหนียวเผื่อ Worker ตาย
-                results.append({
-                    "host": device.get('host'),
-                    "status": "failed",
-                    "log": f"Worker Exception: {exc}"
-                })
+    # 🔥 ส่งเข้าคิวกลาง (scheduler) -> จำนวนพร้อมกันถูกจำกัดรวมทั้ง server และแบ่งกันระหว่างผู้ใช้
+    future_to_device = {
+        scheduler.submit(task_push_config, device, config_commands,
+                         user=current_user, profile=device.get('profile_id')): device
+        for device in target_devices
+    }
+    
+    # รอรับผลลัพธ์เมื่องานเสร็จ (as_completed)
+    for future in as_completed(future_to_device):
+        device = future_to_device[future]
+        try:
+            data = future.result()
+            results.append(data)
+        except Exception as exc:
+            # กันเหนียวเผื่อ Worker ตาย
+            results.append({
+                "host": device.get('host'),
+                "status": "failed",
+                "log": f"Worker Exception: {exc}"
+            })
 
     # ส่งผลลัพธ์กลับไปให้ Frontend แสดงผล
     return jsonify({
@@ -756,8 +1216,9 @@ def add_device():
 def delete_device(id):
     current_user = request.headers.get('X-Username')
     # ✅ ลบเฉพาะถ้า User เป็นเจ้าของ
-    result = db.devices.delete_one({'_id': ObjectId(id), 'owner': current_user})
-    if result.deleted_count > 0:
+    device = db.devices.find_one_and_delete({'_id': ObjectId(id), 'owner': current_user})
+    if device is not None:
+        ssh_pool.close_host(device['ip_address'])
         return jsonify({'msg': 'Device deleted'})
     return jsonify({'msg': 'Device not found or permission denied'}), 404
 
@@ -771,6 +1232,10 @@ def run_backup_single(id):
         return jsonify({'status': 'Failed', 'msg': 'Device not found'}), 404
 
     result = task_backup(device)
+    try:
+        _flush_backups()   # หน้าเว็บดึงรายการ backup ต่อทันที
+    except BackupNotSaved as e:
+        return jsonify({'host': device['hostname'], 'status': 'Failed', 'error': str(e)}), 500
     return jsonify(result)
 
 @app.route('/api/run_backup', methods=['POST'])
@@ -778,33 +1243,25 @@ def run_backup():
     current_user = request.headers.get('X-Username')
     # ✅ ดึงเฉพาะอุปกรณ์ของ User นี้ไป Backup
     devices = list(db.devices.find({'owner': current_user}))
-    results = []
     
     if not devices:
         return jsonify({'msg': 'No devices found for this user'})
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = {executor.submit(task_backup, dev): dev for dev in devices}
-        for future in concurrent.futures.as_completed(futures):
-            results.append(future.result())
-            
-    return jsonify(results)
+    return start_fleet_job('backup', devices, None, current_user)
 
 @app.route('/api/run_command', methods=['POST'])
 def run_command():
     current_user = request.headers.get('X-Username')
     data = request.json
-    command = data.get('command')
+    commands, error = parse_command_list(data)
+    if error:
+        return jsonify({'status': 'error', 'msg': error}), 400
+    command = commands or data.get('command')
     
     # ✅ กรองอุปกรณ์
     devices = list(db.devices.find({'owner': current_user}))
-    results = []
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = {executor.submit(task_send_command, dev, command): dev for dev in devices}
-        for future in concurrent.futures.as_completed(futures):
-            results.append(future.result())
-    return jsonify(results)
+    meta = {'commands': commands} if commands else {'command': command}
+    return start_fleet_job('command', devices, command, current_user, meta)
 
 @app.route('/api/push_config', methods=['POST'])
 def push_config():
@@ -814,13 +1271,88 @@ def push_config():
     
     # ✅ กรองอุปกรณ์
     devices = list(db.devices.find({'owner': current_user}))
-    results = []
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = {executor.submit(task_push_config, dev, config_lines): dev for dev in devices}
-        for future in concurrent.futures.as_completed(futures):
-            results.append(future.result())
-    return jsonify(results)
+    return start_fleet_job('config', devices, config_lines, current_user, {'lines': len(config_lines or [])})
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    current_user = request.headers.get('X-Username')
+    limit, error = _int_arg('limit', 20, low=1)
+    if error:
+        return jsonify({'status': 'error', 'msg': error}), 400
+    return jsonify(job_manager.list(current_user, limit=limit))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # Polling fallback: ?since=<seq> ส่งเฉพาะผลที่ยังไม่เคยได้, ?results=0 เอาแค่สถานะ
+    current_user = request.headers.get('X-Username')
+    since, error = _int_arg('since', 0)
+    if error:
+        return jsonify({'status': 'error', 'msg': error}), 400
+    job = job_manager.get(job_id, current_user,
+                          with_results=request.args.get('results', '1') != '0',
+                          since=since)
+    if job is None:
+        return jsonify({'status': 'error', 'msg': 'Job not found'}), 404
+    return jsonify(job)
+
+@socketio.on('join_job')
+def handle_join_job(data):
+    # client subscribe progress ของ job: emit('join_job', {job_id, username})
+    job = job_manager.get(data.get('job_id', ''), data.get('username'), with_results=False)
+    if job is None:
+        emit('job_progress', {'status': 'error', 'msg': 'Job not found'})
+        return
+    join_room(job['job_id'])
+    emit('job_progress', {k: job[k] for k in ('job_id', 'status', 'total', 'done', 'success', 'failed', 'percent')})
+
+# ✅ Backup history ต่ออุปกรณ์ (version / config ของ version ใดก็ได้ / diff ระหว่าง 2 version)
+def _owned_device_id(id, owner):
+    if not ObjectId.is_valid(id): return None
+    device = db.devices.find_one({'_id': ObjectId(id), 'owner': owner}, {'_id': 1})
+    return str(device['_id']) if device else None
+
+@app.route('/api/devices/<id>/history', methods=['GET'])
+def get_device_history(id):
+    device_id = _owned_device_id(id, request.headers.get('X-Username'))
+    if not device_id:
+        return jsonify({'status': 'error', 'msg': 'Device not found'}), 404
+    limit, error = _int_arg('limit', 100)
+    if error:
+        return jsonify({'status': 'error', 'msg': error}), 400
+    versions = backup_store.history(device_id, limit=limit)
+    for v in versions:
+        v['_id'] = str(v['_id'])
+    return jsonify(versions)
+
+@app.route('/api/devices/<id>/history/<int:version>', methods=['GET'])
+def get_device_version(id, version):
+    device_id = _owned_device_id(id, request.headers.get('X-Username'))
+    if not device_id:
+        return jsonify({'status': 'error', 'msg': 'Device not found'}), 404
+    try:
+        config = backup_store.version_text(device_id, version)
+    except KeyError:
+        return jsonify({'status': 'error', 'msg': f'Version {version} not found'}), 404
+    return jsonify({'status': 'success', 'version': version, 'config_data': config})
+
+@app.route('/api/devices/<id>/history/diff', methods=['GET'])
+def diff_device_versions(id):
+    # ?a=<version>&b=<version> -> steps (จาก delta ที่เก็บไว้) + unified diff สุทธิ
+    device_id = _owned_device_id(id, request.headers.get('X-Username'))
+    if not device_id:
+        return jsonify({'status': 'error', 'msg': 'Device not found'}), 404
+    try:
+        a, b = int(request.args['a']), int(request.args['b'])
+    except (KeyError, ValueError):
+        return jsonify({'status': 'error', 'msg': 'a and b must be version numbers'}), 400
+    context, error = _int_arg('context', 3)
+    if error:
+        return jsonify({'status': 'error', 'msg': error}), 400
+    try:
+        result = backup_store.changes(device_id, a, b, context=context)
+    except KeyError as e:
+        return jsonify({'status': 'error', 'msg': str(e).strip("'")}), 404
+    return jsonify(dict(result, status='success'))
 
 @app.route('/api/backups', methods=['GET'])
 def get_backups():
@@ -853,7 +1385,7 @@ def get_backups():
         b['_id'] = str(b['_id'])
             
     # ✅ ดึงเฉพาะ Log ของ User นี้
-    logs = list(db.backups.find({'owner': current_user}).sort('timestamp', -1).limit(50))
+    logs = backup_store.hydrate(list(db.backups.find({'owner': current_user}).sort('timestamp', -1).limit(50)))
     for log in logs:
         log['_id'] = str(log['_id'])
         log['device_id'] = str(log.get('device_id', ''))
@@ -0,0 +1,326 @@
+import zlib
+import json
+import difflib
+import hashlib
+import threading
+import datetime as dt
+from bson.objectid import ObjectId
+
+# เขียนซ้ำได้กี่รอบเมื่อ version ชนกับ process อื่น (unique index ของ device_id + version)
+VERSION_RETRIES = 5
+
+
+# ================= BACKUP STORE (content-addressed) =================
+# เดิมทุก backup เก็บ config_data เต็มๆ ใน db.backups แม้ config ไม่เปลี่ยนจากเมื่อวาน
+# ตอนนี้แยกเป็น 2 ส่วน:
+# - db.backup_blobs: เนื้อ config บีบอัด (zlib) ใช้ sha256 ของข้อความเป็น _id + refs = _id ของ backup ที่อ้างถึง
+# - db.backups:      record เบาๆ (device/hostname/owner/timestamp/status) + config_hash + config_size
+# config ไม่เปลี่ยน = upsert $addToSet refs ของ blob เดิม + insert record เล็กๆ หนึ่งตัว (ไม่เก็บข้อความซ้ำ)
+# refs เป็นเซตของ _id (ไม่ใช่ตัวนับ) -> เขียนซ้ำก้อนเดิมตอน retry ไม่ทำให้นับเกินจน blob ไม่ถูกลบ
+# record เก่าที่ยังมี config_data ในตัวอ่านได้ตามเดิม (hydrate ข้ามให้เอง)
+#
+#   backup_store.insert({'device_id': ..., 'status': 'Success', ...}, config=output)
+#   backup_store.hydrate(backups)     # เติม config_data ให้ list ของ record (ดึง blob ครั้งเดียวด้วย $in)
+#
+# ================= DELTA HISTORY =================
+# backup ที่สำเร็จของแต่ละอุปกรณ์มี version (1, 2, 3 ...) และเก็บได้ 2 แบบ (storage):
+# - 'blob':  snapshot เต็ม (blob ด้านบน) -> ทุก snapshot_interval version, version แรก, หรือ config ซ้ำกับ blob ที่มีอยู่แล้ว
+# - 'delta': เฉพาะบรรทัดที่ต่างจาก version ก่อนหน้า [[i1, i2, [บรรทัดใหม่]], ...] (zlib+json) + base_version = snapshot ต้น chain
+# rebuild version ไหนก็ได้ = snapshot 1 ตัว + delta ไม่เกิน snapshot_interval ตัว (query เดียว)
+# config_hash ของทุก version = sha256 ของข้อความเต็ม -> ตรวจความถูกต้องหลัง rebuild
+
+
+def config_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_delta(old, new):
+    """ บรรทัดที่เปลี่ยนจาก old -> new: [[i1, i2, [บรรทัดใหม่]]] (แทน old[i1:i2] ด้วยบรรทัดใหม่) """
+    a, b = old.split("\n"), new.split("\n")
+    return [[i1, i2, b[j1:j2]] for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes()
+            if tag != 'equal']
+
+
+def apply_delta(lines, ops):
+    out = []
+    pos = 0
+    for i1, i2, new in ops:
+        out.extend(lines[pos:i1])
+        out.extend(new)
+        pos = i2
+    out.extend(lines[pos:])
+    return out
+
+
+def _is_blob(backup):
+    # record ที่อ้าง blob: มี config_hash และไม่ใช่ delta (record ก่อนมี history ไม่มี storage = blob)
+    return bool(backup.get('config_hash')) and backup.get('storage') != 'delta' and 'config_data' not in backup
+
+
+class BackupStore:
+    def __init__(self, db, level=6, snapshot_interval=30):
+        self.backups = db['backups']
+        self.blobs = db['backup_blobs']
+        self.level = level
+        self.snapshot_interval = max(1, snapshot_interval)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._index_ready = False
+
+    def _ensure_index(self):
+        if self._index_ready: return
+        # version ซ้ำ = chain เสีย -> unique ข้ามทุก process (เฉพาะ record ที่มี version; Failed / record เก่าไม่มี)
+        from pymongo.errors import OperationFailure   # ✅ Lazy import (เหมือน lazy_db)
+        old = self.backups.index_information().get('device_id_1_version_1')
+        if old is not None and not old.get('unique'):
+            self.backups.drop_index('device_id_1_version_1')    # index เดิมก่อนมี unique
+        try:
+            self.backups.create_index([("device_id", 1), ("version", 1)], unique=True,
+                                      partialFilterExpression={'version': {'$exists': True}})
+        except OperationFailure as e:
+            # มี version ซ้ำอยู่แล้วใน DB -> สร้าง unique ไม่ได้ (ยังเขียนต่อได้ แต่กันชนข้าม process ไม่ได้)
+            print(f"❌ backups: cannot create unique (device_id, version) index: {e}")
+        self._index_ready = True
+
+    def _device_lock(self, device_id):
+        # version ต่ออุปกรณ์ต้องเรียงกัน -> backup ของอุปกรณ์เดียวกันเขียนทีละตัวใน process นี้
+        # (ข้าม process ใช้ unique index + เขียนซ้ำใน insert_many)
+        with self._locks_guard:
+            return self._locks.setdefault(device_id, threading.Lock())
+
+    # ---------- Write ----------
+    def insert(self, record, config=None):
+        """ บันทึก backup; config=None (เช่น Failed ที่เก็บ error ใน config_data) -> insert record ตรงๆ """
+        return self.insert_many([(record, config)])[0]
+
+    def insert_many(self, items):
+        """ [(record, config)] -> เขียนทั้งก้อน (ใช้กับ BufferedWriter):
+            อ่าน version ล่าสุดของทุกอุปกรณ์ใน aggregate เดียว + blob ที่มีอยู่แล้วใน $in เดียว
+            แล้วเขียน blob ด้วย bulk_write (unordered) และ record ด้วย insert_many (ordered)
+            เรียกซ้ำด้วยก้อนเดิมได้ (BufferedWriter retry): record ได้ _id ตั้งแต่รอบแรก ตัวที่เขียนไปแล้วถูกข้าม
+            version ชนกับ process อื่น (duplicate key) -> อ่าน version ล่าสุดใหม่แล้วเขียนส่วนที่เหลือ """
+        from pymongo.errors import BulkWriteError   # ✅ Lazy import (เหมือน lazy_db)
+        for attempt in range(VERSION_RETRIES):
+            try:
+                return self._write_many(items)
+            except BulkWriteError as e:
+                conflict = all(err.get('code') == 11000 for err in e.details.get('writeErrors', []))
+                if not conflict or attempt == VERSION_RETRIES - 1: raise
+
+    def _write_many(self, items):
+        for record, _ in items:
+            record.setdefault('_id', ObjectId())
+        written = {doc['_id'] for doc in self.backups.find({'_id': {'$in': [r['_id'] for r, _ in items]}}, {'_id': 1})}
+
+        records = []
+        todo = []           # index ของ record ที่ยังไม่อยู่ใน db.backups
+        versioned = {}      # device_id -> [(index, record, config)] ตามลำดับที่เข้ามา
+        for i, (record, config) in enumerate(items):
+            records.append(record)
+            if record['_id'] in written: continue
+            todo.append(i)
+            if config is not None:
+                versioned.setdefault(record.get('device_id'), []).append((i, record, config))
+        if not todo:
+            return records
+        if not versioned:
+            self.backups.insert_many([records[i] for i in todo], ordered=False)
+            return records
+
+        self._ensure_index()
+        locks = [self._device_lock(d) for d in sorted(versioned, key=str)]
+        for lock in locks: lock.acquire()
+        try:
+            latest = {doc['_id']: doc for doc in self.backups.aggregate([
+                {'$match': {'device_id': {'$in': list(versioned)}, 'version': {'$exists': True}}},
+                {'$sort': {'device_id': 1, 'version': -1}},
+                {'$group': {'_id': '$device_id', 'version': {'$first': '$version'},
+                            'chain': {'$first': '$chain'}, 'base_version': {'$first': '$base_version'}}},
+            ])}
+            hashes = {i: config_hash(config) for entries in versioned.values() for i, _, config in entries}
+            existing = {doc['_id'] for doc in self.blobs.find({'_id': {'$in': list(set(hashes.values()))}}, {'_id': 1})}
+
+            refs = {}         # hash -> [_id ของ record ที่อ้าง]
+            texts = {}        # hash -> ข้อความ (สำหรับ $setOnInsert)
+            new_blobs = set() # hash ที่ก้อนนี้สร้าง snapshot ใหม่ (config เดียวกันซ้ำในก้อน = อ้าง blob เดียวกัน)
+            for device_id, entries in versioned.items():
+                prev = latest.get(device_id)
+                prev_text = None
+                for i, record, config in entries:
+                    h = hashes[i]
+                    record = dict(record, config_hash=h, config_size=len(config))
+                    record.pop('config_data', None)
+                    version = 1 if prev is None else prev['version'] + 1
+                    chain = 0 if prev is None else prev.get('chain', 0) + 1
+
+                    # snapshot ใหม่: version แรก / chain ยาวครบรอบ / มี blob ของข้อความนี้อยู่แล้ว (config ไม่เปลี่ยน = แค่เพิ่ม ref)
+                    if prev is None or chain >= self.snapshot_interval or h in existing or h in new_blobs:
+                        if h not in existing:
+                            new_blobs.add(h)
+                        texts[h] = config
+                        refs.setdefault(h, []).append(record['_id'])
+                        record.update(version=version, storage='blob', chain=0, base_version=version)
+                    else:
+                        if prev_text is None:
+                            prev_text = self.version_text(device_id, prev['version'])
+                        ops = make_delta(prev_text, config)
+                        record.update(version=version, storage='delta', chain=chain, base_version=prev['base_version'],
+                                      delta=zlib.compress(json.dumps(ops, separators=(',', ':')).encode("utf-8"), self.level))
+                    records[i] = record
+                    prev, prev_text = record, config
+
+            # blob ก่อน record -> ไม่มีช่วงที่ record อ้าง blob ที่ยังไม่ถูกเขียน
+            # upsert ทุก hash (รวมที่เจอใน existing): delete_many อาจลบ blob นั้นไปหลังอ่าน existing -> สร้างกลับจากข้อความ
+            if refs:
+                from pymongo import UpdateOne   # ✅ Lazy import (เหมือน lazy_db)
+                now = dt.datetime.now()
+                self.blobs.bulk_write([
+                    UpdateOne({'_id': h}, {'$addToSet': {'refs': {'$each': ids}},
+                                           '$setOnInsert': self._blob_fields(texts[h], now)}, upsert=True)
+                    for h, ids in refs.items()
+                ], ordered=False)
+            # ordered: ชนที่ record ไหน record ต่อจากนั้นไม่ถูกเขียน -> chain ของทุกอุปกรณ์ไม่มีรู (เขียนต่อรอบหน้า)
+            from pymongo.errors import BulkWriteError   # ✅ Lazy import
+            try:
+                self.backups.insert_many([records[i] for i in todo], ordered=True)
+            except BulkWriteError as e:
+                # record ที่ไม่ได้เขียนอาจกลายเป็น delta ในรอบหน้า -> เอา _id ออกจาก refs ของ blob ก่อน
+                stale = {}
+                for i in todo[e.details.get('nInserted', 0):]:
+                    if records[i].get('storage') == 'blob':
+                        stale.setdefault(records[i]['config_hash'], []).append(records[i]['_id'])
+                self._release_refs(stale)
+                raise
+        finally:
+            for lock in reversed(locks): lock.release()
+        return records
+
+    def _blob_fields(self, text, now):
+        raw = text.encode("utf-8")
+        return {'data': zlib.compress(raw, self.level), 'size': len(raw), 'created_at': now}
+
+    # ---------- Read ----------
+    def get_blob(self, h):
+        doc = self.blobs.find_one({'_id': h}, {'data': 1})
+        return None if doc is None else zlib.decompress(doc['data']).decode("utf-8")
+
+    def load(self, backup):
+        """ config ของ record เดียว (record เก่าที่มี config_data ในตัว -> คืนค่านั้นเลย) """
+        if backup.get('storage') == 'delta' and 'config_data' not in backup:
+            return self.version_text(backup['device_id'], backup['version'])
+        if _is_blob(backup):
+            return self.get_blob(backup['config_hash'])
+        return backup.get('config_data')
+
+    def hydrate(self, backups):
+        """ เติม config_data ให้ทุก record ที่อ้าง blob/delta (blob ซ้ำกันดึง/แตกครั้งเดียว, delta rebuild ทีละอุปกรณ์) """
+        hashes = {b['config_hash'] for b in backups if _is_blob(b)}
+        if hashes:
+            texts = {
+                doc['_id']: zlib.decompress(doc['data']).decode("utf-8")
+                for doc in self.blobs.find({'_id': {'$in': list(hashes)}}, {'data': 1})
+            }
+            for b in backups:
+                if _is_blob(b) and b['config_hash'] in texts:
+                    b['config_data'] = texts[b['config_hash']]
+
+        deltas = {}
+        for b in backups:
+            if b.get('storage') == 'delta' and 'config_data' not in b:
+                deltas.setdefault(b['device_id'], []).append(b)
+        for device_id, records in deltas.items():
+            texts = self.version_texts(device_id, [b['version'] for b in records])
+            for b in records:
+                b['config_data'] = texts[b['version']]
+                b.pop('delta', None)
+        return backups
+
+    # ---------- History ----------
+    def history(self, device_id, limit=0):
+        """ รายการ version ของอุปกรณ์ (ใหม่สุดก่อน, ไม่รวมเนื้อ config) """
+        return list(self.backups.find({'device_id': device_id, 'version': {'$exists': True}},
+                                      {'delta': 0}).sort('version', -1).limit(limit))
+
+    def version_text(self, device_id, version):
+        return self.version_texts(device_id, [version])[version]
+
+    def version_texts(self, device_id, versions):
+        """ rebuild หลาย version ของอุปกรณ์เดียวในรอบเดียว: snapshot ต้น chain ของตัวเก่าสุด -> apply delta ไล่ขึ้นไป """
+        wanted = set(versions)
+        low = self.backups.find_one({'device_id': device_id, 'version': min(wanted)}, {'base_version': 1})
+        if low is None:
+            raise KeyError(f"version {min(wanted)} not found")
+
+        texts = {}
+        lines = None
+        cursor = self.backups.find(
+            {'device_id': device_id, 'version': {'$gte': low['base_version'], '$lte': max(wanted)}},
+            {'version': 1, 'storage': 1, 'config_hash': 1, 'delta': 1}
+        ).sort('version', 1)
+        for rec in cursor:
+            if rec.get('storage') == 'delta':
+                if lines is None:
+                    raise ValueError(f"history chain of {device_id} is broken at version {rec['version']}")
+                lines = apply_delta(lines, json.loads(zlib.decompress(rec['delta'])))
+            else:
+                lines = self.get_blob(rec['config_hash']).split("\n")
+            if rec['version'] in wanted:
+                text = "\n".join(lines)
+                if config_hash(text) != rec['config_hash']:
+                    raise ValueError(f"history of {device_id} version {rec['version']} failed hash check")
+                texts[rec['version']] = text
+
+        missing = wanted - set(texts)
+        if missing:
+            raise KeyError(f"version {min(missing)} not found")
+        return texts
+
+    def changes(self, device_id, a, b, context=3):
+        """ อะไรเปลี่ยนระหว่าง version a -> b
+            - steps: จำนวนบรรทัดที่เพิ่ม/ลบในแต่ละ version (อ่านจาก delta ที่เก็บไว้ตรงๆ ไม่ต้อง rebuild)
+            - diff:  unified diff สุทธิระหว่าง a กับ b """
+        if a > b: a, b = b, a
+        steps = []
+        for rec in self.backups.find({'device_id': device_id, 'version': {'$gt': a, '$lte': b}},
+                                     {'version': 1, 'storage': 1, 'delta': 1, 'timestamp': 1,
+                                      'config_hash': 1}).sort('version', 1):
+            step = {'version': rec['version'], 'timestamp': rec.get('timestamp'), 'storage': rec.get('storage')}
+            if rec.get('storage') == 'delta':
+                ops = json.loads(zlib.decompress(rec['delta']))
+                step['added'] = sum(len(new) for _, _, new in ops)
+                step['removed'] = sum(i2 - i1 for i1, i2, _ in ops)
+            steps.append(step)
+
+        texts = self.version_texts(device_id, [a, b])
+        diff = list(difflib.unified_diff(texts[a].split("\n"), texts[b].split("\n"),
+                                         f"version {a}", f"version {b}", n=context, lineterm=""))
+        return {
+            'a': a,
+            'b': b,
+            'unchanged': texts[a] == texts[b],
+            'added': sum(1 for l in diff[2:] if l.startswith('+')),
+            'removed': sum(1 for l in diff[2:] if l.startswith('-')),
+            'steps': steps,
+            'diff': "\n".join(diff),
+        }
+
+    # ---------- Delete ----------
+    def delete_many(self, query):
+        """ ลบ backup ตาม query แล้วเอา _id ออกจาก refs ของ blob; blob ที่ไม่มีใครอ้างแล้วถูกลบทิ้ง
+            (delta อ้าง version ก่อนหน้า -> ลบทีละทั้งอุปกรณ์ ไม่ลบกลาง chain) """
+        refs = {}
+        for b in self.backups.find(dict(query, config_hash={'$exists': True}), {'config_hash': 1, 'storage': 1}):
+            if b.get('storage') == 'delta': continue
+            refs.setdefault(b['config_hash'], []).append(b['_id'])
+
+        result = self.backups.delete_many(query)
+        self._release_refs(refs)
+        return result.deleted_count
+
+    def _release_refs(self, refs):
+        """ {hash: [_id ของ backup]} -> เอาออกจาก refs แล้วลบ blob ที่ไม่มีใครอ้าง """
+        for h, ids in refs.items():
+            self.blobs.update_one({'_id': h}, {'$pull': {'refs': {'$in': ids}}})
+        if refs:
+            # เช็ค refs ว่างใน query เดียวกับที่ลบ -> insert ที่เพิ่ง $addToSet blob เดียวกันไม่โดนลบไปด้วย
+            self.blobs.delete_many({'_id': {'$in': list(refs)}, 'refs': {'$size': 0}})
@@ -0,0 +1,155 @@
+import io
+import os
+import json
+import time
+import zipfile
+from concurrent.futures import as_completed
+
+from converter import ConfigConverter
+from worker_pool import shared_pool
+
+
+# ================= BATCH CONVERT (Process Pool) =================
+# แปลง Log หลายไฟล์ในคำขอเดียว (เช่นทั้งตึก) โดยกระจายงาน ConfigConverter ไปหลาย CPU core
+# - Worker รันใน process แยก (spawn) -> ไม่ติด GIL และไม่ fork state ของ eventlet ไปด้วย
+# - ผลลัพธ์รวมเป็น zip: config ของแต่ละไฟล์ + Excel + summary.json (status / เวลาแต่ละขั้น)
+# - zip ที่อัปโหลดถูกตรวจจำนวนไฟล์ / ขนาดหลังแตกจาก header ก่อนอ่าน (กัน zip bomb แตกเต็ม memory ของ web worker)
+
+MAX_FILES = int(os.getenv('BATCH_CONVERT_MAX_FILES', '500'))
+MAX_UNZIPPED_BYTES = int(os.getenv('BATCH_CONVERT_MAX_UNZIPPED_MB', '200')) * 1024 * 1024
+
+
+def get_pool():
+    return shared_pool('BATCH_CONVERT_WORKERS', os.cpu_count() or 2)
+
+
+def convert_one(name, source_type, target_type, content, with_excel=True):
+    """ Worker: แปลงไฟล์เดียว (รันใน process ของ pool) """
+    t_start = time.perf_counter()
+    result = {'file': name, 'status': 'Success', 'timings_ms': {}}
+    timings = result['timings_ms']
+
+    try:
+        if source_type != 'excel' and isinstance(content, bytes):
+            content = content.decode('utf-8-sig', errors='replace')
+
+        conv = ConfigConverter(source_type, target_type, content)
+        t0 = time.perf_counter()
+        error = conv.parse()
+        timings['parse'] = round((time.perf_counter() - t0) * 1000, 2)
+        if error:
+            result.update({'status': 'Failed', 'error': error})
+            return result
+
+        result['hostname'] = conv.data['hostname']
+        result['partial'] = conv.partial
+        if conv.diagnostics:
+            result['diagnostics'] = conv.diagnostics
+
+        t0 = time.perf_counter()
+        output = conv.render()
+        timings['render'] = round((time.perf_counter() - t0) * 1000, 2)
+        if output.startswith('Error'):
+            result.update({'status': 'Failed', 'error': output})
+            return result
+        result['output'] = output
+
+        if with_excel and source_type != 'excel':
+            t0 = time.perf_counter()
+            result['excel'] = conv.export_to_excel()
+            timings['excel'] = round((time.perf_counter() - t0) * 1000, 2)
+
+    except Exception as e:
+        result.update({'status': 'Failed', 'error': str(e)})
+    finally:
+        timings['total'] = round((time.perf_counter() - t_start) * 1000, 2)
+    return result
+
+
+def collect_inputs(uploads):
+    """ uploads: [(filename, bytes)] -> แตก zip ออกเป็นไฟล์ย่อย, ข้าม directory / ไฟล์ซ่อน
+        เกิน MAX_FILES / MAX_UNZIPPED_BYTES -> ValueError (ตรวจจาก header ของ zip ก่อนอ่านไฟล์ใดๆ) """
+    items = []
+    count, total = 0, 0
+    for filename, data in uploads:
+        if filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                entries = []
+                for info in zf.infolist():
+                    base = os.path.basename(info.filename)
+                    if info.is_dir() or not base or base.startswith('.'): continue
+                    entries.append((base, info))
+                count += len(entries)
+                total += sum(info.file_size for _, info in entries)
+                _check_limits(count, total)
+                for base, info in entries:
+                    items.append((base, zf.read(info)))
+        else:
+            count += 1
+            total += len(data)
+            _check_limits(count, total)
+            items.append((os.path.basename(filename), data))
+    return items
+
+
+def _check_limits(count, total):
+    if count > MAX_FILES:
+        raise ValueError(f'Too many files (limit {MAX_FILES})')
+    if total > MAX_UNZIPPED_BYTES:
+        raise ValueError(f'Uncompressed size exceeds {MAX_UNZIPPED_BYTES // (1024 * 1024)} MB')
+
+
+def run_batch(items, source_type, target_type, with_excel=True):
+    """ ส่งทุกไฟล์เข้า Process Pool แล้วรอผล (เรียงตามลำดับไฟล์ที่ส่งมา) """
+    pool = get_pool()
+    futures = {
+        pool.submit(convert_one, name, source_type, target_type, data, with_excel): idx
+        for idx, (name, data) in enumerate(items)
+    }
+
+    results = [None] * len(items)
+    for future in as_completed(futures):
+        idx = futures[future]
+        try:
+            results[idx] = future.result()
+        except Exception as e:
+            # Worker process ตาย (เช่น BrokenProcessPool)
+            results[idx] = {'file': items[idx][0], 'status': 'Failed', 'error': f'Worker Exception: {e}', 'timings_ms': {}}
+    return results
+
+
+def build_zip(results, elapsed_ms=None):
+    """ รวมผลเป็น zip: <ชื่อไฟล์>.cfg, <ชื่อไฟล์>.xlsx และ summary.json """
+    output = io.BytesIO()
+    used = set()
+    summary = {
+        'total': len(results),
+        'success': len([r for r in results if r['status'] == 'Success']),
+        'failed': len([r for r in results if r['status'] == 'Failed']),
+        'elapsed_ms': elapsed_ms,
+        'files': []
+    }
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for r in results:
+            stem = os.path.splitext(r['file'])[0] or 'config'
+            # กันชื่อซ้ำ (เช่น zip หลายก้อนมีไฟล์ชื่อเดียวกัน)
+            name, n = stem, 1
+            while name in used:
+                n += 1
+                name = f"{stem}_{n}"
+            used.add(name)
+
+            entry = {k: v for k, v in r.items() if k not in ('output', 'excel')}
+            if r.get('output') is not None:
+                zf.writestr(f"{name}.cfg", r['output'])
+                entry['config_file'] = f"{name}.cfg"
+            if r.get('excel') is not None:
+                zf.writestr(f"{name}.xlsx", r['excel'])
+                entry['excel_file'] = f"{name}.xlsx"
+            summary['files'].append(entry)
+
+        zf.writestr('summary.json', json.dumps(summary, indent=2, ensure_ascii=False))
+
+    output.seek(0)
+    return output.read(), summary
@@ -0,0 +1,131 @@
+"""
+Benchmark: ConfigConverter ทั้ง pipeline บน config สังเคราะห์ (ดู synthetic_config.py)
+วัดแยก 3 ขั้น: process() (parse + render), export_to_excel(), _parse_excel() (import กลับ)
+แต่ละขั้นรายงานเวลา best-of-N และ peak memory จาก tracemalloc
+ท้ายตารางวัด clean_session_text บน input ที่ทำให้ regex backtrack (ช่องว่าง/ขีดยาวๆ + ESC) -> เวลาต้องโตแบบ linear
+
+    python benchmarks/bench_converter.py
+    python benchmarks/bench_converter.py --preset stack9-max --platform hp_comware --repeat 5
+    python benchmarks/bench_converter.py --json /tmp/bench.json     # เก็บผลไว้เทียบระหว่าง commit
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_config import PRESETS, GENERATORS, load_seed
+from converter import ConfigConverter
+from session_log import clean_session_text
+
+# input ที่เคยทำให้ _ARTIFACT_RE เป็น quadratic (40k ช่องว่าง + ESC = ~12 s)
+PATHOLOGICAL = {
+    "spaces+esc": lambda n: " " * n + "\x1b",
+    "dashes+esc": lambda n: "-" * n + "\x1b",
+    "spaces+more": lambda n: "x" + " " * n + "--More",
+}
+PATHOLOGICAL_SIZES = (5000, 20000, 40000, 400000)
+
+
+def measure(fn, repeat):
+    """ คืน (best seconds, peak bytes, ผลลัพธ์ของรอบสุดท้าย) """
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+
+    # รอบวัด memory แยกจากรอบจับเวลา (tracemalloc ทำให้ช้าลงหลายเท่า)
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def bench_one(platform, preset, repeat, seed):
+    text = GENERATORS[platform](*PRESETS[preset], seed=seed)
+
+    def do_process():
+        return ConfigConverter(platform, "aruba_cx", text).process()
+
+    # แยก export ออกจาก parse: parse ครั้งเดียวแล้ววัดเฉพาะ export
+    conv = ConfigConverter(platform, "aruba_cx", text)
+    error = conv.parse()
+    if error:
+        raise RuntimeError(f"{platform}/{preset}: {error}")
+
+    def do_import():
+        back = ConfigConverter("excel", "aruba_cx", xlsx)
+        back._parse_excel()
+        return back.data
+
+    t_proc, m_proc, output = measure(do_process, repeat)
+    t_exp, m_exp, xlsx = measure(conv.export_to_excel, repeat)
+    t_imp, m_imp, _ = measure(do_import, repeat)
+
+    return {
+        "platform": platform,
+        "preset": preset,
+        "input_kb": round(len(text) / 1024, 1),
+        "ports": len(conv.data["interfaces"]),
+        "vlans": len(conv.data["vlans"]),
+        "routes": len(conv.data["routes"]),
+        "output_kb": round(len(output) / 1024, 1),
+        "xlsx_kb": round(len(xlsx) / 1024, 1),
+        "process_ms": round(t_proc * 1000, 2),
+        "process_peak_mb": round(m_proc / 1024 / 1024, 2),
+        "export_ms": round(t_exp * 1000, 2),
+        "export_peak_mb": round(m_exp / 1024 / 1024, 2),
+        "import_ms": round(t_imp * 1000, 2),
+        "import_peak_mb": round(m_imp / 1024 / 1024, 2),
+    }
+
+
+def bench_clean(repeat):
+    rows = []
+    for name, make in PATHOLOGICAL.items():
+        for n in PATHOLOGICAL_SIZES:
+            text = make(n)
+            t, _, _ = measure(lambda: clean_session_text(text), repeat)
+            rows.append({"case": name, "chars": n, "clean_ms": round(t * 1000, 2)})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--preset', action='append', choices=list(PRESETS), help='ระบุซ้ำได้ (default: ทุก preset)')
+    ap.add_argument('--platform', action='append', choices=list(GENERATORS), help='ระบุซ้ำได้ (default: ทุก platform)')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--json', help='เขียนผลเป็น JSON ลงไฟล์นี้')
+    args = ap.parse_args()
+
+    seed = load_seed()
+    rows = []
+    print(f"{'platform':<11} {'preset':<11} {'in KB':>8} {'ports':>6} {'vlans':>6} {'routes':>6} "
+          f"{'process ms':>11} {'MB':>7} {'export ms':>10} {'MB':>7} {'import ms':>10} {'MB':>7}")
+    for platform in args.platform or list(GENERATORS):
+        for preset in args.preset or list(PRESETS):
+            r = bench_one(platform, preset, args.repeat, seed)
+            rows.append(r)
+            print(f"{platform:<11} {preset:<11} {r['input_kb']:>8} {r['ports']:>6} {r['vlans']:>6} {r['routes']:>6} "
+                  f"{r['process_ms']:>11} {r['process_peak_mb']:>7} {r['export_ms']:>10} {r['export_peak_mb']:>7} "
+                  f"{r['import_ms']:>10} {r['import_peak_mb']:>7}")
+
+    clean_rows = bench_clean(args.repeat)
+    print(f"\n{'clean case':<13} {'chars':>8} {'ms':>9}")
+    for r in clean_rows:
+        print(f"{r['case']:<13} {r['chars']:>8} {r['clean_ms']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows + clean_rows, f, indent=2)
+        print(f"saved -> {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: Excel export แบบใหม่ (xlsxwriter constant_memory) เทียบกับแบบเดิม (pandas DataFrame)
+
+    python benchmarks/bench_excel_export.py
+    python benchmarks/bench_excel_export.py --members 9 --ports 52 --vlans 4094 --routes 2000 --repeat 3
+"""
+import os
+import sys
+import io
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter import ConfigConverter
+from config_model import Vlan, Interface, Route, VlanSet
+
+
+def build_model(members, ports, vlans, routes):
+    """ สร้าง model ขนาดใหญ่ตรงๆ (ไม่ต้อง parse) เพื่อวัดเฉพาะขั้น export """
+    data = {"hostname": "BENCH-SW", "banner": "bench", "vlans": {}, "interfaces": {}, "routes": []}
+    for vid in range(1, vlans + 1):
+        data["vlans"][vid] = Vlan(vid, f"VLAN_{vid}", f"10.{vid // 256}.{vid % 256}.1", "255.255.255.0")
+
+    all_vlans = VlanSet()
+    all_vlans.add_range(1, vlans)
+    for m in range(1, members + 1):
+        for p in range(1, ports + 1):
+            port = f"{m}/1/{p}"
+            if p > ports - 4:
+                data["interfaces"][port] = Interface(port, "uplink", "trunk", 1, 1, all_vlans.copy())
+            elif p % 7 == 0:
+                data["interfaces"][port] = Interface(port, "", "lag_member", lag_id=str(p % 8 + 1))
+            else:
+                data["interfaces"][port] = Interface(port, f"desk-{m}-{p}", "access", (p % vlans) + 1,
+                                                     shutdown=(p % 11 == 0))
+
+    for i in range(routes):
+        data["routes"].append(Route(f"10.{i // 256}.{i % 256}.0", "255.255.255.0", "10.0.0.254"))
+    return data
+
+
+def legacy_export_pandas(conv):
+    """ สำเนาของ export_to_excel เดิม (ก่อนเปลี่ยนเป็น constant_memory) ไว้เทียบผล """
+    import pandas as pd
+
+    output = io.BytesIO()
+    writer = pd.ExcelWriter(output, engine='xlsxwriter')
+    data = conv.data
+
+    pd.DataFrame([
+        {'Parameter': 'Hostname', 'Value': data.get('hostname', '')},
+        {'Parameter': 'Banner', 'Value': 'Configured' if data.get('banner') else 'None'},
+        {'Parameter': 'VLAN_Count', 'Value': len(data.get('vlans', {}))},
+        {'Parameter': 'Interface_Count', 'Value': len(data.get('interfaces', {}))},
+        {'Parameter': 'Route_Count', 'Value': len(data.get('routes', []))}
+    ]).to_excel(writer, sheet_name='Global', index=False)
+
+    pd.DataFrame([
+        {'ID': vid, 'Name': v.name, 'IPv4': v.ip, 'Mask': v.mask, 'IPv6': v.ipv6}
+        for vid, v in data['vlans'].items()
+    ]).to_excel(writer, sheet_name='VLANs', index=False)
+
+    iface_list = []
+    for port in sorted(data['interfaces'].keys(), key=conv._iface_sort_key):
+        i = data['interfaces'][port]
+        iface_list.append({
+            'Port': port,
+            'Description': i.description,
+            'Role': i.role if i.role else '',
+            'Access_VLAN': i.access_vlan if i.role == 'access' else '',
+            'Native_VLAN': i.native_vlan if i.role == 'trunk' else '',
+            'Allowed_VLANs': str(i.allowed_vlans),
+            'LAG_ID': i.lag_id if i.lag_id else '',
+            'Shutdown': 'Yes' if i.shutdown else 'No'
+        })
+    pd.DataFrame(iface_list).to_excel(writer, sheet_name='Interfaces', index=False)
+
+    pd.DataFrame([
+        {'Destination': r.dest, 'Mask': r.mask, 'Next_Hop': r.next_hop} for r in data['routes']
+    ]).to_excel(writer, sheet_name='Routes', index=False)
+
+    workbook = writer.book
+    worksheet = writer.sheets['Interfaces']
+    header_fmt = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'middle', 'border': 1, 'bg_color': '#D9E1F2'})
+    access_fmt = workbook.add_format({'bg_color': '#E2EFDA', 'border': 1})
+    trunk_fmt = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1})
+    default_fmt = workbook.add_format({'border': 1})
+    shutdown_fmt = workbook.add_format({'bg_color': '#F8CBAD', 'border': 1})
+
+    for col_num, col_name in enumerate(pd.DataFrame(iface_list).columns):
+        worksheet.write(0, col_num, col_name, header_fmt)
+    worksheet.freeze_panes(1, 0)
+    worksheet.autofilter(0, 0, len(iface_list), len(iface_list[0]) - 1)
+    for row_idx, row in enumerate(iface_list, start=1):
+        if row['Shutdown'] == 'Yes': fmt = shutdown_fmt
+        elif row['Role'] == 'access': fmt = access_fmt
+        elif row['Role'] == 'trunk': fmt = trunk_fmt
+        else: fmt = default_fmt
+        worksheet.set_row(row_idx, None, fmt)
+
+    writer.close()
+    output.seek(0)
+    return output.read()
+
+
+def measure(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    size = len(fn())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--members', type=int, default=9)
+    ap.add_argument('--ports', type=int, default=52)
+    ap.add_argument('--vlans', type=int, default=4094)
+    ap.add_argument('--routes', type=int, default=2000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    conv = ConfigConverter.from_model(build_model(args.members, args.ports, args.vlans, args.routes), "aruba_cx")
+    print(f"model: {len(conv.data['interfaces'])} ports, {len(conv.data['vlans'])} vlans, {len(conv.data['routes'])} routes")
+
+    rows = [("xlsxwriter constant_memory", conv.export_to_excel)]
+    try:
+        import pandas  # noqa: F401
+        rows.append(("pandas DataFrame (legacy)", lambda: legacy_export_pandas(conv)))
+    except ImportError:
+        print("pandas not installed -> skip legacy path")
+
+    print(f"{'path':<30} {'best (ms)':>10} {'peak (MB)':>10} {'xlsx (KB)':>10}")
+    for name, fn in rows:
+        best, peak, size = measure(fn, args.repeat)
+        print(f"{name:<30} {best * 1000:>10.1f} {peak / 1024 / 1024:>10.2f} {size / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: เวลา cold import ของ app.py (สิ่งที่ทุก gunicorn/eventlet worker ต้องจ่ายตอน start)
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --runs 7 --budget-ms 800
+
+- วัดจาก `python -X importtime -c "import app"` ใน process ใหม่ทุกครั้ง (ไม่มี cache ใน sys.modules)
+- เช็คด้วยว่าโมดูลหนัก (netmiko, paramiko, pandas, openpyxl, xlsxwriter, pymongo client) ไม่ถูกโหลดตอน import
+- exit code 1 ถ้าค่า median เกิน budget หรือมีโมดูลหนักหลุดเข้ามา
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('netmiko', 'paramiko', 'pandas', 'openpyxl', 'xlsxwriter', 'pymongo.mongo_client')
+
+
+def import_once(module):
+    """ คืน (เวลา import สะสมของ module เป็น ms, top 5 โมดูลลูกที่ช้าที่สุด) """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'import failed')
+
+    total_us = None
+    children = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line: continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        if not cumulative.strip().isdigit(): continue   # header
+        cumulative, name = int(cumulative), name[1:]      # ตัด space คั่นหน้า ให้เหลือแต่ indent
+        if name == module:
+            total_us = cumulative
+        elif name.startswith('  ') and not name.startswith('   '):
+            # indent 2 ช่อง = import ตรงจาก module ที่วัด
+            children.append((cumulative, name.strip()))
+
+    children.sort(reverse=True)
+    return total_us / 1000 if total_us else 0.0, children[:5]
+
+
+def loaded_heavy_modules(module):
+    code = f"import {module}, sys, json; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]) if proc.returncode == 0 else ['<import failed>']
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--module', default='app')
+    ap.add_argument('--runs', type=int, default=5)
+    ap.add_argument('--budget-ms', type=float, default=1000.0)
+    args = ap.parse_args()
+
+    times = []
+    top = []
+    for _ in range(args.runs):
+        ms, top = import_once(args.module)
+        times.append(ms)
+
+    median = statistics.median(times)
+    print(f"import {args.module}: median {median:.1f} ms, min {min(times):.1f} ms, max {max(times):.1f} ms ({args.runs} runs)")
+    print("slowest direct imports (last run):")
+    for us, name in top:
+        print(f"  {name:<30} {us / 1000:>8.1f} ms")
+
+    heavy = loaded_heavy_modules(args.module)
+    print(f"heavy modules loaded at import: {heavy if heavy else 'none'}")
+
+    ok = median <= args.budget_ms and not heavy
+    print(f"budget {args.budget_ms:.0f} ms -> {'OK' if ok else 'OVER BUDGET'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Benchmark: SSH_ENGINE=thread (netmiko) เทียบกับ SSH_ENGINE=asyncio (ssh_async) ผ่าน app.iter_on_devices ตัวจริง
+(scheduler + โควต้า + ก้อน + process pool เหมือน job ของ app) ยิงไปที่ fake device server บนเครื่อง
+(asyncssh server จำลอง shell ของ Comware: <FAKE-devN>, system-view, pager ...)
+- server รันเป็น process แยก (--servers ตัว) จะได้ไม่แย่ง CPU กับ engine ที่วัด
+- แต่ละ engine รันใน process ของตัวเอง -> peak RSS (ru_maxrss) ไม่ปนกัน (asyncio รายงาน worker process แยก)
+- --concurrency ตั้ง DEVICE_SCHED_* ทั้งสามค่า (ไม่ระบุ = default ของ app), --profiles กระจายอุปกรณ์หลาย profile
+- --op backup ส่งคำสั่ง backup แต่ไม่เขียน DB (วัดเฉพาะ SSH)
+- --latency จำลองเวลาที่อุปกรณ์ใช้ตอบคำสั่ง, --login-latency จำลอง banner/auth ที่ช้า
+
+    python benchmarks/bench_ssh_engine.py --devices 200
+    python benchmarks/bench_ssh_engine.py --devices 1000 --concurrency 500 --profiles 10 --op backup --json /tmp/ssh.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+BASE_PORT = 22022
+COMMAND = "display version"
+
+
+# ================= FAKE DEVICE SERVER =================
+def serve(port, latency, login_latency):
+    import asyncio
+    import asyncssh
+    from synthetic_config import PRESETS, generate_comware, load_seed
+
+    config = generate_comware(*PRESETS["48p"], seed=load_seed()).replace("\n", "\r\n")
+
+    class Server(asyncssh.SSHServer):
+        def begin_auth(self, username): return True
+        def password_auth_supported(self): return True
+        def validate_password(self, username, password): return True
+
+    async def shell(process):
+        name = f"FAKE-{process.get_extra_info('username')}"
+        system_view = False
+        await asyncio.sleep(login_latency)
+        process.stdout.write(f"\r\n******************************************\r\n* fake device {name} *\r\n"
+                             f"******************************************\r\n<{name}>")
+        try:
+            while True:
+                line = (await process.stdin.readline())
+                if not line: break
+                cmd = line.strip()
+                out = ""
+                if cmd:
+                    await asyncio.sleep(latency)
+                if cmd == "screen-length disable":
+                    out = "Info: Screen-length configuration is disabled for current user.\r\n"
+                elif cmd.startswith("dis") and "cur" in cmd:
+                    out = config
+                elif cmd.startswith("dis"):
+                    out = f"HPE Comware Software, Version 7.1.070, Release 3208P08\r\n{name} uptime is 0 weeks\r\n"
+                elif cmd == "system-view":
+                    system_view = True
+                    out = "System View: return to User View with Ctrl+Z.\r\n"
+                elif cmd == "return":
+                    system_view = False
+                elif cmd == "quit" and not system_view:
+                    break
+                process.stdout.write(out + (f"[{name}]" if system_view else f"<{name}>"))
+        except (asyncssh.BreakReceived, asyncssh.TerminalSizeChanged, ConnectionError):
+            pass
+        process.exit(0)
+
+    async def main():
+        key = asyncssh.generate_private_key("ssh-ed25519")
+        await asyncssh.create_server(Server, "127.0.0.1", port, server_host_keys=[key],
+                                     process_factory=shell, backlog=4096)
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def wait_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"fake server on {port} did not start")
+
+
+# ================= ENGINES =================
+def make_devices(devices, servers, profiles):
+    return [{
+        '_id': f"dev{i}",
+        'hostname': f"dev{i}",
+        'device_type': 'hp_comware',
+        'ip_address': '127.0.0.1',
+        'port': BASE_PORT + (i % servers),
+        'username': f"dev{i}",
+        'password': 'bench',
+        'profile_id': f"profile{i % profiles}",
+    } for i in range(devices)]
+
+
+def payload(op):
+    return {"command": COMMAND, "backup": "display current-configuration",
+            "config": ["vlan 10", "name BENCH", "quit"]}[op]
+
+
+def run_engine(engine, devices, servers, op, concurrency, profiles):
+    os.environ['SSH_ENGINE'] = engine
+    if concurrency:
+        for key in ('DEVICE_SCHED_MAX_CONCURRENT', 'DEVICE_SCHED_PER_USER', 'DEVICE_SCHED_PER_PROFILE'):
+            os.environ[key] = str(concurrency)
+    import app
+
+    sched = app.scheduler
+    in_flight = min(devices, sched.max_concurrent, sched.per_user, sched.per_profile * profiles)
+    t0 = time.perf_counter()
+    # backup -> ส่งเป็น command (ไม่ผ่าน record_backup / DB)
+    results = list(app.iter_on_devices('command' if op == 'backup' else op, make_devices(devices, servers, profiles),
+                                       payload(op), user='bench'))
+    wall = time.perf_counter() - t0
+
+    row = {
+        "engine": engine,
+        "op": op,
+        "devices": devices,
+        "concurrency": in_flight,
+        "success": sum(r['status'] == 'Success' for r in results),
+        "wall_s": round(wall, 2),
+        "devices_per_s": round(devices / wall, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "worker_rss_mb": None,
+    }
+    if engine == "asyncio":
+        import ssh_async
+        ssh_async.get_pool().shutdown(wait=True)   # worker จบแล้ว RUSAGE_CHILDREN ถึงนับ
+        row["worker_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    return row
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--devices', type=int, default=200)
+    ap.add_argument('--op', choices=['command', 'backup', 'config'], default='command')
+    ap.add_argument('--engine', action='append', choices=['thread', 'asyncio'], help='ระบุซ้ำได้ (default: ทั้งสองแบบ)')
+    ap.add_argument('--concurrency', type=int, default=0, help='DEVICE_SCHED_* ของ scheduler (0 = default ของ app)')
+    ap.add_argument('--profiles', type=int, default=1, help='จำนวน profile ที่อุปกรณ์กระจายอยู่')
+    ap.add_argument('--servers', type=int, default=2, help='จำนวน process ของ fake server')
+    ap.add_argument('--latency', type=float, default=0.2, help='วินาทีที่อุปกรณ์ใช้ตอบแต่ละคำสั่ง')
+    ap.add_argument('--login-latency', type=float, default=0.5)
+    ap.add_argument('--json', help='เขียนผลเป็น JSON ลงไฟล์นี้')
+    # ใช้ภายใน
+    ap.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    ap.add_argument('--child', choices=['thread', 'asyncio'], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.latency, args.login_latency)
+    if args.child:
+        r = run_engine(args.child, args.devices, args.servers, args.op, args.concurrency, args.profiles)
+        print(json.dumps(r))
+        return
+
+    me = os.path.abspath(__file__)
+    servers = [
+        subprocess.Popen([sys.executable, me, '--serve', str(BASE_PORT + i),
+                          '--latency', str(args.latency), '--login-latency', str(args.login_latency)])
+        for i in range(args.servers)
+    ]
+    rows = []
+    try:
+        for i in range(args.servers):
+            wait_port(BASE_PORT + i)
+        print(f"{'engine':<8} {'op':<8} {'devices':>8} {'in flight':>10} {'ok':>6} {'wall s':>8} {'dev/s':>8} "
+              f"{'peak MB':>8} {'worker MB':>10}")
+        for engine in args.engine or ['thread', 'asyncio']:
+            out = subprocess.run(
+                [sys.executable, me, '--child', engine, '--devices', str(args.devices), '--servers', str(args.servers),
+                 '--op', args.op, '--concurrency', str(args.concurrency), '--profiles', str(args.profiles)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            rows.append(r)
+            print(f"{r['engine']:<8} {r['op']:<8} {r['devices']:>8} {r['concurrency']:>10} {r['success']:>6} "
+                  f"{r['wall_s']:>8} {r['devices_per_s']:>8} {r['peak_rss_mb']:>8} {r['worker_rss_mb'] or '-':>10}")
+    finally:
+        for p in servers:
+            p.terminate()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"saved -> {args.json}")
+
+
+if __name__ == '__main__':
+    main()
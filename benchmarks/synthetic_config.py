@@ -0,0 +1,182 @@
+"""
+Synthetic config generator สำหรับ benchmark ของ converter.py
+
+ใช้ log จริง (172.17.61.250 B3F1-14-20-04.log) เป็น seed:
+- preamble / banner / ส่วนท้าย (ntp, ssh, user-interface) ยกมาจาก log จริง
+- ชื่อ VLAN และ description ของพอร์ตวนจากค่าที่เจอใน log
+แล้วขยายจำนวน member / port / VLAN / route ตามขนาดที่ต้องการ
+
+    from benchmarks.synthetic_config import load_seed, generate_comware, generate_cisco, PRESETS
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from converter import index_stanzas
+
+SEED_LOG = os.path.join(ROOT, "172.17.61.250 B3F1-14-20-04.log")
+
+# name -> (members, ports ต่อ member, vlans, routes)
+PRESETS = {
+    "48p":        (1, 48, 64, 10),
+    "stack4":     (4, 48, 512, 200),
+    "stack9":     (9, 48, 2048, 1000),
+    "stack9-max": (9, 48, 4094, 5000),
+}
+
+
+class Seed:
+    def __init__(self, preamble, banner, tail, vlan_names, descriptions):
+        self.preamble = preamble          # list ของ global lines ก่อน vlan ตัวแรก
+        self.banner = banner              # เนื้อหา header legal
+        self.tail = tail                  # list ของ stanza ท้าย config (ntp, ssh, user-interface ...)
+        self.vlan_names = vlan_names
+        self.descriptions = descriptions
+
+
+def load_seed(path=SEED_LOG):
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        text = f.read()
+    if "display current-configuration" in text:
+        text = text.split("display current-configuration", 1)[1]
+
+    preamble, tail = [], []
+    banner = ""
+    vlan_names, descriptions = [], []
+    seen_vlan = False
+
+    for st in index_stanzas(text):
+        head = st["head"]
+        if head.startswith("vlan "):
+            seen_vlan = True
+            for line in st["lines"]:
+                if line.startswith("description "): vlan_names.append(line[12:].strip())
+        elif head.startswith("interface "):
+            for line in st["lines"]:
+                if line.startswith("description "): descriptions.append(line[12:].strip())
+        elif head.startswith("header "):
+            banner = "\n".join(st["lines"]).strip()
+        elif head.startswith(("sysname", "return", "ip route-static", "ipv6 route-static")):
+            continue
+        elif not seen_vlan:
+            preamble.append(st)
+        elif head.startswith(("ntp-service", "ssh ", "user-interface", "info-center", "snmp-agent")):
+            tail.append(st)
+
+    return Seed(preamble, banner, tail,
+                vlan_names or ["DATA", "VOICE"],
+                descriptions or ["uplink"])
+
+
+def _emit_stanza(out, st, indent=""):
+    out.append(f"{indent}{st['head']}")
+    for line in st["lines"]:
+        out.append(f"{indent} {line}")
+
+
+def _port_role(p, ports):
+    """ รูปแบบพอร์ต: 2 พอร์ตท้ายเป็น LAG member, 2 พอร์ตก่อนหน้าเป็น trunk, ที่เหลือ access """
+    if p > ports - 2: return "lag"
+    if p > ports - 4: return "trunk"
+    return "access"
+
+
+def generate_comware(members, ports, vlans, routes, seed=None, hostname="SYN-COMWARE"):
+    seed = seed or load_seed()
+    out = ["display current-configuration", "#"]
+    for st in seed.preamble:
+        _emit_stanza(out, st, " " if not st["lines"] else "")
+        out.append("#")
+    out.append(f" sysname {hostname}")
+    out.append("#")
+
+    names = seed.vlan_names
+    for vid in range(1, vlans + 1):
+        out.append(f"vlan {vid}")
+        out.append(f" description {names[vid % len(names)]}-{vid}")
+        out.append("#")
+
+    for lag in range(1, members + 1):
+        out += [f"interface Bridge-Aggregation{lag}", " port link-type trunk",
+                f" port trunk permit vlan 1 to {vlans}", " link-aggregation mode dynamic", "#"]
+
+    for vid in range(1, min(vlans, 250) + 1):
+        out += [f"interface Vlan-interface{vid}", f" ip address 10.{vid // 256}.{vid % 256}.1 255.255.255.0",
+                f" ipv6 address 2001:DB8:{vid:X}::1/64", "#"]
+
+    descs = seed.descriptions
+    for m in range(1, members + 1):
+        for p in range(1, ports + 1):
+            out.append(f"interface GigabitEthernet{m}/0/{p}")
+            role = _port_role(p, ports)
+            if p % 5 == 0: out.append(f" description {descs[p % len(descs)]}")
+            if role == "access":
+                out.append(f" port access vlan {(p % vlans) + 1}")
+                if p % 13 == 0: out.append(" shutdown")
+            else:
+                out += [" port link-type trunk", f" port trunk permit vlan 1 2 to {vlans}"]
+                if role == "lag": out.append(f" port link-aggregation group {m}")
+            out.append("#")
+        for p in range(1, 5):
+            out += [f"interface Ten-GigabitEthernet{m}/1/{p}", "#"]
+
+    for i in range(routes):
+        out.append(f" ip route-static 172.{16 + i // 65536 % 16}.{i // 256 % 256}.{i % 256} 255.255.255.255 10.0.1.254")
+    out.append("#")
+
+    out.append(" header legal %")
+    out.append(seed.banner + "%")
+    out.append("#")
+    for st in seed.tail:
+        _emit_stanza(out, st, " " if not st["lines"] else "")
+        out.append("#")
+    out.append("return")
+    return "\n".join(out) + "\n"
+
+
+def generate_cisco(members, ports, vlans, routes, seed=None, hostname="SYN-CISCO"):
+    seed = seed or load_seed()
+    out = ["show running-config", "Building configuration...", "!", f"hostname {hostname}", "!",
+           "banner motd ^", seed.banner, "^", "!"]
+
+    names = seed.vlan_names
+    for vid in range(1, vlans + 1):
+        out += [f"vlan {vid}", f" name {names[vid % len(names)]}-{vid}", "!"]
+
+    for lag in range(1, members + 1):
+        out += [f"interface Port-channel{lag}", " switchport mode trunk", "!"]
+
+    descs = seed.descriptions
+    for m in range(1, members + 1):
+        for p in range(1, ports + 1):
+            out.append(f"interface GigabitEthernet{m}/0/{p}")
+            role = _port_role(p, ports)
+            if p % 5 == 0: out.append(f" description {descs[p % len(descs)]}")
+            if role == "access":
+                out += [f" switchport access vlan {(p % vlans) + 1}", " switchport mode access"]
+                if p % 13 == 0: out.append(" shutdown")
+            else:
+                out += [" switchport trunk native vlan 1", f" switchport trunk allowed vlan 1,2-{vlans}",
+                        " switchport mode trunk"]
+                if role == "lag": out.append(f" channel-group {m} mode active")
+            out.append("!")
+
+    for vid in range(1, min(vlans, 250) + 1):
+        out += [f"interface Vlan{vid}", f" ip address 10.{vid // 256}.{vid % 256}.1 255.255.255.0", "!"]
+
+    for i in range(routes):
+        out.append(f"ip route 172.{16 + i // 65536 % 16}.{i // 256 % 256}.{i % 256} 255.255.255.255 10.0.1.254")
+    out += ["!", "end"]
+    return "\n".join(out) + "\n"
+
+
+GENERATORS = {"hp_comware": generate_comware, "cisco_ios": generate_cisco}
+
+
+if __name__ == "__main__":
+    # python benchmarks/synthetic_config.py hp_comware stack4 > /tmp/stack4.log
+    platform = sys.argv[1] if len(sys.argv) > 1 else "hp_comware"
+    preset = sys.argv[2] if len(sys.argv) > 2 else "48p"
+    sys.stdout.write(GENERATORS[platform](*PRESETS[preset]))
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+
+
+# ================= BUFFERED BULK WRITER =================
+# เดิม task_backup แต่ละ thread insert_one เอง -> 500 เครื่อง = 500 round-trip ไป Atlas แย่งเวลากับ SSH
+# ตอนนี้งานต่ออุปกรณ์แค่ put() ลงคิว แล้ว flush thread เขียนเป็นก้อน (insert_many / bulk_write แบบ unordered)
+# - flush เมื่อครบ batch_size หรือครบ flush_interval วินาทีนับจาก item แรกของก้อน
+# - คิวจำกัดขนาด (max_queue): DB ช้า/ล่ม -> put() รอ (backpressure) แทนที่ memory จะโตไม่จำกัด
+# - flush(): รอจนทุกอย่างที่ put ไปแล้วถูกเขียน, close(): flush รอบสุดท้าย (ผูกกับ atexit)
+# - เขียนพลาด -> retry แบบ backoff (retries ครั้ง) ถ้ายังพลาดเก็บ item ไว้ (held) แล้วเขียนซ้ำพร้อมก้อนถัดไป / ตอน close()
+#   flush() คืน False ถ้ายังมีของที่เขียนไม่ได้ -> ผู้เรียนต้องแจ้ง error เอง (write ต้องเขียนซ้ำได้โดยไม่เกิดข้อมูลซ้ำ)
+#
+#   writer = BufferedWriter(lambda items: coll.insert_many(items, ordered=False))
+#   writer.put({'...': ...})
+
+_STOP = object()
+
+
+class _Flush:
+    """ marker ในคิว: flush thread เขียนทุกอย่างที่อยู่ก่อนหน้าแล้วค่อย set() """
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class BufferedWriter:
+    def __init__(self, write, batch_size=200, flush_interval=1.0, max_queue=2000, name="bulk-writer",
+                 retries=3, retry_backoff=0.5):
+        self.write = write                    # callable(list ของ item) -> เขียนทั้งก้อน
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_held = max_queue             # เก็บของที่เขียนไม่ได้ไว้ไม่เกินขนาดคิว (DB ล่มนาน -> ทิ้งตัวเก่าสุด)
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = 0                     # put แล้วแต่ยังเขียนไม่เสร็จ
+        self._held = []                       # เขียนไม่ได้หลัง retry ครบ -> รอเขียนซ้ำ
+        self._thread = None
+        self._closed = False
+
+        self.written = 0
+        self.retried = 0
+        self.dropped = 0
+        self.batches = 0
+        self.blocked = 0                      # จำนวนครั้งที่ put ต้องรอเพราะคิวเต็ม
+
+    # ---------- Public ----------
+    def put(self, item):
+        if self._closed:
+            # ปิดไปแล้ว (กำลัง shutdown) -> เขียนตรง
+            self._write_batch([item], counted=False)
+            return
+        self._start()
+        with self._lock:
+            self._pending += 1
+        if self._queue.full():
+            self.blocked += 1
+        self._queue.put(item)
+
+    def flush(self, timeout=30):
+        """ รอจน item ที่ put ไปแล้วทั้งหมดถูกเขียน (ไม่รอครบ flush_interval)
+            คืน False ถ้าหมดเวลา หรือยังมี item ที่เขียนไม่ได้ค้างอยู่ """
+        if self._thread is None: return not self._held
+        marker = _Flush()
+        self._queue.put(marker)
+        if not marker.done.wait(timeout): return False
+        return not self._held
+
+    def close(self, timeout=30):
+        """ flush รอบสุดท้ายแล้วหยุด thread (ถ้า thread ไม่ตอบ -> เขียนที่เหลือใน thread ที่เรียกเอง) """
+        if self._closed: return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _Flush):
+                item.done.set()
+            elif item is not _STOP:
+                leftovers.append(item)
+        for i in range(0, len(leftovers), self.batch_size):
+            self._write_batch(leftovers[i:i + self.batch_size])
+        if self._held:
+            self._write_batch([], counted=False)    # รอบสุดท้ายของที่เคยเขียนไม่ได้
+        if self._held:
+            self.dropped += len(self._held)
+            print(f"❌ {self.name}: {len(self._held)} item(s) could not be written before shutdown")
+            self._held = []
+
+    @property
+    def failed(self):
+        """ จำนวน item ที่ยังเขียนไม่ได้ (รอเขียนซ้ำ) """
+        return len(self._held)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "pending": self._pending,
+            "written": self.written,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "blocked": self.blocked,
+        }
+
+    # ---------- Internal ----------
+    def _start(self):
+        if self._thread is not None: return
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch, markers, stop = self._collect()
+            if batch or (markers and self._held):    # flush ที่ไม่มีของใหม่ -> ลองเขียนของที่ค้างอีกรอบ
+                self._write_batch(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def _collect(self):
+        """ รอ item แรก แล้วเก็บต่อจนครบ batch_size / หมดเวลา flush_interval / เจอ marker """
+        batch = []
+        markers = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                return batch, markers, True
+            if isinstance(item, _Flush):
+                markers.append(item)    # เก็บของที่ค้างในคิวตอนนี้ไปด้วย แล้วเขียนทันทีไม่รอ window
+            else:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    return batch, markers, False
+
+            remaining = deadline - time.monotonic()
+            try:
+                if markers or remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, markers, False
+
+    def _write_batch(self, batch, counted=True):
+        with self._write_lock:
+            items = self._held + batch       # ของที่ค้างจากรอบก่อนเขียนไปพร้อมกัน
+            self._held = []
+            try:
+                for attempt in range(self.retries + 1):
+                    try:
+                        self.write(items)
+                        self.written += len(items)
+                        break
+                    except Exception as e:
+                        if attempt == self.retries:
+                            print(f"❌ {self.name}: failed to write {len(items)} item(s) after {attempt + 1} attempts: {e}")
+                            self._hold(items)
+                        else:
+                            self.retried += 1
+                            print(f"⚠️ {self.name}: write failed ({e}), retrying")
+                            time.sleep(self.retry_backoff * 2 ** attempt)
+            finally:
+                self.batches += 1
+                if counted:
+                    with self._lock:
+                        self._pending -= len(batch)
+
+    def _hold(self, items):
+        overflow = len(items) - self.max_held
+        if overflow > 0:
+            self.dropped += overflow
+            print(f"❌ {self.name}: dropped {overflow} oldest unwritten item(s)")
+            items = items[overflow:]
+        self._held = items
@@ -0,0 +1,211 @@
+# ================= CONFIG MODEL (Intermediate Representation) =================
+# โครงสร้างข้อมูลกลางระหว่าง Parser -> Generator/Exporter
+# - ใช้ __slots__ ทุก record (ไม่มี __dict__ ต่อ object -> ประหยัด memory)
+# - VLAN membership เก็บเป็น bitmap 4096 bit (int ตัวเดียว) แทน set ของ int
+
+from functools import lru_cache
+
+VLAN_BITS = 4096                    # VLAN ID เป็นเลข 12 bit (0-4095)
+_ALL_BITS = (1 << VLAN_BITS) - 1
+
+
+class VlanSet:
+    """ ชุด VLAN แบบ bitmap: bit ที่ n = VLAN n อยู่ในชุด """
+    __slots__ = ("bits",)
+
+    def __init__(self, bits=0):
+        self.bits = bits & _ALL_BITS
+
+    @classmethod
+    def from_iterable(cls, vids):
+        vs = cls()
+        for vid in vids:
+            vs.add(vid)
+        return vs
+
+    # ---------- แก้ไข ----------
+    def add(self, vid):
+        if 0 <= vid < VLAN_BITS:
+            self.bits |= 1 << vid
+
+    def add_range(self, start, end):
+        """ เพิ่มช่วง start-end (รวมปลายทั้งสองข้าง) ด้วย mask เดียว """
+        start = max(start, 0)
+        end = min(end, VLAN_BITS - 1)
+        if start > end: return
+        self.bits |= ((1 << (end - start + 1)) - 1) << start
+
+    def discard(self, vid):
+        if 0 <= vid < VLAN_BITS:
+            self.bits &= ~(1 << vid)
+
+    def copy(self):
+        return VlanSet(self.bits)
+
+    # ---------- Query ----------
+    def __contains__(self, vid):
+        return 0 <= vid < VLAN_BITS and (self.bits >> vid) & 1 == 1
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __eq__(self, other):
+        return isinstance(other, VlanSet) and self.bits == other.bits
+
+    __hash__ = None  # mutable -> ห้ามใช้เป็น key (ใช้ .bits แทน)
+
+    def __iter__(self):
+        for start, end in self.ranges():
+            yield from range(start, end + 1)
+
+    # ---------- Set Operations ----------
+    def __or__(self, other):
+        return VlanSet(self.bits | other.bits)
+
+    def __ior__(self, other):
+        self.bits |= other.bits
+        return self
+
+    def __and__(self, other):
+        return VlanSet(self.bits & other.bits)
+
+    def __sub__(self, other):
+        return VlanSet(self.bits & ~other.bits)
+
+    # ---------- Render ----------
+    def ranges(self):
+        """ คืน [(start, end), ...] โดยกระโดดทีละช่วง (ไม่ไล่ทีละ bit) """
+        out = []
+        bits = self.bits
+        while bits:
+            start = (bits & -bits).bit_length() - 1
+            run = bits >> start
+            # จำนวน bit 1 ที่ติดกันจาก start = ตำแหน่ง bit 0 ตัวแรกของ run
+            length = (~run & (run + 1)).bit_length() - 1
+            out.append((start, start + length - 1))
+            bits &= ~(((1 << length) - 1) << start)
+        return out
+
+    def __str__(self):
+        """ '10-20,30' """
+        return ",".join(f"{s}-{e}" if e > s else str(s) for s, e in self.ranges())
+
+    def __repr__(self):
+        return f"VlanSet('{self}')"
+
+
+class Vlan:
+    __slots__ = ("vid", "name", "ip", "mask", "ipv6")
+
+    def __init__(self, vid, name=None, ip="", mask="", ipv6=""):
+        self.vid = vid
+        self.name = name if name else f"VLAN_{vid}"
+        self.ip = ip
+        self.mask = mask
+        self.ipv6 = ipv6
+
+
+@lru_cache(maxsize=8192)
+def port_sort_key(port):
+    """ key สำหรับเรียงพอร์ต: lag ก่อน แล้วตาม member/slot/port (memo ไว้ เพราะชื่อพอร์ตซ้ำกันเยอะ) """
+    if port.startswith("lag"):
+        num = port[3:]
+        return (0, 0, 0, int(num) if num.isdigit() else 0)
+    parts = port.split("/")
+    if len(parts) == 3 and all(p.isdigit() for p in parts):
+        return (1, int(parts[0]), int(parts[1]), int(parts[2]))
+    return (9, 0, 0, 0)
+
+
+class Interface:
+    __slots__ = ("port", "description", "role", "access_vlan", "native_vlan",
+                 "allowed_vlans", "lag_id", "shutdown", "sort_key",
+                 "link", "speed", "pvid")
+
+    def __init__(self, port, description="", role=None, access_vlan=1, native_vlan=1,
+                 allowed_vlans=None, lag_id=None, shutdown=False, link=None, speed="", pvid=None):
+        self.port = port
+        self.description = description
+        self.role = role                    # 'access' | 'trunk' | 'lag_member' | None
+        self.access_vlan = access_vlan
+        self.native_vlan = native_vlan
+        self.allowed_vlans = allowed_vlans if allowed_vlans is not None else VlanSet()
+        self.lag_id = lag_id
+        self.shutdown = shutdown
+        self.sort_key = port_sort_key(port)   # คำนวณครั้งเดียวตอนสร้าง ไม่ต้อง split ทุกครั้งที่ sort
+        # ข้อมูล operational จาก display interface brief / show interfaces status (None = ไม่มีใน log)
+        self.link = link                      # 'UP' | 'DOWN' | 'ADM'
+        self.speed = speed                    # ตามที่อุปกรณ์แสดง เช่น '1G(a)', 'a-1000'
+        self.pvid = pvid
+
+    def oper_state(self):
+        """ 'up' / 'down' (ไม่ได้ shutdown แต่ link down = ไม่มีอะไรต่อ) / 'admin_down' / None (ไม่มีข้อมูล) """
+        if self.link is None: return None
+        if self.link == "UP": return "up"
+        if self.link == "ADM" or self.shutdown: return "admin_down"
+        return "down"
+
+    def config_key(self):
+        """ ค่าที่ใช้เทียบว่าพอร์ตสองพอร์ต config เหมือนกันไหม (ไม่รวม description) """
+        return (self.role, self.access_vlan, self.native_vlan,
+                self.allowed_vlans.bits, self.lag_id, self.shutdown)
+
+
+class Route:
+    __slots__ = ("dest", "mask", "next_hop")
+
+    def __init__(self, dest, mask, next_hop):
+        self.dest = dest
+        self.mask = mask
+        self.next_hop = next_hop
+
+
+# ================= SERIALIZE (เก็บ model ลง Mongo / ส่งข้าม process) =================
+def model_to_doc(data):
+    """ แปลง ConfigConverter.data เป็น dict/list ธรรมดา (VlanSet -> [[start, end], ...]) """
+    return {
+        "hostname": data["hostname"],
+        "banner": data["banner"],
+        "vlans": [[v.vid, v.name, v.ip, v.mask, v.ipv6] for v in data["vlans"].values()],
+        "interfaces": [
+            [i.port, i.description, i.role, i.access_vlan, i.native_vlan,
+             [list(r) for r in i.allowed_vlans.ranges()], i.lag_id, i.shutdown,
+             i.link, i.speed, i.pvid]
+            for i in data["interfaces"].values()
+        ],
+        "routes": [[r.dest, r.mask, r.next_hop] for r in data["routes"]],
+        "diagnostics": data.get("diagnostics", []),
+    }
+
+
+def model_from_doc(doc):
+    interfaces = {}
+    # *oper: link/speed/pvid (doc ที่เก็บไว้ก่อนมีข้อมูล operational จะไม่มี 3 ช่องนี้)
+    for port, desc, role, acc, nat, ranges, lag_id, shutdown, *oper in doc["interfaces"]:
+        allowed = VlanSet()
+        for start, end in ranges:
+            allowed.add_range(start, end)
+        interfaces[port] = Interface(port, desc, role, acc, nat, allowed, lag_id, shutdown, *oper)
+
+    return {
+        "hostname": doc["hostname"],
+        "banner": doc["banner"],
+        "vlans": {v[0]: Vlan(*v) for v in doc["vlans"]},
+        "interfaces": interfaces,
+        "routes": [Route(*r) for r in doc["routes"]],
+        "diagnostics": doc.get("diagnostics", []),
+    }
+
+
+def port_state_summary(data):
+    """ สรุปสถานะพอร์ตจาก oper_state(): {'up': n, 'down': [...], 'admin_down': [...], 'unknown': n} """
+    summary = {"up": 0, "down": [], "admin_down": [], "unknown": 0}
+    for i in sorted(data["interfaces"].values(), key=lambda i: i.sort_key):
+        state = i.oper_state()
+        if state is None: summary["unknown"] += 1
+        elif state == "up": summary["up"] += 1
+        else: summary[state].append(i.port)
+    return summary
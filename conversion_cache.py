@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import datetime as dt
+from collections import OrderedDict
+
+from converter import CONVERTER_VERSION
+
+
+# ================= CONVERSION CACHE (LRU + Mongo TTL) =================
+# Cache ผลลัพธ์ของ ConfigConverter โดยใช้ hash ของ (CONVERTER_VERSION, source_type, target_type, content) เป็น key
+# (deploy ที่ผลลัพธ์เปลี่ยน -> เพิ่ม CONVERTER_VERSION -> key ใหม่ทั้งหมด ไม่ได้ผลเก่าจาก Mongo)
+# - ชั้นที่ 1: LRU ใน memory จำกัดด้วยจำนวน byte รวม (ไม่ใช่จำนวน entry)
+# - ชั้นที่ 2 (optional): Mongo collection + TTL index -> ผลลัพธ์อยู่รอดหลัง restart
+# - dump/load (optional): แปลง value ก่อนเก็บลง Mongo เช่น parsed model -> dict
+
+MAX_PERSIST_BYTES = 15 * 1024 * 1024   # Mongo document limit 16MB (เผื่อ overhead)
+
+
+class ConversionCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, collection=None, ttl_seconds=7 * 24 * 3600,
+                 dump=None, load=None):
+        self.max_bytes = max_bytes
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.dump = dump
+        self.load = load
+
+        self._entries = OrderedDict()   # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._index_ready = False
+
+        self.hits = 0
+        self.misses = 0
+        self.persist_hits = 0
+        self.evictions = 0
+        self.persist_errors = 0
+
+    @staticmethod
+    def make_key(source_type, target_type, content):
+        h = hashlib.sha256()
+        h.update(f"{CONVERTER_VERSION}\0{source_type}\0{target_type}\0".encode("utf-8"))
+        h.update(content if isinstance(content, bytes) else content.encode("utf-8"))
+        return h.hexdigest()
+
+    # ---------- Read ----------
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value, size = self._load_persisted(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+                self.persist_hits += 1
+            self._remember(key, value, size)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    # ---------- Write ----------
+    def put(self, key, value, size=None):
+        """ size: ขนาดโดยประมาณ (byte) ของ value ที่ไม่ใช่ str/bytes """
+        self._remember(key, value, size)
+        self._persist(key, value, size)
+
+    @staticmethod
+    def _size(value, size=None):
+        # ขนาดเป็น byte (str นับแบบ UTF-8 ไม่ใช่จำนวนตัวอักษร)
+        if size is not None: return size
+        return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+    def _remember(self, key, value, size=None):
+        size = self._size(value, size)
+        if size > self.max_bytes: return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self._bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            # ไล่ตัวที่ไม่ได้ใช้นานที่สุดออกจนกว่าจะอยู่ใน budget
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ---------- Mongo (optional) ----------
+    def _ensure_index(self):
+        if self._index_ready: return
+        self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        self._index_ready = True
+
+    def _load_persisted(self, key):
+        if self.collection is None: return None, None
+        try:
+            self._ensure_index()
+            doc = self.collection.find_one({"_id": key}, {"output": 1, "size": 1})
+            if not doc: return None, None
+            value = self.load(doc["output"]) if self.load else doc["output"]
+            return value, doc.get("size")
+        except Exception as e:
+            self.persist_errors += 1
+            print(f"⚠️ Conversion cache read failed: {e}")
+            return None, None
+
+    def _persist(self, key, value, size=None):
+        if self.collection is None: return
+        if self._size(value, size) > MAX_PERSIST_BYTES: return
+        try:
+            self._ensure_index()
+            self.collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "output": self.dump(value) if self.dump else value,
+                    "size": size,
+                    "created_at": dt.datetime.utcnow()
+                },
+                upsert=True
+            )
+        except Exception as e:
+            self.persist_errors += 1
+            print(f"⚠️ Conversion cache write failed: {e}")
+
+    # ---------- Stats ----------
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "persist_hits": self.persist_hits,
+                "evictions": self.evictions,
+                "persist_errors": self.persist_errors,
+                "persistent": self.collection is not None,
+            }
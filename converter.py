@@ -1,7 +1,235 @@
 import re
-import pandas as pd
 import io
-
+import os
+import time
+from functools import lru_cache
+
+from config_model import VlanSet, Vlan, Interface, Route, port_sort_key
+from session_log import SessionLog, INTERFACE_TABLE_COMMANDS, INTERFACE_TABLE_PARSERS
+
+# เวอร์ชันของผลลัพธ์ (parse / render / รูปแบบ model ใน config_model) -> อยู่ใน key ของ conversion cache และ parsed model
+# แก้ Parser / Generator / config_model จนผลลัพธ์ต่างจากเดิม = เพิ่มเลขนี้ (ผลเก่าใน Mongo จะไม่ถูกหยิบมาใช้อีก)
+CONVERTER_VERSION = 2
+
+
+# ================= TOKENIZER (Single-pass Stanza Index) =================
+# เดิม Parser ใช้ re.findall/re.search หลายรอบกับ raw_log ทั้งก้อน (hostname, banner, vlan, interface, svi, route)
+# ตอนนี้สแกนทีละบรรทัดครั้งเดียว แล้วสร้าง index ของ stanza ระดับบนสุดให้ Parser ทุกตัวใช้ร่วมกัน
+#   { "head": "interface GigabitEthernet1/0/1", "offset": 1234, "lines": ["port access vlan 61", ...] }
+
+_SEPARATORS = ("#", "!")
+_BANNER_KEYWORDS = ("header ", "banner ")
+_BUDGET_CHECK_LINES = 1024   # เช็คเวลาทุกๆ N บรรทัด (thread_time มี overhead)
+
+
+def _diag(diagnostics, code, offset, msg):
+    if diagnostics is not None:
+        diagnostics.append({"code": code, "offset": offset, "msg": msg})
+
+
+def index_stanzas(text, start=0, end=None, deadline=None, diagnostics=None):
+    """ แบ่ง config เป็น stanza ในรอบเดียว (O(n) ตามขนาด input)
+        - สแกนเฉพาะช่วง text[start:end] (ช่วงจาก SessionLog) ด้วย offset บน text เดิม ไม่ตัด/split ช่วงออกมาเป็นก้อนใหม่
+          (copy เฉพาะทีละบรรทัดที่กำลังอ่าน) offset ที่คืนเป็นตำแหน่งใน text เดิม
+        - บรรทัดที่ย่อหน้าลึกกว่าหัว stanza = บรรทัดลูก
+        - '#' (Comware) / '!' (Cisco) = ปิด stanza
+        - header/banner ที่มีตัวคั่น (เช่น %, ^C) จะเก็บเนื้อหาเป็น lines จนเจอตัวคั่นปิด
+          ถ้าไม่เจอตัวคั่นปิดจนจบ (log ขาด) -> เก็บแค่บรรทัดแรก แล้วสแกนต่อจากบรรทัดถัดไปตามปกติ
+        - deadline (ค่าของ time.thread_time()): ถ้าเกินจะหยุดสแกนแล้วคืนเท่าที่ได้
+        ปัญหาที่เจอระหว่างทางบันทึกลง diagnostics (list ของ {code, offset, msg})
+    """
+    stanzas = []
+    current = None
+    current_indent = -1
+    banner_delim = None
+    banner_resume = None     # (offset บรรทัดถัดจากหัว banner, stanza)
+    recovered = False
+    offset = start
+    stop = len(text) if end is None else end
+    count = 0
+    find = text.find
+
+    while True:
+        if offset > stop:
+            if banner_delim is None: break
+            # banner ไม่มีตัวคั่นปิด -> ย้อนกลับไปสแกนต่อหลังหัว banner (ทำได้ครั้งเดียว -> ไม่เกิน 2 รอบ)
+            offset, st = banner_resume
+            del st["lines"][1:]
+            _diag(diagnostics, "unterminated_banner", st["offset"],
+                  f"'{st['head'][:40]}' has no closing '{banner_delim}'; kept its first line only")
+            banner_delim = None
+            current = None
+            recovered = True
+            continue
+
+        if deadline is not None and count % _BUDGET_CHECK_LINES == 0 and time.thread_time() > deadline:
+            _diag(diagnostics, "parse_budget", offset, "Parse time budget exceeded; result is partial")
+            break
+        count += 1
+
+        eol = find("\n", offset, stop)
+        if eol < 0: eol = stop
+        line_offset = offset
+        line = text[offset:eol].rstrip("\r")
+        offset = eol + 1
+
+        # อยู่ใน banner: เก็บทุกบรรทัดจนเจอตัวคั่นปิด
+        if banner_delim is not None:
+            cut = line.find(banner_delim)
+            if cut < 0:
+                current["lines"].append(line)
+                continue
+            current["lines"].append(line[:cut])
+            banner_delim = None
+            current = None
+            continue
+
+        body = line.lstrip()
+        if not body: continue
+
+        if body.startswith(_SEPARATORS):
+            current = None
+            continue
+
+        indent = len(line) - len(body)
+        if current is not None and indent > current_indent:
+            current["lines"].append(body.rstrip())
+            continue
+
+        current = {"head": body.rstrip(), "offset": line_offset + indent, "lines": []}
+        current_indent = indent
+        stanzas.append(current)
+
+        if body.startswith(_BANNER_KEYWORDS) and not recovered:
+            # header legal %<text>%  /  banner motd ^C<text>^C
+            parts = body.split(None, 2)
+            if len(parts) == 3:
+                banner_delim = parts[2][0]
+                rest = parts[2][1:]
+                cut = rest.find(banner_delim)
+                if cut >= 0:
+                    current["lines"].append(rest[:cut])
+                    banner_delim = None
+                    current = None
+                else:
+                    current["lines"].append(rest)
+                    banner_resume = (offset, current)
+
+    return stanzas
+
+
+def _first_arg(lines, prefix):
+    """ คืนค่าหลัง prefix ของบรรทัดแรกที่ขึ้นต้นด้วย prefix (เช่น 'description ') """
+    for line in lines:
+        if line.startswith(prefix):
+            return line[len(prefix):].strip()
+    return None
+
+
+# ================= EXCEL HELPERS =================
+def _sheet_rows(ws, columns):
+    """ อ่าน sheet แบบ stream -> yield tuple ตามลำดับ columns (map หัวตารางครั้งเดียว)
+        คอลัมน์ที่ไม่มีในไฟล์จะได้ค่า None """
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None: return
+
+    pos = {str(h).strip(): i for i, h in enumerate(header) if h is not None}
+    idx = [pos.get(c) for c in columns]
+    width = len(header)
+
+    for row in rows:
+        if not any(v is not None for v in row): continue   # ข้ามแถวว่าง
+        if len(row) < width: row = tuple(row) + (None,) * (width - len(row))
+        yield tuple(row[i] if i is not None else None for i in idx)
+
+
+def _trunk_allowed(conf):
+    """ VLAN ที่ต้องใส่ใน 'vlan trunk allowed' (ไม่รวม native) """
+    allowed = conf.allowed_vlans.copy()
+    allowed.discard(conf.native_vlan)
+    return allowed
+
+
+def _port_ranges(ifaces):
+    """ Interface ที่เรียงแล้ว -> '1/1/1-1/1/4,1/1/9' (ยุบเฉพาะพอร์ตที่ติดกันใน member/slot เดียวกัน) """
+    parts = []
+    start = prev = None
+    for iface in ifaces:
+        key = iface.sort_key
+        if prev is not None and key[0] == 1 and prev.sort_key[:3] == key[:3] and key[3] == prev.sort_key[3] + 1:
+            prev = iface
+            continue
+        if start is not None:
+            parts.append(start.port if start is prev else f"{start.port}-{prev.port}")
+        start = prev = iface
+    if start is not None:
+        parts.append(start.port if start is prev else f"{start.port}-{prev.port}")
+    return ",".join(parts)
+
+
+def _cell_str(v):
+    """ ค่าใน cell -> str (None = '', 10.0 = '10') """
+    if v is None: return ''
+    if isinstance(v, float) and v.is_integer(): return str(int(v))
+    return str(v)
+
+
+def _cell_int(v, default):
+    if v is None or v == '': return default
+    return int(float(v))
+
+
+# ================= INTERFACE NAME MAPPING =================
+# เดิมลอง re.match ทีละ pattern (สูงสุด 4 ครั้ง) ต่อทุก interface
+# ตอนนี้แยกชื่อเป็น (prefix ตัวอักษร, ตัวเลข) ด้วย regex ที่ compile ไว้ครั้งเดียว แล้ว dispatch ด้วย dict ของ prefix
+# รองรับทั้งชื่อเต็มและชื่อย่อ (GE1/0/1, XGE1/0/49, BAGG1, Gi1/0/1, Po1 ...) ผลลัพธ์ memo ไว้ต่อชื่อ
+# ตาราง prefix ใช้ร่วมกันทุก platform เหมือนเดิม (log ปนกันระหว่าง Comware/Cisco ได้ และไม่มี prefix ไหนชนกัน)
+#   "phy" = พอร์ต physical, "lag" = Link Aggregation
+_IFACE_NAME_RE = re.compile(r"([A-Za-z][A-Za-z-]*?)\s*(\d+(?:/\d+)*)")
+
+_IFACE_PREFIXES = {
+    # HPE Comware
+    "gigabitethernet": "phy", "ge": "phy",
+    "ten-gigabitethernet": "phy", "xge": "phy",
+    "fortygige": "phy", "fge": "phy",
+    "bridge-aggregation": "lag", "bagg": "lag",
+    # Cisco IOS
+    "fastethernet": "phy", "fa": "phy",
+    "gi": "phy",
+    "tengigabitethernet": "phy", "te": "phy",
+    "twentyfivegige": "phy", "twe": "phy",
+    "fortygigabitethernet": "phy", "fo": "phy",
+    "port-channel": "lag", "po": "lag",
+}
+
+
+@lru_cache(maxsize=16384)
+def map_interface_name(name):
+    """ ชื่อ interface ของอุปกรณ์ต้นทาง -> ชื่อพอร์ต Aruba CX ('1/1/1', 'lag1') หรือ None """
+    m = _IFACE_NAME_RE.fullmatch(name.strip())
+    if not m: return None
+
+    kind = _IFACE_PREFIXES.get(m.group(1).lower())
+    if kind is None: return None
+
+    nums = m.group(2).split("/")
+    if kind == "lag":
+        return f"lag{nums[-1]}"
+
+    # member/slot/port: GigabitEthernet1/0/1 -> 1/1/1, Ten-GigabitEthernet1/1/1 -> 1/2/1
+    if len(nums) == 3:
+        return f"{nums[0]}/{int(nums[1]) + 1}/{nums[2]}"
+    # Cisco standalone (Fa0/1, Gi0/1) -> Map ง่ายๆ ไป Slot 1 หมด
+    if len(nums) == 2:
+        return f"1/1/{nums[1]}"
+    return None
+
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# CPU time สูงสุด (วินาที) ต่อการ parse หนึ่งครั้ง -> กัน log แปลกๆ ตรึง worker ไว้ (0 = ไม่จำกัด)
+PARSE_BUDGET_SECONDS = float(os.getenv('CONVERTER_PARSE_BUDGET', '10'))
 
 
 class ConfigConverter:
@@ -14,17 +242,49 @@ class ConfigConverter:
         
         # ถ้าส่งมาเป็น Text ให้ map เข้า raw_log ด้วย (เพื่อให้ Parser เดิมทำงานได้)
         self.raw_log = input_data if isinstance(input_data, str) else None
+        self.session = None
+        self.config_span = (0, None)   # ช่วง (start, end) ของ running config ใน raw_log
+
+        self.budget = PARSE_BUDGET_SECONDS
+        self.deadline = None
 
         self.data = {
             "hostname": "Switch",
             "banner": "",
-            "vlans": {},        # vid -> { name, ip, mask, ipv6 }
-            "routes": [],       # static routes
-            "interfaces": {}    # port -> role data
+            "vlans": {},        # vid -> Vlan
+            "routes": [],       # [Route] static routes
+            "interfaces": {},   # port -> Interface
+            "diagnostics": []   # [{code, offset, msg}] ปัญหาที่เจอตอน parse (เช่น banner ไม่ปิด, เกินเวลา)
         }
 
+    @classmethod
+    def from_model(cls, data, target_type, source_type=None):
+        """ สร้าง Converter จาก model ที่ parse ไว้แล้ว (ไม่ต้องแตะ raw log อีก) """
+        conv = cls(source_type, target_type, None)
+        conv.data = data
+        return conv
+
+    @property
+    def diagnostics(self):
+        return self.data.setdefault("diagnostics", [])
+
+    @property
+    def partial(self):
+        """ True = parse ไม่จบเพราะเกิน budget (self.data มีแค่ส่วนที่ parse ทัน) """
+        return any(d["code"] == "parse_budget" for d in self.diagnostics)
+
+    def _stanzas(self):
+        return index_stanzas(self.raw_log, *self.config_span,
+                             deadline=self.deadline, diagnostics=self.diagnostics)
+
     # ================= MAIN =================
     def process(self):
+        error = self.parse()
+        if error: return error
+        return self.render()
+
+    def parse(self):
+        """ Parse input เข้า self.data -> คืน None ถ้าสำเร็จ หรือข้อความ Error """
         if self.source == "excel":
             try:
                 self._parse_excel()
@@ -32,13 +292,19 @@ class ConfigConverter:
                 return f"Error parsing Excel: {str(e)}"
 # 2. Parse Text Log (Logic เดิม)
         elif isinstance(self.input_data, str): 
-            self.raw_log = self.input_data
-            if not self.raw_log: return "Error: Empty log"
-            
-            # Clean Headers
-            for header in ["display current-configuration", "show running-config"]:
-                if header in self.raw_log:
-                    self.raw_log = self.raw_log.split(header, 1)[1]
+            if not self.input_data: return "Error: Empty log"
+            if self.budget > 0:
+                self.deadline = time.thread_time() + self.budget
+
+            # แยก session log เป็นช่วงของแต่ละคำสั่ง -> Parser อ่านเฉพาะช่วงของ running config
+            self.session = SessionLog(self.input_data, deadline=self.deadline)
+            self.raw_log = self.session.text
+            self.config_span = self.session.config_span(self.source)
+            if self.session.budget_offset is not None:
+                # หมดเวลาตั้งแต่ตอนล้าง/แบ่ง log -> ไม่ parse ต่อ (คืนผล partial ทันที)
+                _diag(self.diagnostics, "parse_budget", self.session.budget_offset,
+                      "Parse time budget exceeded while reading the session log; result is partial")
+                return None
 
             if self.source == "hp_comware":
                 self._parse_comware()
@@ -46,89 +312,74 @@ class ConfigConverter:
                 self._parse_cisco_ios()
             else:
                 return f"Error: Source {self.source} not supported"
+
+            self._parse_interface_table()
         else:
             return "Error: Invalid input format"
+        return None
 
-# 3. Generate Config
-        if self.target in ("aruba_cx", "aruba_os_switch"):
+    # 3. Generate Config
+    def render(self, target_type=None):
+        target = target_type or self.target
+        if target in ("aruba_cx", "aruba_os_switch"):
             return self._generate_aruba_cx_ready_to_paste()
-        elif self.target == "cisco_ios":
+        elif target == "cisco_ios":
             return "Error: Cisco Generator coming soon..." # เผื่ออนาคต
-        elif self.target == "hp_comware":
+        elif target == "hp_comware":
             return "Error: Comware Generator coming soon..." # เผื่ออนาคต
 
-        return f"Error: Target {self.target} not supported"
+        return f"Error: Target {target} not supported"
+
+    def iter_render(self, target_type=None, chunk_size=STREAM_CHUNK_BYTES):
+        """ Generator ของ render(): yield เป็นก้อนข้อความขนาด ~chunk_size
+            ต่อทุกก้อนกันแล้วได้ผลเท่ากับ render() ทุก byte """
+        target = target_type or self.target
+        if target not in ("aruba_cx", "aruba_os_switch"):
+            yield self.render(target)
+            return
+
+        buf, size, sent = [], 0, False
+        for line in self._iter_aruba_cx_ready_to_paste():
+            buf.append(line)
+            size += len(line) + 1
+            if size >= chunk_size:
+                yield ("\n" if sent else "") + "\n".join(buf)
+                buf, size, sent = [], 0, True
+        if buf:
+            yield ("\n" if sent else "") + "\n".join(buf)
+
+    def render_delta(self, old_data, target_type=None):
+        """ สร้างเฉพาะคำสั่งที่เปลี่ยนจาก old_data (model เก่า) -> self.data (model ใหม่) """
+        target = target_type or self.target
+        if target in ("aruba_cx", "aruba_os_switch"):
+            return self._generate_aruba_cx_delta(old_data)
+        return f"Error: Delta for target {target} not supported"
 
 
 # ================= EXPORTER (Log -> Excel) 🆕 =================
+    # เขียนทีละแถวผ่าน xlsxwriter (constant_memory) ตรงๆ ไม่ต้องสร้าง pandas DataFrame
+    # -> memory คงที่ไม่ว่าจะมีกี่พอร์ต และไม่ต้องลาก pandas เข้ามาใน request path
+    IFACE_COLUMNS = ['Port', 'Description', 'Role', 'Access_VLAN', 'Native_VLAN',
+                     'Allowed_VLANs', 'LAG_ID', 'Shutdown', 'Link', 'Speed']
+
     def export_to_excel(self):
+        import xlsxwriter   # lazy: โหลดเฉพาะตอน Export จริง
+
         # สร้าง Buffer ใน Memory (ไม่ต้องเขียนไฟล์ลง Disk)
         output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-
-        # 1. Sheet: Global
-        df_global = pd.DataFrame([
-            {'Parameter': 'Hostname', 'Value': self.data.get('hostname', '')},
-            {'Parameter': 'Banner', 'Value': 'Configured' if self.data.get('banner') else 'None'},
-            {'Parameter': 'VLAN_Count', 'Value': len(self.data.get('vlans', {}))},
-            {'Parameter': 'Interface_Count', 'Value': len(self.data.get('interfaces', {}))},
-            {'Parameter': 'Route_Count', 'Value': len(self.data.get('routes', []))}
-        ])
-
-        df_global.to_excel(writer, sheet_name='Global', index=False)
-
-        # 2. Sheet: VLANs
-        vlan_list = []
-        for vid, v in self.data['vlans'].items():
-            vlan_list.append({
-                'ID': vid,
-                'Name': v['name'],
-                'IPv4': v['ip'],
-                'Mask': v['mask'],
-                'IPv6': v['ipv6']
-            })
-        pd.DataFrame(vlan_list).to_excel(writer, sheet_name='VLANs', index=False)
-
-        # 3. Sheet: Interfaces
-        iface_list = []
-        # เรียงพอร์ตให้สวยงาม
-        sorted_ports = sorted(self.data['interfaces'].keys(), key=self._iface_sort_key)
-        
-        for port in sorted_ports:
-            i = self.data['interfaces'][port]
-            
-            # แปลง Set เป็น String "10,20,30"
-            allowed_str = ""
-            if i['allowed_vlans']:
-                allowed_str = ",".join(map(str, sorted(list(i['allowed_vlans']))))
-
-            iface_list.append({
-                'Port': port,
-                'Description': i['description'],
-                'Role': i['role'] if i['role'] else '',
-                'Access_VLAN': i['access_vlan'] if i['role'] == 'access' else '',
-                'Native_VLAN': i['native_vlan'] if i['role'] == 'trunk' else '',
-                'Allowed_VLANs': allowed_str,
-                'LAG_ID': i['lag_id'] if i['lag_id'] else '',
-                'Shutdown': 'Yes' if i['shutdown'] else 'No'
-            })
-        pd.DataFrame(iface_list).to_excel(writer, sheet_name='Interfaces', index=False)
-
-        # 4. Sheet: Routes
-        route_list = []
-        for r in self.data['routes']:
-            route_list.append({
-                'Destination': r['dest'],
-                'Mask': r['mask'],
-                'Next_Hop': r['next_hop']
-            })
-        pd.DataFrame(route_list).to_excel(writer, sheet_name='Routes', index=False)
-        workbook  = writer.book
-        worksheet = writer.sheets['Interfaces']
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
 
         # ------------------------
         # Formats
         # ------------------------
+        # หัวตารางแบบเดียวกับที่ pandas ใส่ให้ (ชีต Global / VLANs / Routes)
+        plain_header_fmt = workbook.add_format({
+            'bold': True,
+            'align': 'center',
+            'valign': 'top',
+            'border': 1
+        })
+
         header_fmt = workbook.add_format({
             'bold': True,
             'align': 'center',
@@ -156,24 +407,30 @@ class ConfigConverter:
             'border': 1
         })
 
-        center_fmt = workbook.add_format({
-            'align': 'center',
+        down_fmt = workbook.add_format({
+            'bg_color': '#D9D9D9',  # เทา: link down (พอร์ตว่าง)
             'border': 1
         })
 
-        wrap_fmt = workbook.add_format({
-            'text_wrap': True,
-            'border': 1
-        })
+        # 1. Sheet: Global
+        self._write_sheet(workbook, 'Global', ['Parameter', 'Value'], [
+            ('Hostname', self.data.get('hostname', '')),
+            ('Banner', 'Configured' if self.data.get('banner') else 'None'),
+            ('VLAN_Count', len(self.data.get('vlans', {}))),
+            ('Interface_Count', len(self.data.get('interfaces', {}))),
+            ('Route_Count', len(self.data.get('routes', [])))
+        ], plain_header_fmt)
 
-        # ------------------------
-        # Header formatting
-        # ------------------------
-        for col_num, col_name in enumerate(pd.DataFrame(iface_list).columns):
-            worksheet.write(0, col_num, col_name, header_fmt)
+        # 2. Sheet: VLANs
+        self._write_sheet(workbook, 'VLANs', ['ID', 'Name', 'IPv4', 'Mask', 'IPv6'], (
+            (vid, v.name, v.ip, v.mask, v.ipv6) for vid, v in self.data['vlans'].items()
+        ), plain_header_fmt)
+
+        # 3. Sheet: Interfaces
+        worksheet = workbook.add_worksheet('Interfaces')
 
         # ------------------------
-        # Column width
+        # Column width (constant_memory: ตั้งก่อนเขียนแถว)
         # ------------------------
         worksheet.set_column('A:A', 12)   # Port
         worksheet.set_column('B:B', 22)   # Description
@@ -182,129 +439,144 @@ class ConfigConverter:
         worksheet.set_column('G:G', 25)   # Allowed VLANs
         worksheet.set_column('H:H', 10)   # LAG
         worksheet.set_column('I:I', 10)   # Shutdown
+        worksheet.set_column('J:K', 10)   # Link / Speed
 
         # ------------------------
-        # Freeze header
+        # Header formatting
         # ------------------------
-        worksheet.freeze_panes(1, 0)
+        worksheet.write_row(0, 0, self.IFACE_COLUMNS, header_fmt)
 
         # ------------------------
-        # Auto Filter
+        # Freeze header
         # ------------------------
-        worksheet.autofilter(
-            0, 0,
-            len(iface_list),
-            len(iface_list[0]) - 1
-        )
+        worksheet.freeze_panes(1, 0)
 
         # ------------------------
-        # Row formatting by Role
+        # Rows + formatting by Role (เรียงพอร์ตให้สวยงาม)
         # ------------------------
-        for row_idx, row in enumerate(iface_list, start=1):
-            role = row['Role']
-            shutdown = row['Shutdown']
+        sorted_ifaces = sorted(self.data['interfaces'].values(), key=lambda i: i.sort_key)
+        row_idx = 0
+        for row_idx, i in enumerate(sorted_ifaces, start=1):
+            port = i.port
 
-            if shutdown == 'Yes':
+            if i.shutdown:
                 fmt = shutdown_fmt
-            elif role == 'access':
+            elif i.oper_state() == 'down':
+                fmt = down_fmt
+            elif i.role == 'access':
                 fmt = access_fmt
-            elif role == 'trunk':
+            elif i.role == 'trunk':
                 fmt = trunk_fmt
             else:
                 fmt = default_fmt
 
+            # constant_memory: set_row ต้องมาก่อนเขียน cell ของแถวนั้น
             worksheet.set_row(row_idx, None, fmt)
+            worksheet.write_row(row_idx, 0, (
+                port,
+                i.description,
+                i.role if i.role else '',
+                i.access_vlan if i.role == 'access' else '',
+                i.native_vlan if i.role == 'trunk' else '',
+                str(i.allowed_vlans),   # แปลง Bitmap เป็น String แบบย่อช่วง "10-20,30"
+                i.lag_id if i.lag_id else '',
+                'Yes' if i.shutdown else 'No',
+                i.link or '',
+                i.speed
+            ))
 
+        # ------------------------
+        # Auto Filter
+        # ------------------------
+        worksheet.autofilter(0, 0, row_idx, len(self.IFACE_COLUMNS) - 1)
+
+        # 4. Sheet: Routes
+        self._write_sheet(workbook, 'Routes', ['Destination', 'Mask', 'Next_Hop'], (
+            (r.dest, r.mask, r.next_hop) for r in self.data['routes']
+        ), plain_header_fmt)
 
         # Save & Return Bytes
-        writer.close()
+        workbook.close()
         output.seek(0)
         return output.read()
+
+    def _write_sheet(self, workbook, name, columns, rows, header_fmt):
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, columns, header_fmt)
+        for row_idx, row in enumerate(rows, start=1):
+            worksheet.write_row(row_idx, 0, row)
+        return worksheet
     
 
 # ================= PARSER (EXCEL) 🆕 =================
     def _parse_excel(self):
-        # อ่านไฟล์ Excel จาก Memory (Bytes)
+        # อ่านไฟล์ Excel จาก Memory (Bytes) แบบ read_only (stream ทีละแถว ไม่โหลดทั้ง sheet)
         # ต้องแน่ใจว่า input_data ถูกส่งมาเป็น bytes (read() จาก file upload)
-        xls = pd.ExcelFile(io.BytesIO(self.input_data))
-
-        # 1. Sheet: Global
-        if 'Global' in xls.sheet_names:
-            df_global = pd.read_excel(xls, 'Global')
-            # แปลงเป็น Dict: {'Hostname': 'SW1', 'Banner': '...'}
-            global_map = dict(zip(df_global['Parameter'], df_global['Value']))
-            
-            if 'Hostname' in global_map:
-                self.data["hostname"] = str(global_map['Hostname'])
-            if 'Banner' in global_map:
-                self.data["banner"] = str(global_map['Banner'])
-
-        # 2. Sheet: VLANs
-        if 'VLANs' in xls.sheet_names:
-            df_vlan = pd.read_excel(xls, 'VLANs').fillna('')
-            for _, row in df_vlan.iterrows():
-                try:
-                    vid = int(row['ID'])
-                    self.data["vlans"][vid] = {
-                        "name": str(row['Name']),
-                        "ip": str(row['IPv4']),
-                        "mask": str(row['Mask']),
-                        "ipv6": str(row['IPv6'])
-                    }
-                except: continue
+        import openpyxl   # lazy: โหลดเฉพาะตอน Import Excel จริง
+        wb = openpyxl.load_workbook(io.BytesIO(self.input_data), read_only=True, data_only=True)
+        try:
+            # 1. Sheet: Global
+            if 'Global' in wb.sheetnames:
+                # แปลงเป็น Dict: {'Hostname': 'SW1', 'Banner': '...'}
+                global_map = {p: v for p, v in _sheet_rows(wb['Global'], ['Parameter', 'Value'])}
+
+                if 'Hostname' in global_map:
+                    self.data["hostname"] = _cell_str(global_map['Hostname'])
+                if 'Banner' in global_map:
+                    self.data["banner"] = _cell_str(global_map['Banner'])
+
+            # 2. Sheet: VLANs
+            if 'VLANs' in wb.sheetnames:
+                for vid, name, ip, mask, ipv6 in _sheet_rows(wb['VLANs'], ['ID', 'Name', 'IPv4', 'Mask', 'IPv6']):
+                    try:
+                        vid = _cell_int(vid, None)
+                    except ValueError: continue
+                    if vid is None: continue
+                    self.data["vlans"][vid] = Vlan(
+                        vid, _cell_str(name), _cell_str(ip), _cell_str(mask), _cell_str(ipv6)
+                    )
+
+            # 3. Sheet: Interfaces
+            if 'Interfaces' in wb.sheetnames:
+                interfaces = self.data["interfaces"]
+                rows = _sheet_rows(wb['Interfaces'], self.IFACE_COLUMNS)
+                for raw_port, desc, role, acc, nat, allowed_str, lag, shut, link, speed in rows:
+                    raw_port = _cell_str(raw_port)
+                    if not raw_port: continue
 
-        # 3. Sheet: Interfaces
-        if 'Interfaces' in xls.sheet_names:
-            df_int = pd.read_excel(xls, 'Interfaces').fillna('')
-            for _, row in df_int.iterrows():
-                raw_port = str(row['Port'])
-                
-                # รองรับ Range เช่น "1/1/1-1/1/24"
-                ports = self._expand_port_range(raw_port)
-                
-                for port in ports:
                     # Map Role
-                    role = str(row['Role']).lower().strip()
-                    mode = None
+                    role = _cell_str(role).lower().strip()
+                    mode = role if role in ('access', 'trunk', 'lag_member') else None
                     lag_id = None
-                    
-                    if role == 'access': mode = 'access'
-                    elif role == 'trunk': mode = 'trunk'
-                    elif role == 'lag_member': 
-                        mode = 'lag_member'
-                        if row['LAG_ID']: lag_id = str(int(row['LAG_ID']))
+                    if mode == 'lag_member' and lag not in (None, ''):
+                        lag_id = str(_cell_int(lag, None))
 
                     # VLANs
-                    acc_vlan = int(row['Access_VLAN']) if row['Access_VLAN'] else 1
-                    nat_vlan = int(row['Native_VLAN']) if row['Native_VLAN'] else 1
-                    
-                    # Allowed VLANs (แยกด้วย comma)
-                    allowed = set()
-                    if row['Allowed_VLANs']:
-                        for v in str(row['Allowed_VLANs']).split(','):
-                            if v.strip().isdigit(): allowed.add(int(v))
-
-                    shutdown = str(row['Shutdown']).lower() == 'yes'
-
-                    self.data["interfaces"][port] = {
-                        "description": str(row['Description']),
-                        "role": mode,
-                        "access_vlan": acc_vlan,
-                        "native_vlan": nat_vlan,
-                        "allowed_vlans": allowed,
-                        "lag_id": lag_id,
-                        "shutdown": shutdown
-                    }
-
-        # 4. Sheet: Routes
-        if 'Routes' in xls.sheet_names:
-            df_route = pd.read_excel(xls, 'Routes').fillna('')
-            for _, row in df_route.iterrows():
-                self.data["routes"].append({
-                    "dest": str(row['Destination']),
-                    "mask": str(row['Mask']),
-                    "next_hop": str(row['Next_Hop'])
-                })
+                    acc_vlan = _cell_int(acc, 1)
+                    nat_vlan = _cell_int(nat, 1)
+
+                    # Allowed VLANs (แยกด้วย comma, รองรับช่วง "10-20,30")
+                    allowed = self._parse_vlan_list(_cell_str(allowed_str)) if allowed_str not in (None, '') else VlanSet()
+
+                    shutdown = _cell_str(shut).lower() == 'yes'
+                    desc = _cell_str(desc)
+                    link = _cell_str(link).upper() or None
+                    speed = _cell_str(speed)
+
+                    # แปลงแถวครั้งเดียว แล้วใช้ซ้ำกับทุกพอร์ตใน Range เช่น "1/1/1-1/1/24"
+                    for port in self._expand_port_range(raw_port):
+                        interfaces[port] = Interface(
+                            port, desc, mode, acc_vlan, nat_vlan, allowed.copy(), lag_id, shutdown, link, speed
+                        )
+
+            # 4. Sheet: Routes
+            if 'Routes' in wb.sheetnames:
+                self.data["routes"].extend(
+                    Route(_cell_str(d), _cell_str(m), _cell_str(nh))
+                    for d, m, nh in _sheet_rows(wb['Routes'], ['Destination', 'Mask', 'Next_Hop'])
+                )
+        finally:
+            wb.close()
 
     # Helper: ขยาย Range พอร์ต (1/1/1-1/1/5 -> [1/1/1, 1/1/2...])
     def _expand_port_range(self, port_str):
@@ -325,321 +597,431 @@ class ConfigConverter:
 
     # ================= PARSER: HPE COMWARE =================
     def _parse_comware(self):
-        # (โค้ดเดิมของ Comware ... ไม่ต้องแก้)
-        m = re.search(r"sysname\s+(\S+)", self.raw_log)
-        if m: self.data["hostname"] = m.group(1)
-
-        banner_m = re.search(r"header legal\s+(.)(.*?)\1", self.raw_log, re.DOTALL)
-        if banner_m: self.data["banner"] = banner_m.group(2).strip()
-
-        # VLANs
-        vlan_blocks = re.findall(r"^vlan (\d+)(.*?)(?=^vlan |\n#)", self.raw_log, re.DOTALL | re.MULTILINE)
-        for vid, content in vlan_blocks:
-            vid = int(vid)
-            self.data["vlans"][vid] = {"name": f"VLAN_{vid}", "ip": "", "mask": "", "ipv6": ""}
-            d = re.search(r"description\s+(.+)", content)
-            if d: self.data["vlans"][vid]["name"] = d.group(1).strip()
-
-        # Interfaces
-        interfaces = re.findall(r"^interface ([^\n]+)\n(.*?)(?=\n#)", self.raw_log, re.DOTALL | re.MULTILINE)
-        for raw_name, cfg in interfaces:
-            if "Vlan-interface" in raw_name: continue
-            port = self._map_interface_name(raw_name)
-            if not port: continue
-
-            iface = self._init_interface_data(cfg)
-            d = re.search(r"description\s+(.+)", cfg)
-            if d: iface["description"] = d.group(1).strip()
-
-            # LAG Member
-            m = re.search(r"port link-aggregation group (\d+)", cfg)
-            if m:
-                iface["role"] = "lag_member"
-                iface["lag_id"] = m.group(1)
-                self.data["interfaces"][port] = iface
-                continue
-
-            # Access & Trunk Logic (Comware)
-            m = re.search(r"port access vlan (\d+)", cfg)
-            if m:
-                iface["role"] = "access"
-                iface["access_vlan"] = int(m.group(1))
-
-            if "port link-type trunk" in cfg:
-                iface["role"] = "trunk"
-                m = re.search(r"port trunk pvid vlan (\d+)", cfg)
-                iface["native_vlan"] = int(m.group(1)) if m else 1
-                m = re.search(r"port trunk permit vlan (.+)", cfg)
-                if m: iface["allowed_vlans"] = self._parse_vlan_list(m.group(1))
-
-            self.data["interfaces"][port] = iface
-
-        # SVI
-        svis = re.findall(r"^interface Vlan-interface(\d+)\n(.*?)(?=\n#)", self.raw_log, re.DOTALL | re.MULTILINE)
-        for vid, cfg in svis:
-            self._parse_svi_ip(int(vid), cfg)
-
-        # Routes
-        routes = re.findall(r"ip route-static (\S+) (\S+) (\S+)", self.raw_log)
-        for d, m, nh in routes: self.data["routes"].append({"dest": d, "mask": m, "next_hop": nh})
+        # สแกน config ครั้งเดียวผ่าน index_stanzas แล้ว dispatch ตามคำสั่งหัว stanza
+        for st in self._stanzas():
+            head = st["head"]
+
+            if head.startswith("sysname "):
+                self.data["hostname"] = head.split()[1]
+
+            elif head.startswith("header legal"):
+                self.data["banner"] = "\n".join(st["lines"]).strip()
+
+            elif head.startswith("vlan "):
+                vid = head[5:].strip()
+                if not vid.isdigit(): continue
+                v = self._get_vlan(int(vid))
+                d = _first_arg(st["lines"], "description ")
+                if d: v.name = d
+
+            elif head.startswith("interface "):
+                raw_name = head[10:].strip()
+                if raw_name.startswith("Vlan-interface"):
+                    vid = raw_name[14:]
+                    if vid.isdigit(): self._parse_svi_ip(int(vid), st["lines"])
+                    continue
+
+                port = self._map_interface_name(raw_name)
+                if not port: continue
+                self.data["interfaces"][port] = self._parse_comware_interface(port, st["lines"])
+
+            elif head.startswith("ip route-static "):
+                parts = head.split()
+                if len(parts) >= 5:
+                    self.data["routes"].append(Route(parts[2], parts[3], parts[4]))
+
+    def _parse_comware_interface(self, port, lines):
+        iface = self._init_interface_data(port, lines)
+        is_trunk = False
+        pvid = None
+
+        for line in lines:
+            if line.startswith("description ") and not iface.description:
+                iface.description = line[12:].strip()
+            elif line.startswith("port link-aggregation group "):
+                iface.lag_id = line.split()[3]
+            elif line.startswith("port access vlan "):
+                iface.role = "access"
+                iface.access_vlan = int(line.split()[3])
+            elif line == "port link-type trunk":
+                is_trunk = True
+            elif line.startswith("port trunk pvid vlan "):
+                pvid = int(line.split()[4])
+            elif line.startswith("port trunk permit vlan "):
+                # Comware ตัดบรรทัดยาวๆ เป็นหลายบรรทัด -> รวมทุกบรรทัด
+                iface.allowed_vlans |= self._parse_vlan_list(line[23:])
+
+        # LAG Member มาก่อน Access/Trunk เสมอ
+        if iface.lag_id:
+            iface.role = "lag_member"
+            iface.allowed_vlans = VlanSet()
+            iface.access_vlan = 1
+        elif is_trunk:
+            iface.role = "trunk"
+            iface.native_vlan = pvid if pvid else 1
+        else:
+            iface.allowed_vlans = VlanSet()
+        return iface
 
     # ================= PARSER: CISCO IOS (เพิ่มใหม่) =================
     def _parse_cisco_ios(self):
-        # Hostname
-        m = re.search(r"^hostname\s+(\S+)", self.raw_log, re.MULTILINE)
-        if m: self.data["hostname"] = m.group(1)
-
-        # Banner
-        banner_m = re.search(r"^banner motd\s+(.)(.*?)\1", self.raw_log, re.DOTALL | re.MULTILINE)
-        if banner_m: self.data["banner"] = banner_m.group(2).strip()
-
-        # VLAN Definitions (Cisco doesn't always show vlan config block if default)
-        vlan_blocks = re.findall(r"^vlan (\d+)\n(.*?)(?=^vlan |^interface |^!)", self.raw_log, re.DOTALL | re.MULTILINE)
-        for vid, content in vlan_blocks:
-            vid = int(vid)
-            self.data["vlans"][vid] = {"name": f"VLAN_{vid}", "ip": "", "mask": "", "ipv6": ""}
-            d = re.search(r"name\s+(\S+)", content)
-            if d: self.data["vlans"][vid]["name"] = d.group(1).strip()
-
-        # Interfaces
-        interfaces = re.findall(r"^interface ([^\n]+)\n(.*?)(?=^interface |^!)", self.raw_log, re.DOTALL | re.MULTILINE)
-        for raw_name, cfg in interfaces:
-            # Skip SVI here
-            if raw_name.lower().startswith("vlan"): continue
-            
-            port = self._map_interface_name(raw_name)
-            if not port: continue
-
-            iface = self._init_interface_data(cfg)
-            d = re.search(r"description\s+(.+)", cfg)
-            if d: iface["description"] = d.group(1).strip()
-
+        for st in self._stanzas():
+            head = st["head"]
+
+            if head.startswith("hostname "):
+                self.data["hostname"] = head.split()[1]
+
+            elif head.startswith("banner motd"):
+                self.data["banner"] = "\n".join(st["lines"]).strip()
+
+            # VLAN Definitions (Cisco doesn't always show vlan config block if default)
+            elif head.startswith("vlan "):
+                vid = head[5:].strip()
+                if not vid.isdigit(): continue
+                v = self._get_vlan(int(vid))
+                d = _first_arg(st["lines"], "name ")
+                if d: v.name = d.split()[0]
+
+            elif head.startswith("interface "):
+                raw_name = head[10:].strip()
+                # SVI (Interface Vlan)
+                if raw_name.lower().startswith("vlan"):
+                    vid = raw_name[4:]
+                    if vid.isdigit(): self._parse_svi_ip(int(vid), st["lines"])
+                    continue
+
+                port = self._map_interface_name(raw_name)
+                if not port: continue
+                self.data["interfaces"][port] = self._parse_cisco_interface(port, st["lines"])
+
+            elif head.startswith("ip route "):
+                parts = head.split()
+                if len(parts) >= 5:
+                    self.data["routes"].append(Route(parts[2], parts[3], parts[4]))
+
+    def _parse_cisco_interface(self, port, lines):
+        iface = self._init_interface_data(port, lines)
+        mode = "access" # Cisco default access usually
+        native = None
+        access = None
+        allowed = None
+
+        for line in lines:
+            if line.startswith("description ") and not iface.description:
+                iface.description = line[12:].strip()
             # LAG Member (channel-group 1 mode active)
-            m = re.search(r"channel-group (\d+)", cfg)
-            if m:
-                iface["role"] = "lag_member"
-                iface["lag_id"] = m.group(1)
-                self.data["interfaces"][port] = iface
-                continue
-
-            # Switchport Mode
-            mode_match = re.search(r"switchport mode (access|trunk)", cfg)
-            mode = mode_match.group(1) if mode_match else "access" # Cisco default access usually
-            
+            elif line.startswith("channel-group "):
+                iface.lag_id = line.split()[1]
+            elif line.startswith("switchport mode access") and mode != "trunk":
+                mode = "access"
+            elif line.startswith("switchport access vlan "):
+                access = int(line.split()[3])
             # Check explicit trunk keywords
-            if "switchport trunk" in cfg: mode = "trunk"
-
-            if mode == "access":
-                iface["role"] = "access"
-                m = re.search(r"switchport access vlan (\d+)", cfg)
-                iface["access_vlan"] = int(m.group(1)) if m else 1
-            
-            elif mode == "trunk":
-                iface["role"] = "trunk"
-                m = re.search(r"switchport trunk native vlan (\d+)", cfg)
-                iface["native_vlan"] = int(m.group(1)) if m else 1
-                
-                m = re.search(r"switchport trunk allowed vlan ([\d,-]+)", cfg)
-                if m: iface["allowed_vlans"] = self._parse_vlan_list(m.group(1))
-
-            self.data["interfaces"][port] = iface
-
-        # SVI (Interface Vlan)
-        svis = re.findall(r"^interface Vlan(\d+)\n(.*?)(?=^interface |^!)", self.raw_log, re.DOTALL | re.MULTILINE)
-        for vid, cfg in svis:
-            self._parse_svi_ip(int(vid), cfg)
-
-        # Routes
-        routes = re.findall(r"^ip route (\S+) (\S+) (\S+)", self.raw_log, re.MULTILINE)
-        for d, m, nh in routes: self.data["routes"].append({"dest": d, "mask": m, "next_hop": nh})
+            elif line.startswith("switchport trunk") or line.startswith("switchport mode trunk"):
+                mode = "trunk"
+                if line.startswith("switchport trunk native vlan "):
+                    native = int(line.split()[4])
+                elif line.startswith("switchport trunk allowed vlan ") and allowed is None:
+                    rest = line[30:].strip()
+                    if rest[:1].isdigit(): allowed = rest
+
+        if iface.lag_id:
+            iface.role = "lag_member"
+        elif mode == "access":
+            iface.role = "access"
+            iface.access_vlan = access if access else 1
+        else:
+            iface.role = "trunk"
+            iface.native_vlan = native if native else 1
+            if allowed: iface.allowed_vlans = self._parse_vlan_list(allowed)
+        return iface
+
+    # ================= OPERATIONAL DATA (display interface brief / show interfaces status) =================
+    def _parse_interface_table(self):
+        # ใช้ตารางสถานะพอร์ตที่อยู่ใน log เดียวกัน (ไม่ต้อง SSH เพิ่ม) -> เติม link/speed/pvid ให้พอร์ตที่มีใน config
+        if self.partial: return
+        sec = self.session.find(INTERFACE_TABLE_COMMANDS.get(self.source, ""))
+        if sec is None: return
+
+        interfaces = self.data["interfaces"]
+        for raw_name, link, speed, pvid in INTERFACE_TABLE_PARSERS[self.source](self.raw_log, sec.start, sec.end):
+            iface = interfaces.get(self._map_interface_name(raw_name))
+            if iface is None: continue
+            iface.link = link
+            iface.speed = speed
+            iface.pvid = pvid
 
     # ================= SHARED HELPERS =================
-    def _init_interface_data(self, cfg):
-        return {
-            "description": "", "role": None, "access_vlan": 1, 
-            "native_vlan": 1, "allowed_vlans": set(), "lag_id": None,
-            "shutdown": "shutdown" in cfg
-        }
+    def _init_interface_data(self, port, lines):
+        return Interface(port, shutdown="shutdown" in lines)
+
+    def _get_vlan(self, vid):
+        v = self.data["vlans"].get(vid)
+        if v is None:
+            v = self.data["vlans"][vid] = Vlan(vid)
+        return v
 
     def _parse_vlan_list(self, vlan_str):
-        """ แปลง '1,10,20-30' เป็น set {1, 10, 20, 21...} """
-        vids = set()
-        for part in vlan_str.split(','):
-            part = part.strip()
+        """ แปลง '1,10,20-30' (Cisco/Excel) หรือ '1 10 20 to 30' (Comware) เป็น VlanSet
+            ช่วง VLAN ถูกใส่เป็น mask ทีเดียว ไม่ขยายทีละ VLAN """
+        vids = VlanSet()
+        parts = vlan_str.replace(',', ' ').split()
+        i = 0
+        while i < len(parts):
+            part = parts[i]
+            if i + 2 < len(parts) and parts[i + 1] == 'to':   # Comware: 20 to 30
+                part = f"{part}-{parts[i + 2]}"
+                i += 2
+            i += 1
+
             if '-' in part:
-                s, e = map(int, part.split('-'))
-                vids.update(range(s, e + 1))
+                s, _, e = part.partition('-')
+                if s.isdigit() and e.isdigit(): vids.add_range(int(s), int(e))
             elif part.isdigit():
                 vids.add(int(part))
         return vids
 
-    def _parse_svi_ip(self, vid, cfg):
-        self.data["vlans"].setdefault(vid, {"name": f"VLAN_{vid}", "ip": "", "mask": "", "ipv6": ""})
-        m = re.search(r"ip address (\d+\.\d+\.\d+\.\d+) (\d+\.\d+\.\d+\.\d+)", cfg)
-        if m:
-            self.data["vlans"][vid]["ip"] = m.group(1)
-            self.data["vlans"][vid]["mask"] = m.group(2)
-        m6 = re.search(r"ipv6 address ([0-9a-fA-F:]+/\d+)", cfg)
-        if m6:
-            self.data["vlans"][vid]["ipv6"] = m6.group(1)
+    def _parse_svi_ip(self, vid, lines):
+        v = self._get_vlan(vid)
+        for line in lines:
+            parts = line.split()
+            if len(parts) >= 4 and parts[0] == "ip" and parts[1] == "address" and not v.ip:
+                if parts[2].count(".") == 3 and parts[3].count(".") == 3:
+                    v.ip = parts[2]
+                    v.mask = parts[3]
+            elif len(parts) >= 3 and parts[0] == "ipv6" and parts[1] == "address" and not v.ipv6:
+                if "/" in parts[2]: v.ipv6 = parts[2]
 
     def _map_interface_name(self, name):
-        name = name.strip()
-        
-        # --- HPE Comware ---
-        # Ten-GigabitEthernet1/1/1 -> 1/2/1
-        m = re.match(r"Ten-GigabitEthernet(\d+)/(\d+)/(\d+)", name)
-        if m: return f"{m.group(1)}/{int(m.group(2))+1}/{m.group(3)}"
-        
-        # GigabitEthernet1/0/1 -> 1/1/1
-        m = re.match(r"GigabitEthernet(\d+)/(\d+)/(\d+)", name)
-        if m: return f"{m.group(1)}/{int(m.group(2))+1}/{m.group(3)}"
-
-        # --- Cisco IOS (2960/Catalyst) ---
-        # FastEthernet0/1 -> 1/1/1
-        # GigabitEthernet0/1 -> 1/1/25 (สมมติว่าเป็น Uplink ต่อจาก Fa 24 ช่อง)
-        # หรือถ้าเป็น Stack: Gi1/0/1 -> 1/1/1
-        
-        m = re.match(r"(FastEthernet|GigabitEthernet|TenGigabitEthernet)(\d+)/(\d+)", name)
-        if m:
-            # Cisco Standalone (0/1) or Stack Member (1/0/1)
-            # กรณี 0/1 (Stack Member 0 -> 1, Slot 1)
-            member = "1"
-            slot = "1"
-            port = m.group(3)
-            
-            # ถ้า Input มาเป็นแบบ Stack (1/0/1) ให้ดึงเลข Member มา
-            # แต่ Regex ข้างบนจับแค่ 2 กลุ่มตัวเลข ดังนั้นสำหรับ Cisco 2960 (Fa0/1)
-            # group(2)=0, group(3)=1
-            
-            return f"1/1/{port}" # Map ง่ายๆ ไป Slot 1 หมดก่อน
-
-        # LAG
-        if name.startswith("Bridge-Aggregation") or name.startswith("Port-channel"):
-            # ดึงเลขออกมา
-            num = re.search(r"(\d+)$", name)
-            return f"lag{num.group(1)}" if num else "lag1"
-
-        return None
+        return map_interface_name(name)
 
     def _iface_sort_key(self, name):
-        if name.startswith("lag"):
-            return (0, 0, 0, int(name.replace("lag", "")))
-        try:
-            parts = name.split("/")
-            return (1, int(parts[0]), int(parts[1]), int(parts[2]))
-        except:
-            return (9, 0, 0, 0)
+        return port_sort_key(name)
 
     # ================= GENERATOR (Aruba CX Ready-to-Paste) =================
     def _generate_aruba_cx_ready_to_paste(self):
-        lines = []
-        lines.append("configure terminal")
-        lines.append("")
-        lines.append(f"hostname {self.data['hostname']}")
+        return "\n".join(self._iter_aruba_cx_ready_to_paste())
+
+    def _iter_aruba_cx_ready_to_paste(self):
+        """ Generator: yield ทีละบรรทัด (ไม่มี \\n) -> ใช้ได้ทั้ง render() และ iter_render() """
+        yield "configure terminal"
+        yield ""
+        yield f"hostname {self.data['hostname']}"
         
         if self.data["banner"]:
-            lines.append("banner motd #")
-            lines.append(self.data["banner"])
-            lines.append("#")
-        lines.append("#")
+            yield "banner motd #"
+            yield self.data["banner"]
+            yield "#"
+        yield "#"
 
         # VLANs
         for vid in sorted(self.data["vlans"]):
             v = self.data["vlans"][vid]
-            lines.append(f"vlan {vid}")
-            lines.append(f'    name "{v["name"]}"')
-            lines.append("    exit")
-        lines.append("#")
+            yield f"vlan {vid}"
+            yield f'    name "{v.name}"'
+            yield "    exit"
+        yield "#"
 
         # SVI
         for vid in sorted(self.data["vlans"]):
             v = self.data["vlans"][vid]
-            if v["ip"] or v["ipv6"]:
-                lines.append(f"interface vlan {vid}")
-                if v["ip"]: lines.append(f"    ip address {v['ip']} {v['mask']}")
-                if v["ipv6"]: lines.append(f"    ipv6 address {v['ipv6']}")
-                lines.append("    exit")
-                lines.append("#")
+            if v.ip or v.ipv6:
+                yield f"interface vlan {vid}"
+                if v.ip: yield f"    ip address {v.ip} {v.mask}"
+                if v.ipv6: yield f"    ipv6 address {v.ipv6}"
+                yield "    exit"
+                yield "#"
 
         # LAGs
         lags = set()
         for iface in self.data["interfaces"].values():
-            if iface["lag_id"]: lags.add(iface["lag_id"])
+            if iface.lag_id: lags.add(iface.lag_id)
         
         for lag_id in sorted(lags, key=lambda x: int(x)):
-            lines.append(f"interface lag {lag_id}")
-            lines.append("    no shutdown")
-            lines.append("    no routing")
-            lines.append("    lacp mode active")
-            lines.append("    vlan trunk native 1") # Default safe
-            lines.append("    vlan trunk allowed all") # Default safe
-            lines.append("    exit")
-            lines.append("#")
+            yield from self._aruba_lag_lines(lag_id)
 
         # Physical Ports (Grouping)
-        phy_ports = [p for p in self.data["interfaces"] if not p.startswith("lag")]
-        phy_ports.sort(key=self._iface_sort_key)
-
-        groups = []
-        if phy_ports:
-            current_group = [phy_ports[0]]
-            for i in range(1, len(phy_ports)):
-                prev, curr = phy_ports[i-1], phy_ports[i]
-                prev_conf = self.data["interfaces"][prev]
-                curr_conf = self.data["interfaces"][curr]
-                
-                is_same = (
-                    prev_conf["role"] == curr_conf["role"] and
-                    prev_conf["access_vlan"] == curr_conf["access_vlan"] and
-                    prev_conf["native_vlan"] == curr_conf["native_vlan"] and
-                    prev_conf["allowed_vlans"] == curr_conf["allowed_vlans"] and
-                    prev_conf["lag_id"] == curr_conf["lag_id"] and
-                    prev_conf["shutdown"] == curr_conf["shutdown"]
-                )
-                
-                # Check Consecutive (1/1/1 -> 1/1/2)
-                is_cons = False
-                try:
-                    p = list(map(int, prev.split("/")))
-                    c = list(map(int, curr.split("/")))
-                    if p[0]==c[0] and p[1]==c[1] and c[2]==p[2]+1: is_cons = True
-                except: pass
-
-                if is_same and is_cons: current_group.append(curr)
-                else:
-                    groups.append(current_group)
-                    current_group = [curr]
-            groups.append(current_group)
-
-        for group in groups:
-            if not group: continue
-            first = group[0]
-            conf = self.data["interfaces"][first]
-            
-            header = f"interface {group[0]}" if len(group)==1 else f"interface {group[0]}-{group[-1]}"
-            lines.append(header)
-            lines.append("    shutdown" if conf["shutdown"] else "    no shutdown")
-            
-            if len(group) == 1 and conf["description"]:
-                lines.append(f"    description {conf['description']}")
-
-            if conf["role"] == "lag_member":
-                lines.append(f"    lag {conf['lag_id']}")
-            elif conf["role"] == "access":
-                lines.append(f"    vlan access {conf['access_vlan']}")
-            elif conf["role"] == "trunk":
-                lines.append(f"    vlan trunk native {conf['native_vlan']}")
-                allowed = sorted([v for v in conf["allowed_vlans"] if v != conf["native_vlan"]])
-                if allowed: lines.append(f"    vlan trunk allowed {','.join(map(str, allowed))}")
-            
-            lines.append("    exit")
-            lines.append("#")
+        # จัดกลุ่มด้วย config signature (dict lookup ครั้งเดียวต่อพอร์ต -> O(n))
+        # พอร์ตที่ config เหมือนกันรวมเป็น interface เดียวแม้ไม่ติดกัน: interface 1/1/1-1/1/4,1/1/9
+        groups = {}
+        phy_ifaces = [i for i in self.data["interfaces"].values() if not i.port.startswith("lag")]
+        for iface in sorted(phy_ifaces, key=lambda i: i.sort_key):
+            groups.setdefault(iface.config_key(), []).append(iface)
+
+        for group in groups.values():
+            conf = group[0]
+            yield f"interface {_port_ranges(group)}"
+            yield "    shutdown" if conf.shutdown else "    no shutdown"
+
+            if len(group) == 1 and conf.description:
+                yield f"    description {conf.description}"
+
+            yield from self._aruba_role_lines(conf)
+
+            yield "    exit"
+
+            # description เป็นของแต่ละพอร์ต -> แยก block ทีละพอร์ต
+            if len(group) > 1:
+                for iface in group:
+                    if not iface.description: continue
+                    yield f"interface {iface.port}"
+                    yield f"    description {iface.description}"
+                    yield "    exit"
+            yield "#"
 
         for r in self.data["routes"]:
-            lines.append(f"ip route {r['dest']} {r['mask']} {r['next_hop']}")
+            yield f"ip route {r.dest} {r.mask} {r.next_hop}"
+
+        yield "end"
+        yield "write memory"
+
+    def _aruba_lag_lines(self, lag_id):
+        return [
+            f"interface lag {lag_id}",
+            "    no shutdown",
+            "    no routing",
+            "    lacp mode active",
+            "    vlan trunk native 1", # Default safe
+            "    vlan trunk allowed all", # Default safe
+            "    exit",
+            "#",
+        ]
+
+    def _aruba_role_lines(self, conf):
+        """ คำสั่งตาม role ของพอร์ต (lag / access / trunk) """
+        if conf.role == "lag_member":
+            return [f"    lag {conf.lag_id}"]
+        if conf.role == "access":
+            return [f"    vlan access {conf.access_vlan}"]
+        if conf.role == "trunk":
+            out = [f"    vlan trunk native {conf.native_vlan}"]
+            allowed = _trunk_allowed(conf)
+            if allowed: out.append(f"    vlan trunk allowed {allowed}")
+            return out
+        return []
+
+    # ================= GENERATOR (Aruba CX Delta) =================
+    # เทียบ model เก่า (old_data) กับ model ปัจจุบัน (self.data) แล้วสร้างเฉพาะคำสั่งที่เปลี่ยน
+    # ลำดับ: เพิ่ม VLAN/SVI/LAG ก่อน -> แก้พอร์ต -> Route -> ค่อยลบ LAG/SVI/VLAN ที่ไม่ใช้แล้ว
+    def _generate_aruba_cx_delta(self, old_data):
+        new_data = self.data
+        lines = []
+        removals = []
+
+        if old_data["hostname"] != new_data["hostname"]:
+            lines.append(f"hostname {new_data['hostname']}")
+        if old_data["banner"] != new_data["banner"]:
+            if new_data["banner"]:
+                lines.append("banner motd #")
+                lines.append(new_data["banner"])
+                lines.append("#")
+            else:
+                lines.append("no banner motd")
 
-        lines.append("end")
-        lines.append("write memory")
-        
-        return "\n".join(lines)
\ No newline at end of file
+        # VLANs
+        old_vlans, new_vlans = old_data["vlans"], new_data["vlans"]
+        for vid in sorted(new_vlans):
+            v, o = new_vlans[vid], old_vlans.get(vid)
+            if o is None or o.name != v.name:
+                lines.append(f"vlan {vid}")
+                lines.append(f'    name "{v.name}"')
+                lines.append("    exit")
+
+        # SVI
+        for vid in sorted(set(old_vlans) | set(new_vlans)):
+            v, o = new_vlans.get(vid), old_vlans.get(vid)
+            had_svi = o is not None and (o.ip or o.ipv6)
+            has_svi = v is not None and (v.ip or v.ipv6)
+            if had_svi and not has_svi:
+                removals.append(f"no interface vlan {vid}")
+                continue
+            if not has_svi: continue
+
+            body = []
+            old_ip = (o.ip, o.mask) if had_svi else ("", "")
+            old_ipv6 = o.ipv6 if had_svi else ""
+            if old_ip != (v.ip, v.mask):
+                if old_ip[0]: body.append(f"    no ip address {old_ip[0]} {old_ip[1]}")
+                if v.ip: body.append(f"    ip address {v.ip} {v.mask}")
+            if old_ipv6 != v.ipv6:
+                if old_ipv6: body.append(f"    no ipv6 address {old_ipv6}")
+                if v.ipv6: body.append(f"    ipv6 address {v.ipv6}")
+            if body:
+                lines.append(f"interface vlan {vid}")
+                lines.extend(body)
+                lines.append("    exit")
+
+        # LAGs
+        old_lags = {i.lag_id for i in old_data["interfaces"].values() if i.lag_id}
+        new_lags = {i.lag_id for i in new_data["interfaces"].values() if i.lag_id}
+        for lag_id in sorted(new_lags - old_lags, key=lambda x: int(x)):
+            lines.extend(self._aruba_lag_lines(lag_id))
+        for lag_id in sorted(old_lags - new_lags, key=lambda x: int(x)):
+            removals.append(f"no interface lag {lag_id}")
+
+        # Physical Ports (เฉพาะพอร์ตที่เปลี่ยน)
+        old_ifaces, new_ifaces = old_data["interfaces"], new_data["interfaces"]
+        ports = [p for p in set(old_ifaces) | set(new_ifaces) if not p.startswith("lag")]
+        for port in sorted(ports, key=self._iface_sort_key):
+            body = self._aruba_interface_delta(old_ifaces.get(port), new_ifaces.get(port))
+            if body:
+                lines.append(f"interface {port}")
+                lines.extend(body)
+                lines.append("    exit")
+
+        # Routes
+        old_routes = [(r.dest, r.mask, r.next_hop) for r in old_data["routes"]]
+        new_routes = [(r.dest, r.mask, r.next_hop) for r in new_data["routes"]]
+        old_set, new_set = set(old_routes), set(new_routes)
+        for r in old_routes:
+            if r not in new_set: lines.append(f"no ip route {r[0]} {r[1]} {r[2]}")
+        for r in new_routes:
+            if r not in old_set: lines.append(f"ip route {r[0]} {r[1]} {r[2]}")
+
+        for vid in sorted(set(old_vlans) - set(new_vlans)):
+            removals.append(f"no vlan {vid}")
+        lines.extend(removals)
+
+        if not lines:
+            return "# No changes"
+        return "\n".join(["configure terminal"] + lines + ["end", "write memory"])
+
+    def _aruba_interface_delta(self, old, new):
+        """ คำสั่งที่ต้องใส่ใน interface block เพื่อเปลี่ยนจาก old -> new """
+        if new is None:
+            # พอร์ตหายไปจาก config ใหม่ (เช่นถอด member ออก) -> ปิดไว้ก่อน
+            return ["    shutdown"] if old is not None and not old.shutdown else []
+        if old is None:
+            body = ["    shutdown" if new.shutdown else "    no shutdown"]
+            if new.description: body.append(f"    description {new.description}")
+            return body + self._aruba_role_lines(new)
+
+        body = []
+        if old.shutdown != new.shutdown:
+            body.append("    shutdown" if new.shutdown else "    no shutdown")
+        if old.description != new.description:
+            body.append(f"    description {new.description}" if new.description else "    no description")
+
+        if old.role != new.role or old.lag_id != new.lag_id:
+            # เปลี่ยน role -> ถอดของเดิมออกก่อน แล้วใส่ของใหม่
+            if old.role == "lag_member":
+                body.append(f"    no lag {old.lag_id}")
+            elif old.role == "access":
+                body.append("    no vlan access")
+            elif old.role == "trunk":
+                old_allowed = _trunk_allowed(old)
+                if old_allowed: body.append(f"    no vlan trunk allowed {old_allowed}")
+                body.append("    no vlan trunk native")
+            return body + self._aruba_role_lines(new)
+
+        if new.role == "access" and old.access_vlan != new.access_vlan:
+            body.append(f"    vlan access {new.access_vlan}")
+        elif new.role == "trunk":
+            if old.native_vlan != new.native_vlan:
+                body.append(f"    vlan trunk native {new.native_vlan}")
+            old_allowed, new_allowed = _trunk_allowed(old), _trunk_allowed(new)
+            if old_allowed != new_allowed:
+                added, removed = new_allowed - old_allowed, old_allowed - new_allowed
+                if added: body.append(f"    vlan trunk allowed {added}")
+                if removed: body.append(f"    no vlan trunk allowed {removed}")
+        return body
\ No newline at end of file
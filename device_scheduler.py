@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+
+# ================= DEVICE OPERATION SCHEDULER =================
+# เดิมทุก endpoint แบบ bulk สร้าง ThreadPool ของตัวเอง (10-20 workers) -> 5 คนกด backup พร้อมกัน = 100 SSH session
+# ตอนนี้ทุกงานต่ออุปกรณ์เข้าคิวกลางตัวเดียวของ process:
+# - max_concurrent: จำนวนงานที่รันพร้อมกันทั้ง server (เกินนี้รอในคิว)
+# - per_user / per_profile: โควต้าต่อผู้ใช้ / ต่อ profile (กัน profile ใหญ่กินโควต้าของผู้ใช้จนหมด)
+# - คิวแยกต่อผู้ใช้ + วนแบบ round-robin -> คนที่สั่ง 1,000 เครื่องไม่ทำให้คนที่สั่ง 5 เครื่องต้องรอจนจบ
+#
+# - weight: งานที่ดูแลหลายอุปกรณ์ในครั้งเดียว (ก้อนของ ssh_async) กินโควต้าเท่าจำนวนอุปกรณ์ (ไม่เกิน max_weight())
+#   ก้อนที่มีหลาย profile ส่ง profile เป็น {profile: จำนวนอุปกรณ์} -> โควต้าต่อ profile นับแยกกัน
+# - lane: งานที่ไปรันต่อใน pool ที่มีที่จำกัด (ก้อนของ ssh_async = 1 worker process) -> set_lane(name, slots)
+#   งานใน lane ได้สิทธิ์เมื่อ lane ยังว่างเท่านั้น -> running = session ที่รันอยู่จริง ไม่รวมก้อนที่รอคิวใน pool
+#
+#   future = scheduler.submit(task_backup, device, user='alice', profile=device.get('profile_id'))
+#   for result in scheduler.map(task_backup, devices, user='alice'): ...
+
+
+class _Job:
+    __slots__ = ("future", "fn", "args", "user", "profiles", "weight", "lane")
+
+    def __init__(self, future, fn, args, user, profiles, weight, lane):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.user = user
+        self.profiles = profiles    # {profile: จำนวนอุปกรณ์}
+        self.weight = weight
+        self.lane = lane
+
+
+class DeviceScheduler:
+    def __init__(self, max_concurrent=40, per_user=20, per_profile=20):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.per_profile = per_profile
+
+        self._queues = OrderedDict()   # user -> deque[_Job] (ลำดับ = คิว round-robin ของผู้ใช้)
+        self._running = 0
+        self._running_user = {}
+        self._running_profile = {}
+        self._lanes = {}               # lane -> จำนวนงานที่รันพร้อมกันได้
+        self._running_lane = {}
+        self._lock = threading.Lock()
+        # ไม่เคยส่งงานเกิน max_concurrent -> executor ไม่มีคิวของตัวเอง
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="device-op")
+
+        self.completed = 0
+
+    # ---------- Public ----------
+    def submit(self, fn, *args, user=None, profile=None, weight=1, lane=None):
+        """ เข้าคิว -> คืน Future (ใช้กับ as_completed ได้เหมือน executor.submit)
+            weight = จำนวนอุปกรณ์ที่งานนี้ดูแล (ต้องไม่เกิน max_weight() ไม่งั้นไม่มีวันได้รัน)
+            profile = profile เดียว หรือ {profile: จำนวนอุปกรณ์} (แต่ละ profile ไม่เกิน per_profile)
+            lane = ชื่อ lane ที่ set_lane() ไว้แล้ว (None = ไม่จำกัดจำนวนงาน) """
+        if not 1 <= weight <= self.max_weight():
+            raise ValueError(f"weight must be 1-{self.max_weight()}")
+        if lane is not None and lane not in self._lanes:
+            raise ValueError(f"unknown lane {lane!r}")
+        profiles = profile if isinstance(profile, dict) else {profile: weight}
+        profiles = {p: n for p, n in profiles.items() if p is not None}
+        if any(n > self.per_profile for n in profiles.values()):
+            raise ValueError(f"at most {self.per_profile} devices per profile")
+        future = Future()
+        with self._lock:
+            self._queues.setdefault(user, deque()).append(_Job(future, fn, args, user, profiles, weight, lane))
+        self._dispatch()
+        return future
+
+    def map(self, fn, devices, *args, user=None):
+        """ รัน fn(device, *args) ทุกเครื่อง -> yield ผลตามลำดับที่เสร็จ (profile = device['profile_id']) """
+        futures = [self.submit(fn, dev, *args, user=user, profile=dev.get('profile_id')) for dev in devices]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def set_lane(self, name, slots):
+        """ งานใน lane นี้รันพร้อมกันได้ไม่เกิน slots งาน (เช่น = จำนวน worker ของ pool ที่งานส่งต่อไป) """
+        with self._lock:
+            self._lanes[name] = max(1, slots)
+        self._dispatch()
+
+    def max_weight(self):
+        """ อุปกรณ์ต่องานได้มากสุดเท่าโควต้ารวม / ต่อผู้ใช้ (profile เดียวได้ไม่เกิน per_profile) """
+        return max(1, min(self.max_concurrent, self.per_user))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": sum(job.weight for q in self._queues.values() for job in q),
+                "max_concurrent": self.max_concurrent,
+                "users": {str(u): {"running": self._running_user.get(u, 0), "queued": sum(job.weight for job in q)}
+                          for u, q in self._queues.items()},
+                "lanes": {name: {"running": self._running_lane.get(name, 0), "slots": slots}
+                          for name, slots in self._lanes.items()},
+                "completed": self.completed,
+            }
+
+    # ---------- Internal ----------
+    def _pick(self):
+        """ (ถือ lock อยู่) งานถัดไปแบบ round-robin ตามผู้ใช้ที่ยังไม่เต็มโควต้า """
+        for _ in range(len(self._queues)):
+            user, queue = next(iter(self._queues.items()))
+            self._queues.move_to_end(user)    # คนถัดไปได้สิทธิ์ก่อนในรอบหน้า
+
+            free = min(self.max_concurrent - self._running, self.per_user - self._running_user.get(user, 0))
+            for job in queue:
+                if job.weight > free: continue
+                if job.lane is not None and self._running_lane.get(job.lane, 0) >= self._lanes[job.lane]: continue
+                if all(self._running_profile.get(p, 0) + n <= self.per_profile for p, n in job.profiles.items()):
+                    queue.remove(job)
+                    if not queue: del self._queues[user]
+                    return job
+        return None
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            while self._running < self.max_concurrent:
+                job = self._pick()
+                if job is None: break
+                if not job.future.set_running_or_notify_cancel(): continue   # ถูกยกเลิกระหว่างรอคิว
+                self._running += job.weight
+                self._running_user[job.user] = self._running_user.get(job.user, 0) + job.weight
+                for p, n in job.profiles.items():
+                    self._running_profile[p] = self._running_profile.get(p, 0) + n
+                if job.lane is not None:
+                    self._running_lane[job.lane] = self._running_lane.get(job.lane, 0) + 1
+                started.append(job)
+
+        for job in started:
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job.fn(*job.args)
+        except BaseException as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+        finally:
+            with self._lock:
+                self._running -= job.weight
+                self.completed += job.weight
+                self._release(self._running_user, job.user, job.weight)
+                for p, n in job.profiles.items():
+                    self._release(self._running_profile, p, n)
+                if job.lane is not None:
+                    self._release(self._running_lane, job.lane, 1)
+            self._dispatch()
+
+    @staticmethod
+    def _release(counts, key, n):
+        counts[key] -= n
+        if not counts[key]: del counts[key]
@@ -0,0 +1,158 @@
+import os
+import socket
+import datetime as dt
+from bson.objectid import ObjectId
+
+
+# ================= BACKGROUND JOBS =================
+# run_backup / run_command / push_config เดิมถือ HTTP request ไว้จนทุกเครื่องเสร็จ -> หลักร้อยเครื่องเกิน timeout ของ proxy/gunicorn
+# ตอนนี้ endpoint คืน job_id ทันที แล้วรันงานใน background task ของ socketio
+# - ผลของแต่ละเครื่องบันทึกลง db.job_results ทันทีที่เสร็จ (ไม่หายแม้ client หลุด)
+# - db.jobs เก็บสถานะรวม (queued -> running -> done/failed) + ตัวนับ done/success/failed
+# - progress ส่งผ่าน socketio เข้า room = job_id ('job_progress', 'job_done')
+# - poll ได้ที่ GET /api/jobs/<job_id>
+# - process ที่รัน job ต่ออายุ updated_at ของ job ทุก heartbeat วินาที (worker = host:pid)
+#   job ค้าง queued/running แต่ updated_at เก่ากว่า 3 heartbeat = process ตาย/restart ระหว่างงาน -> 'interrupted'
+#   (ดูจาก DB ไม่ใช่ memory ของ process -> poll จาก gunicorn worker ตัวไหนก็ได้ผลเดียวกัน)
+#
+#   job_id = jobs.start('backup', current_user, len(devices), lambda: run_on_devices_iter(...))
+
+
+class JobManager:
+    def __init__(self, db, socketio, ttl_days=30, heartbeat=15):
+        self.jobs = db['jobs']
+        self.results = db['job_results']
+        self.socketio = socketio
+        self.ttl_seconds = ttl_days * 86400
+        self.heartbeat = heartbeat
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._active = set()       # job ที่รันอยู่ใน process นี้ (ต่ออายุ heartbeat ให้)
+        self._heartbeat_started = False
+        self._index_ready = False
+
+    def _ensure_index(self):
+        if self._index_ready: return
+        self.results.create_index([("job_id", 1), ("seq", 1)])
+        # ลบ job เก่าอัตโนมัติ (TTL)
+        self.jobs.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        self.results.create_index("finished_at", expireAfterSeconds=self.ttl_seconds)
+        self._index_ready = True
+
+    # ---------- Public ----------
+    def start(self, kind, owner, total, produce, meta=None):
+        """ produce(): generator ของผลลัพธ์ทีละเครื่อง (dict ที่มี host/status) -> คืน job_id ทันที """
+        self._ensure_index()
+        now = dt.datetime.now()
+        doc = {
+            'kind': kind,
+            'owner': owner,
+            'status': 'queued',
+            'total': total,
+            'done': 0,
+            'success': 0,
+            'failed': 0,
+            'meta': meta or {},
+            'worker': self.worker,
+            'created_at': now,
+            'updated_at': now,
+        }
+        self.jobs.insert_one(doc)
+        job_id = str(doc['_id'])
+        self._active.add(job_id)
+        self._start_heartbeat()
+        self.socketio.start_background_task(self._run, job_id, produce)
+        return job_id
+
+    def get(self, job_id, owner, with_results=True, since=0):
+        """ สถานะ job + ผลของแต่ละเครื่อง (since = seq ที่มีแล้ว -> ส่งเฉพาะผลใหม่) """
+        if not ObjectId.is_valid(job_id): return None
+        job = self.jobs.find_one({'_id': ObjectId(job_id), 'owner': owner})
+        if not job: return None
+
+        job = self._public(job)
+        if with_results:
+            job['results'] = [
+                dict(r['result'], seq=r['seq'])
+                for r in self.results.find({'job_id': job_id, 'seq': {'$gte': since}}).sort('seq', 1)
+            ]
+        return job
+
+    def list(self, owner, limit=20):
+        return [self._public(j) for j in self.jobs.find({'owner': owner}).sort('created_at', -1).limit(limit)]
+
+    # ---------- Internal ----------
+    def _public(self, job):
+        job['job_id'] = str(job.pop('_id'))
+        # สถานะค้างเป็น running แต่ heartbeat หยุดไปแล้ว (process ที่รันตาย / server restart ระหว่างงาน)
+        stale = dt.datetime.now() - dt.timedelta(seconds=self.heartbeat * 3)
+        if job['status'] in ('queued', 'running') and job['updated_at'] < stale:
+            job['status'] = 'interrupted'
+        job['percent'] = self._percent(job)
+        return job
+
+    @staticmethod
+    def _percent(job):
+        return 100 if not job['total'] else int(job['done'] * 100 / job['total'])
+
+    def _progress(self, job):
+        return {
+            'job_id': str(job['_id']),
+            'status': job['status'],
+            'total': job['total'],
+            'done': job['done'],
+            'success': job['success'],
+            'failed': job['failed'],
+            'percent': self._percent(job),
+        }
+
+    def _start_heartbeat(self):
+        if self._heartbeat_started: return
+        self._heartbeat_started = True
+        self.socketio.start_background_task(self._heartbeat_loop)
+
+    def _heartbeat_loop(self):
+        # ต่ออายุทุก job ที่ process นี้รันอยู่ (งานที่รอ SSH นานๆ ไม่ถูกมองว่าตาย)
+        while True:
+            self.socketio.sleep(self.heartbeat)
+            if not self._active: continue
+            try:
+                self.jobs.update_many({'_id': {'$in': [ObjectId(j) for j in list(self._active)]}},
+                                      {'$set': {'updated_at': dt.datetime.now()}})
+            except Exception as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    def _run(self, job_id, produce):
+        oid = ObjectId(job_id)
+        self.jobs.update_one({'_id': oid}, {'$set': {'status': 'running', 'started_at': dt.datetime.now(),
+                                                      'updated_at': dt.datetime.now()}})
+        status, error = 'done', None
+        try:
+            for seq, result in enumerate(produce()):
+                self._record(job_id, oid, seq, result)
+        except Exception as e:
+            status, error = 'failed', str(e)
+            print(f"❌ Job {job_id} failed: {e}")
+        finally:
+            job = self.jobs.find_one_and_update(
+                {'_id': oid},
+                {'$set': {'status': status, 'error': error, 'finished_at': dt.datetime.now(),
+                          'updated_at': dt.datetime.now()}},
+                return_document=True    # = ReturnDocument.AFTER
+            )
+            self._active.discard(job_id)
+            if job:
+                self.socketio.emit('job_done', self._progress(job), to=job_id)
+
+    def _record(self, job_id, oid, seq, result):
+        ok = str(result.get('status', '')).lower() == 'success'
+        now = dt.datetime.now()
+        self.results.insert_one({'job_id': job_id, 'seq': seq, 'host': result.get('host'),
+                                 'status': result.get('status'), 'result': result, 'finished_at': now})
+        job = self.jobs.find_one_and_update(
+            {'_id': oid},
+            {'$inc': {'done': 1, 'success': int(ok), 'failed': int(not ok)}, '$set': {'updated_at': now}},
+            return_document=True    # = ReturnDocument.AFTER
+        )
+        progress = self._progress(job)
+        progress['last'] = dict(result, seq=seq)
+        self.socketio.emit('job_progress', progress, to=job_id)
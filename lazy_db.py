@@ -0,0 +1,78 @@
+import threading
+
+
+# ================= LAZY MONGO CONNECTION =================
+# เดิม MongoClient ถูกสร้างตอน import app.py (รวม DNS lookup ของ mongodb+srv) -> worker start ช้า
+# ตอนนี้สร้าง client ตอนมีการใช้งาน collection ครั้งแรกเท่านั้น
+#   db.devices.find_one(...)   -> ต่อ Mongo ตอนเรียก find_one ครั้งแรก
+#   db['conversion_cache']     -> คืน proxy ทันที ยังไม่ต่อ Mongo
+
+
+class LazyCollection:
+    """ Proxy ของ Collection: resolve ตัวจริงเมื่อมีการเรียก method ครั้งแรก """
+    __slots__ = ("_database", "_name", "_collection")
+
+    def __init__(self, database, name):
+        self._database = database
+        self._name = name
+        self._collection = None
+
+    def _get(self):
+        if self._collection is None:
+            self._collection = self._database.connect()[self._name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._get(), attr)
+
+
+class LazyDatabase:
+    def __init__(self, uri, name, timeout_ms=5000):
+        self.uri = uri
+        self.name = name
+        self.timeout_ms = timeout_ms
+        self._client = None
+        self._db = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self._collections = {}
+
+    def connect(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    # import ตรงนี้เพื่อไม่ให้ pymongo/certifi ถูกโหลดตอน start
+                    from pymongo import MongoClient
+                    import certifi
+                    self._client = MongoClient(self.uri, tlsCAFile=certifi.where(),
+                                               serverSelectionTimeoutMS=self.timeout_ms)
+                    self._db = self._client[self.name]
+                    print("✅ MongoDB client created (lazy)")
+        return self._db
+
+    def ready(self, force=False):
+        """ Readiness check: ping Mongo (จำผลสำเร็จไว้ ยกเว้น force=True) """
+        if self._ready and not force:
+            return True
+        try:
+            self.connect()
+            self._client.admin.command('ping')
+            self._ready = True
+        except Exception as e:
+            print(f"❌ MongoDB Connection Error: {e}")
+            self._ready = False
+        return self._ready
+
+    def collection(self, name):
+        coll = self._collections.get(name)
+        if coll is None:
+            coll = self._collections[name] = LazyCollection(self, name)
+        return coll
+
+    def __getitem__(self, name):
+        return self.collection(name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.collection(name)
@@ -0,0 +1,221 @@
+import re
+import time
+
+
+# ================= SESSION LOG INDEXER =================
+# Log ที่ผู้ใช้อัปโหลดมักเป็น terminal recording ทั้ง session (banner, display interface brief, display arp ...)
+# ไม่ใช่แค่ output ของ display current-configuration
+# - ล้าง pager / ANSI / backspace ในรอบเดียว (ถ้าไม่มีเลยจะไม่ copy ข้อความ)
+# - หา prompt (<SW1>, [SW1], SW1#) แล้วเก็บ output ของแต่ละคำสั่งเป็นช่วง offset (start, end) ไม่ตัด string
+#   log = SessionLog(text)
+#   sec = log.find("display current-configuration")   # รองรับคำย่อ เช่น "dis cur"
+#   index_stanzas(log.text, sec.start, sec.end)
+# - deadline (ค่าของ time.thread_time()): เกินแล้วหยุดล้าง/หา prompt -> budget_offset = ตำแหน่งที่หยุด (ผลเป็น partial)
+
+# Comware: "  ---- More ----" ตามด้วย ESC[16D + ช่องว่าง + ESC[16D (ลบข้อความ pager บนจอ)
+# Cisco:   " --More-- " ตามด้วย backspace + ช่องว่าง + backspace
+# ช่องว่าง/ขีดหน้า More เริ่ม match ได้เฉพาะต้นช่วง (lookbehind) -> ช่องว่างหรือขีดยาวๆ ไม่ถูกสแกนซ้ำจากทุกตำแหน่ง (linear)
+_ARTIFACT_RE = re.compile(
+    r"(?<![ ])[ ]*(?<!-)-{2,}[ ]?More[ ]?-{2,}(?:\x1b\[\d+D[ ]*\x1b\[\d+D|[ ]*\x08+[ ]*\x08+)?"
+    r"|\x1b\[[0-9;?]*[A-Za-z]"     # ANSI escape อื่นๆ
+    r"|[\x08\x07\x00]"             # backspace / bell / null ที่เหลือ
+    r"|\r(?!\n)"                   # carriage return เดี่ยว (ไม่ใช่ \r\n)
+)
+
+_ARTIFACT_HINTS = ("More", "\x1b", "\x08", "\x07", "\x00")
+_BUDGET_CHECK_MATCHES = 256   # เช็คเวลาทุกๆ N match (artifact / prompt)
+
+# <SW1>cmd  [SW1-GigabitEthernet1/0/1]cmd  SW1#cmd  SW1>cmd
+_PROMPT_RE = re.compile(
+    r"^[ \t]*(?:<(?P<cw>[^<>\s]+)>|\[(?P<sv>[^\[\]\s]+)\]|(?P<ios>[A-Za-z0-9][\w.\-()/:]*)[#>])[ \t]*(?P<cmd>[^\r\n]*)",
+    re.M
+)
+
+# คำสั่งที่ให้ output เป็น running config ของแต่ละ platform
+CONFIG_COMMANDS = {
+    "hp_comware": ("display current-configuration",),
+    "cisco_ios": ("show running-config",),
+}
+_ALL_CONFIG_COMMANDS = ("display current-configuration", "show running-config")
+
+
+def clean_session_text(text, deadline=None):
+    """ ลบ pager / ANSI / backspace ในรอบเดียว -> คืน object เดิมถ้าไม่มีอะไรต้องลบ """
+    return _clean(text, deadline)[0]
+
+
+def _clean(text, deadline=None):
+    """ คืน (text ที่ล้างแล้ว, offset ที่หยุดเพราะเกิน deadline หรือ None)
+        หยุดกลางทาง -> ส่วนที่เหลือคงไว้ตามเดิม (offset หลังจุดนั้นยังตรงกับ text ที่คืน) """
+    # เช็คด้วย str scan ก่อน (เร็วกว่า regex หลายเท่า) -> log ส่วนใหญ่ไม่มี artifact เลย
+    if not any(c in text for c in _ARTIFACT_HINTS) and text.count("\r") == text.count("\r\n"):
+        return text, None
+    if deadline is None:
+        return _ARTIFACT_RE.sub("", text), None
+
+    parts = []
+    last = 0
+    size = 0
+    for count, m in enumerate(_ARTIFACT_RE.finditer(text), 1):
+        parts.append(text[last:m.start()])
+        size += m.start() - last
+        last = m.end()
+        if count % _BUDGET_CHECK_MATCHES == 0 and time.thread_time() > deadline:
+            parts.append(text[last:])
+            return "".join(parts), size
+    parts.append(text[last:])
+    return "".join(parts), None
+
+
+def command_matches(typed, full):
+    """ 'dis cur' ตรงกับ 'display current-configuration' (ทุกคำต้องเป็น prefix ของคำเต็ม, ตัด | ... ทิ้ง) """
+    words = typed.split("|", 1)[0].split()
+    target = full.split()
+    if len(words) != len(target): return False
+    return all(t.startswith(w.lower()) for w, t in zip(words, target))
+
+
+class Section:
+    __slots__ = ("command", "prompt", "start", "end")
+
+    def __init__(self, command, prompt, start, end):
+        self.command = command    # คำสั่งตามที่พิมพ์ (เช่น 'dis cur')
+        self.prompt = prompt      # hostname ใน prompt
+        self.start = start        # offset ต้นบรรทัดแรกของ output
+        self.end = end            # offset ของ prompt ถัดไป (หรือท้ายไฟล์)
+
+    def __repr__(self):
+        return f"Section({self.command!r}, {self.start}, {self.end})"
+
+
+class SessionLog:
+    def __init__(self, text, deadline=None):
+        self.deadline = deadline
+        self.text, self.budget_offset = _clean(text, deadline)
+        self.sections = self._index() if self.budget_offset is None else []
+
+    def _index(self):
+        sections = []
+        host = None
+        current = None
+        text = self.text
+        deadline = self.deadline
+
+        for count, m in enumerate(_PROMPT_RE.finditer(text), 1):
+            if deadline is not None and count % _BUDGET_CHECK_MATCHES == 0 and time.thread_time() > deadline:
+                self.budget_offset = m.start()
+                break
+            # SW1(config-if)# -> SW1
+            name = (m.group("cw") or m.group("sv") or m.group("ios")).split("(", 1)[0]
+            # prompt แรกกำหนด hostname -> บรรทัดที่หน้าตาคล้าย prompt แต่ชื่อไม่ตรงจะไม่ถูกนับ
+            # ([SW1-GigabitEthernet1/0/1] ของ system view นับเป็น host เดียวกัน)
+            if host is None:
+                if m.group("ios") and not m.group("cmd"): continue
+                host = name
+            elif name != host and not name.startswith(host + "-"):
+                continue
+
+            if current is not None:
+                current.end = m.start()
+            nl = text.find("\n", m.end())
+            start = len(text) if nl < 0 else nl + 1
+            current = Section(m.group("cmd").strip(), host, start, len(text))
+            if current.command:
+                sections.append(current)
+
+        return sections
+
+    def find(self, *commands):
+        """ Section แรกที่คำสั่งตรงกับ commands ตัวใดตัวหนึ่ง (รองรับคำย่อ) """
+        for sec in self.sections:
+            for full in commands:
+                if command_matches(sec.command, full):
+                    return sec
+        return None
+
+    def span(self, section):
+        return self.text[section.start:section.end]
+
+    def config_span(self, source_type=None):
+        """ (start, end) ของ running config
+            - มี prompt: ใช้ output ของคำสั่ง display current-configuration / show running-config
+            - ไม่มี prompt (paste config ตรงๆ): ตัดหลังหัวคำสั่งถ้ามี ไม่งั้นใช้ทั้งก้อน """
+        commands = CONFIG_COMMANDS.get(source_type, _ALL_CONFIG_COMMANDS)
+        sec = self.find(*commands) or self.find(*_ALL_CONFIG_COMMANDS)
+        if sec is not None:
+            return sec.start, sec.end
+
+        for header in _ALL_CONFIG_COMMANDS:
+            pos = self.text.find(header)
+            if pos >= 0:
+                return pos + len(header), len(self.text)
+        return 0, len(self.text)
+
+
+# ================= OPERATIONAL TABLES =================
+# output ที่อยู่ใน log อยู่แล้ว -> ใช้เติมข้อมูลสถานะพอร์ตโดยไม่ต้อง SSH เพิ่ม
+# คืน (ชื่อ interface ตามอุปกรณ์, link, speed, pvid) ทีละแถว; link ปรับเป็น 'UP' | 'DOWN' | 'ADM'
+
+INTERFACE_TABLE_COMMANDS = {
+    "hp_comware": "display interface brief",
+    "cisco_ios": "show interfaces status",
+}
+
+_LINK_STATES = {
+    # Comware
+    "UP": "UP", "DOWN": "DOWN", "ADM": "ADM", "STBY": "DOWN",
+    # Cisco
+    "CONNECTED": "UP", "NOTCONNECT": "DOWN", "DISABLED": "ADM",
+    "ERR-DISABLED": "DOWN", "INACTIVE": "DOWN", "SFPABSENT": "DOWN", "MONITORING": "UP",
+}
+
+
+def _pvid(value):
+    return int(value) if value.isdigit() else None
+
+
+def parse_comware_interface_brief(text, start=0, end=None):
+    """ ตาราง bridge mode ของ display interface brief:
+        Interface  Link Speed   Duplex Type PVID Description
+        GE1/0/1    UP   100M(a) F(a)   A    61 """
+    cols = None
+    for line in text[start:end].split("\n"):
+        parts = line.split()
+        if not parts:
+            cols = None    # บรรทัดว่าง = จบตาราง
+            continue
+        if parts[0] == "Interface" and "Link" in parts:
+            # ตาราง route mode (Main IP) ไม่มี PVID -> ข้าม
+            cols = {name: i for i, name in enumerate(parts)} if "PVID" in parts else None
+            continue
+        if cols is None or len(parts) <= cols["PVID"]: continue
+
+        link = _LINK_STATES.get(parts[cols["Link"]].upper())
+        if link is None: continue
+        speed = parts[cols["Speed"]] if "Speed" in cols else ""
+        yield parts[0], link, "" if speed == "--" else speed, _pvid(parts[cols["PVID"]])
+
+
+def parse_cisco_interface_status(text, start=0, end=None):
+    """ show interfaces status (คอลัมน์ Name มีช่องว่างได้ -> ตัดตามตำแหน่งหัว Status):
+        Port      Name               Status       Vlan       Duplex  Speed Type
+        Gi1/0/1   desk-01            connected    10         a-full a-1000 10/100/1000BaseTX """
+    status_at = None
+    for line in text[start:end].split("\n"):
+        if line.startswith("Port ") and "Status" in line and "Vlan" in line:
+            status_at = line.index("Status")
+            continue
+        if status_at is None or not line.strip(): continue
+
+        port = line.split(None, 1)[0]
+        rest = line[status_at:].split()
+        if len(rest) < 4: continue
+        link = _LINK_STATES.get(rest[0].upper())
+        if link is None: continue
+        yield port, link, rest[3], _pvid(rest[1])
+
+
+INTERFACE_TABLE_PARSERS = {
+    "hp_comware": parse_comware_interface_brief,
+    "cisco_ios": parse_cisco_interface_status,
+}
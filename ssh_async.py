@@ -0,0 +1,244 @@
+import os
+import re
+import time
+from concurrent.futures import as_completed
+
+from worker_pool import shared_pool
+
+
+# ================= ASYNC SSH ENGINE (asyncssh) =================
+# งานทั้ง fleet (backup / command / push config) แบบ thread pool ได้แค่ 20 อุปกรณ์พร้อมกัน และกิน thread stack ต่อตัว
+# engine นี้ใช้ asyncio + asyncssh: 1 session = 1 coroutine -> เปิดได้หลักร้อย-พันพร้อมกันด้วย memory คงที่ต่อ session
+# - loop ของ asyncio รันใน process แยก (spawn) -> ไม่ชนกับ eventlet.monkey_patch() ของ app
+#   (green socket/selectors ใช้กับ asyncio ใน process เดียวกันไม่ได้) ฝั่ง app รอผลผ่าน ProcessPoolExecutor เหมือน batch_convert
+# - แบ่งอุปกรณ์เป็นก้อนละ max_in_flight ต่อ worker -> memory ถูกจำกัดทั้งจำนวน session และผลลัพธ์ที่ค้างอยู่
+# - handshake/login พร้อมกันจำกัดแยก (SSH_ASYNC_MAX_CONNECTING) ส่วน session ที่รอ output อยู่แทบไม่กิน CPU
+# - ผลลัพธ์รูปแบบเดียวกับ task_send_command / task_push_config ใน app.py
+#
+#   jobs = [make_job('command', driver, hostname, 'display version'), ...]
+#   for index, result in run_fleet(jobs): ...
+
+MAX_IN_FLIGHT = int(os.getenv('SSH_ASYNC_MAX_IN_FLIGHT', '500'))
+MAX_CONNECTING = int(os.getenv('SSH_ASYNC_MAX_CONNECTING', '32'))
+CONNECT_TIMEOUT = int(os.getenv('SSH_ASYNC_CONNECT_TIMEOUT', '15'))
+
+_READ_TIMEOUTS = {'backup': 90, 'command': 30, 'config': 30}
+
+# (ชนิดอุปกรณ์ (substring), ปิด pager, เข้า config mode, ออก config mode) เทียบแบบเดียวกับ get_backup_command
+_PLATFORMS = (
+    ("hp_comware", "screen-length disable", "system-view", "return"),
+    ("huawei", "screen-length 0 temporary", "system-view", "return"),
+    ("cisco", "terminal length 0", "configure terminal", "end"),
+    ("aruba", "no page", "configure terminal", "end"),
+    ("juniper", "set cli screen-length 0", "configure", "exit configuration-mode"),
+)
+_DEFAULT_PLATFORM = ("", "terminal length 0", "configure terminal", "end")
+
+# prompt ท้าย buffer: <SW1>  [SW1-GigabitEthernet1/0/1]  SW1#  SW1(config)#  SW1>
+_PROMPT_TAIL_RE = re.compile(r"(?:^|\n)[ \t]*(<[^<>\s]+>|\[[^\[\]\s]+\]|[A-Za-z0-9][\w.\-()/:@]*[#>$])[ \t]*$")
+_PASSWORD_RE = re.compile(r"[Pp]assword:\s*$")
+
+
+def _platform(device_type):
+    dtype = (device_type or "").lower()
+    for entry in _PLATFORMS:
+        if entry[0] in dtype:
+            return entry
+    return _DEFAULT_PLATFORM
+
+
+def make_job(op, driver, hostname, payload):
+    """ op: 'backup' | 'command' (payload = คำสั่ง หรือ list ของคำสั่ง) หรือ 'config' (payload = list ของบรรทัด config) """
+    return {
+        'op': op,
+        'hostname': hostname,
+        'host': driver['host'],
+        'port': int(driver.get('port', 22)),
+        'username': driver['username'],
+        'password': driver['password'],
+        'secret': driver.get('secret', ''),
+        'device_type': driver['device_type'],
+        'payload': payload,
+    }
+
+
+# ---------- Interactive shell ----------
+class _Shell:
+    """ อ่าน/เขียน shell ของอุปกรณ์แบบเดียวกับ netmiko: ส่งคำสั่ง -> อ่านจนเจอ prompt -> ตัด echo กับ prompt ออก """
+
+    def __init__(self, proc, job):
+        self.proc = proc
+        self.job = job
+        self.base = None       # hostname จาก prompt แรก (กัน output ที่หน้าตาเหมือน prompt)
+        self.prompt = ""
+
+    async def _read_until(self, timeout, password=False, nudge=None):
+        """ อ่านจนเจอ prompt; nudge = ถ้าเงียบเกินกี่วินาทีให้กด Enter หนึ่งครั้ง (อุปกรณ์บางรุ่นรอ Enter ก่อนแสดง prompt) """
+        import asyncio
+        parts = []
+        tail = ""
+        deadline = time.monotonic() + timeout
+        while True:
+            if password and _PASSWORD_RE.search(tail):
+                return "".join(parts)
+            m = _PROMPT_TAIL_RE.search(tail)
+            if m and self._is_prompt(m.group(1)):
+                self.prompt = m.group(1)
+                text = "".join(parts)
+                return text[:len(text) - (len(tail) - m.start())]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"no prompt after {timeout}s")
+            try:
+                chunk = await asyncio.wait_for(self.proc.stdout.read(65536), min(remaining, nudge or remaining))
+            except asyncio.TimeoutError:
+                if nudge is None: raise TimeoutError(f"no prompt after {timeout}s")
+                self.proc.stdin.write("\n")
+                nudge = None
+                continue
+            if not chunk:
+                raise ConnectionError("session closed by device")
+            chunk = chunk.replace("\r", "")
+            parts.append(chunk)
+            # ดูแค่ท้าย buffer (บรรทัดสุดท้าย) ไม่ต้อง scan output ทั้งก้อนซ้ำทุกรอบ
+            tail = (tail + chunk)[-512:]
+
+    def _is_prompt(self, token):
+        name = token.strip("<>[]#>$").split("(", 1)[0]
+        if self.base is None:
+            return True
+        return name == self.base or name.startswith(self.base + "-")
+
+    async def open(self):
+        # ไม่กด Enter ทันที: prompt ที่เกินมาหนึ่งตัวจะทำให้ output ของทุกคำสั่งเลื่อนไปหนึ่งจังหวะ
+        await self._read_until(CONNECT_TIMEOUT, nudge=3)
+        self.base = self.prompt.strip("<>[]#>$").split("(", 1)[0]
+
+        # Cisco user mode (SW1>) + มี secret -> enable ก่อน
+        if self.job['secret'] and self.prompt.endswith(">") and not self.prompt.startswith("<"):
+            self.proc.stdin.write("enable\n")
+            await self._read_until(CONNECT_TIMEOUT, password=True)
+            self.proc.stdin.write(self.job['secret'] + "\n")
+            await self._read_until(CONNECT_TIMEOUT)
+
+    async def send(self, command, timeout):
+        self.proc.stdin.write(command + "\n")
+        output = await self._read_until(timeout)
+        # บรรทัดแรก = echo ของคำสั่งที่พิมพ์
+        first, _, rest = output.partition("\n")
+        if command.strip() and command.strip() in first:
+            output = rest
+        return output.rstrip("\n")
+
+
+async def _run_job(job, connecting):
+    import asyncssh
+
+    _, pager, config_enter, config_exit = _platform(job['device_type'])
+    timeout = _READ_TIMEOUTS[job['op']]
+    t_start = time.perf_counter()
+
+    # handshake + auth กิน CPU ทั้งสองฝั่ง -> จำกัดจำนวนที่กำลัง login พร้อมกันแยกจากจำนวน session
+    # (ถ้าปล่อยหลักร้อยพร้อมกัน handshake จะแย่ง CPU กันจนหลุด connect_timeout)
+    async with connecting:
+        conn = await asyncssh.connect(
+            job['host'], port=job['port'], username=job['username'], password=job['password'],
+            known_hosts=None, connect_timeout=CONNECT_TIMEOUT, login_timeout=CONNECT_TIMEOUT,
+        )
+    async with conn:
+        proc = await conn.create_process(term_type="vt100", term_size=(511, 24))
+        try:
+            shell = _Shell(proc, job)
+            await shell.open()
+            await shell.send(pager, timeout)
+
+            if isinstance(job['payload'], list) and job['op'] == 'command':
+                return await _run_commands(shell, job, timeout, t_start)
+            if job['op'] != 'config':
+                return {'host': job['hostname'], 'status': 'Success', 'output': await shell.send(job['payload'], timeout)}
+
+            # transcript แบบ send_config_set: prompt + คำสั่ง + output ทุกบรรทัด
+            log = []
+            for line in [config_enter] + list(job['payload']) + [config_exit]:
+                prompt = shell.prompt
+                out = await shell.send(line, timeout)
+                log.append(f"{prompt}{line}\n{out}" if out else f"{prompt}{line}")
+            if "cisco" in job['device_type']:
+                await shell.send("write memory", timeout)
+            return {'host': job['hostname'], 'status': 'Success', 'log': "\n".join(log)}
+        finally:
+            proc.close()
+
+
+async def _run_commands(shell, job, timeout, t_start):
+    """ หลายคำสั่งบน session เดียว -> รูปแบบเดียวกับ task_send_commands ใน app.py """
+    connect_ms = round((time.perf_counter() - t_start) * 1000, 2)
+    results = []
+    error = None
+    for cmd in job['payload']:
+        t0 = time.perf_counter()
+        try:
+            output = await shell.send(cmd, timeout)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            results.append({'command': cmd, 'status': 'Failed', 'error': error,
+                            'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2)})
+            break
+        results.append({'command': cmd, 'status': 'Success', 'output': output,
+                        'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2)})
+
+    results.extend({'command': cmd, 'status': 'Skipped'} for cmd in job['payload'][len(results):])
+    result = {
+        'host': job['hostname'],
+        'status': 'Success' if error is None else 'Failed',
+        'commands': results,
+        'connect_ms': connect_ms,
+        'total_ms': round((time.perf_counter() - t_start) * 1000, 2),
+    }
+    if error is not None:
+        result['error'] = error
+    return result
+
+
+async def _run_chunk(jobs, offset):
+    import asyncio
+    connecting = asyncio.Semaphore(MAX_CONNECTING)
+
+    async def one(i, job):
+        try:
+            return i, await _run_job(job, connecting)
+        except Exception as e:
+            return i, {'host': job['hostname'], 'status': 'Failed', 'error': str(e) or type(e).__name__}
+
+    return await asyncio.gather(*(one(offset + i, job) for i, job in enumerate(jobs)))
+
+
+def run_chunk(jobs, offset=0):
+    """ Worker: รันทุก job ในก้อนพร้อมกันบน event loop เดียว -> [(index, result)] """
+    import asyncio
+    return asyncio.run(_run_chunk(jobs, offset))
+
+
+# ---------- ฝั่ง app ----------
+def get_pool(workers=None):
+    """ workers = ขนาด default ถ้าไม่ได้ตั้ง SSH_ASYNC_WORKERS (มีผลเฉพาะครั้งแรกที่สร้าง pool) """
+    return shared_pool('SSH_ASYNC_WORKERS', workers or 1)
+
+
+def run_fleet(jobs, max_in_flight=None, workers=None):
+    """ yield (index ใน jobs, result) ทีละก้อนที่เสร็จ -> ผู้เรียนบันทึกผลได้เลยไม่ต้องรอทั้ง fleet """
+    size = max(1, max_in_flight or MAX_IN_FLIGHT)
+    pool = get_pool(workers)
+    futures = {
+        pool.submit(run_chunk, jobs[i:i + size], i): i
+        for i in range(0, len(jobs), size)
+    }
+    for future in as_completed(futures):
+        start = futures[future]
+        try:
+            yield from future.result()
+        except Exception as e:
+            # worker ตาย / ไม่มี asyncssh -> ทุกอุปกรณ์ในก้อนนั้น Failed
+            for i, job in enumerate(jobs[start:start + size]):
+                yield start + i, {'host': job['hostname'], 'status': 'Failed', 'error': f"Worker Exception: {e}"}
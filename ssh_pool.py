@@ -0,0 +1,215 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+
+# ================= SSH SESSION POOL =================
+# เดิมทุกคำสั่งเปิด SSH ใหม่ (handshake + auth + banner 2-5 วินาทีบน Comware รุ่นเก่า) แล้ว disconnect ทันที
+# ตอนนี้เก็บ session ที่ใช้เสร็จไว้ใน pool ตาม key ของอุปกรณ์ -> คำสั่งถัดไปใช้ session เดิมที่ยังอุ่นอยู่
+# - key = host/port/username/device_type + hash ของ password/secret (เปลี่ยนรหัส = session ใหม่)
+# - idle_timeout: session ที่ว่างนานเกินจะถูกปิดโดย reaper thread
+# - keepalive: ส่ง SSH keepalive (paramiko transport) กันอุปกรณ์/firewall ตัด session ที่ว่าง
+# - health check (is_alive) ก่อนหยิบ session ที่ว่างมานานกว่า health_check_after วินาทีมาใช้
+# - max_per_device: จำกัดจำนวน session พร้อมกันต่ออุปกรณ์ (VTY มีจำกัด), max_total: ทั้ง pool
+#
+#   with ssh_pool.session(driver) as conn:
+#       conn.send_command("display version")
+
+
+class PooledSession:
+    __slots__ = ("conn", "key", "created", "last_used")
+
+    def __init__(self, conn, key):
+        self.conn = conn
+        self.key = key
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+
+class SSHPool:
+    def __init__(self, connect, idle_timeout=300, keepalive=30, max_per_device=2, max_total=100,
+                 acquire_timeout=60, health_check_after=5):
+        self.connect = connect                  # callable(driver) -> netmiko connection
+        self.idle_timeout = idle_timeout        # 0 = ไม่เก็บ session ไว้ใช้ซ้ำ (ปิดทันทีหลังใช้)
+        self.keepalive = keepalive
+        self.max_per_device = max_per_device
+        self.max_total = max_total
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+
+        self._idle = {}          # key -> [PooledSession] (ตัวท้ายสุด = ใช้ล่าสุด)
+        self._open = {}          # key -> จำนวน session ที่เปิดอยู่ (ทั้งว่างและกำลังใช้)
+        self._total = 0
+        self._cond = threading.Condition()
+        self._reaper = None
+
+        self.created = 0
+        self.reused = 0
+        self.closed = 0
+        self.health_failures = 0
+
+    @staticmethod
+    def make_key(driver):
+        secret = hashlib.sha256(
+            f"{driver.get('password', '')}\0{driver.get('secret', '')}".encode("utf-8")
+        ).hexdigest()[:16]
+        return (driver['host'], int(driver.get('port', 22)), driver.get('username'), driver.get('device_type'), secret)
+
+    # ---------- Public ----------
+    @contextmanager
+    def session(self, driver):
+        """ ยืม session จาก pool (หรือเปิดใหม่) ถ้าโค้ดข้างในพังด้วย exception -> ปิด session ทิ้ง ไม่คืนเข้า pool """
+        pooled = self.acquire(driver)
+        try:
+            yield pooled.conn
+        except BaseException:
+            self.release(pooled, broken=True)
+            raise
+        else:
+            self.release(pooled)
+
+    def acquire(self, driver):
+        key = self.make_key(driver)
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            to_close = []
+            pooled = None
+            create = False
+            with self._cond:
+                idle = self._idle.get(key)
+                if idle:
+                    pooled = idle.pop()
+                elif self._open.get(key, 0) < self.max_per_device:
+                    if self._total >= self.max_total:
+                        victim = self._pop_oldest_idle()
+                        if victim is not None: to_close.append(victim)
+                    if self._total < self.max_total or to_close:
+                        self._open[key] = self._open.get(key, 0) + 1
+                        self._total += 1
+                        create = True
+
+                if pooled is None and not create:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"SSH pool: no free session for {driver['host']} "
+                                           f"(max {self.max_per_device} per device)")
+                    self._cond.wait(remaining)
+                    continue
+
+            for victim in to_close:
+                self._close(victim)
+
+            if create:
+                try:
+                    conn = self.connect(dict(driver, keepalive=self.keepalive))
+                except BaseException:
+                    self._forget(key)
+                    raise
+                self._start_reaper()
+                with self._cond:
+                    self.created += 1
+                return PooledSession(conn, key)
+
+            # session ที่ว่างมานาน -> เช็คก่อนว่ายังใช้ได้ (อุปกรณ์อาจตัดไปแล้ว)
+            if time.monotonic() - pooled.last_used > self.health_check_after and not self._is_alive(pooled):
+                with self._cond:
+                    self.health_failures += 1
+                self._close(pooled)
+                continue
+
+            with self._cond:
+                self.reused += 1
+            return pooled
+
+    def release(self, pooled, broken=False):
+        if broken or self.idle_timeout <= 0:
+            self._close(pooled)
+            return
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.setdefault(pooled.key, []).append(pooled)
+            self._cond.notify_all()
+
+    def close_host(self, host):
+        """ ปิด session ที่ว่างอยู่ทั้งหมดของ host (เช่น แก้ไข/ลบอุปกรณ์) """
+        with self._cond:
+            victims = []
+            for key in [k for k in self._idle if k[0] == host]:
+                victims.extend(self._idle.pop(key))
+        for pooled in victims:
+            self._close(pooled)
+
+    def close_all(self):
+        with self._cond:
+            victims = [p for idle in self._idle.values() for p in idle]
+            self._idle.clear()
+        for pooled in victims:
+            self._close(pooled)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "open": self._total,
+                "idle": sum(len(v) for v in self._idle.values()),
+                "devices": len([k for k, n in self._open.items() if n]),
+                "created": self.created,
+                "reused": self.reused,
+                "closed": self.closed,
+                "health_failures": self.health_failures,
+            }
+
+    # ---------- Internal ----------
+    def _is_alive(self, pooled):
+        try:
+            return bool(pooled.conn.is_alive())
+        except Exception:
+            return False
+
+    def _pop_oldest_idle(self):
+        """ (ถือ lock อยู่) ดึง session ว่างที่ไม่ได้ใช้นานที่สุดออกจาก pool เพื่อเปิดที่ให้ตัวใหม่ """
+        oldest_key, oldest = None, None
+        for key, idle in self._idle.items():
+            if idle and (oldest is None or idle[0].last_used < oldest.last_used):
+                oldest_key, oldest = key, idle[0]
+        if oldest is not None:
+            self._idle[oldest_key].pop(0)
+        return oldest
+
+    def _forget(self, key):
+        with self._cond:
+            self._open[key] -= 1
+            if not self._open[key]: del self._open[key]
+            self._total -= 1
+            self._cond.notify_all()
+
+    def _close(self, pooled):
+        try:
+            pooled.conn.disconnect()
+        except Exception:
+            pass
+        with self._cond:
+            self.closed += 1
+        self._forget(pooled.key)
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0: return
+        with self._cond:
+            if self._reaper is not None: return
+            self._reaper = threading.Thread(target=self._reap_loop, name="ssh-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1, min(self.idle_timeout, self.keepalive or self.idle_timeout) / 2)
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._cond:
+                victims = []
+                for key, idle in self._idle.items():
+                    keep = [p for p in idle if now - p.last_used <= self.idle_timeout]
+                    victims.extend(p for p in idle if now - p.last_used > self.idle_timeout)
+                    idle[:] = keep
+            for pooled in victims:
+                self._close(pooled)
@@ -0,0 +1,57 @@
+import os
+import sys
+import types
+import atexit
+import threading
+import multiprocessing
+from multiprocessing.context import SpawnProcess
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ================= PROCESS POOL (spawn, main ว่าง) =================
+# spawn จะ import __main__ ของ parent ซ้ำใน worker ทุกตัว -> ตอนรัน `python app.py` worker จะรัน app.py ทั้งไฟล์อีกรอบ
+# (eventlet.monkey_patch, SocketIO, SSH pool, atexit ของ writer/pool) ทั้งที่ worker ต้องการแค่ converter / asyncssh
+# ตรงนี้ให้ worker เริ่มจาก module main เปล่า (ไม่มี __file__ / __spec__ -> spawn ไม่ import อะไรเป็น __mp_main__)
+# ฟังก์ชันที่ส่งเข้า pool ต้องอยู่ใน module ปกติ (batch_convert.convert_one, ssh_async.run_chunk) ไม่ใช่ใน app.py
+#
+#   pool = spawn_pool(4)
+#   pool.submit(batch_convert.convert_one, ...)
+#   pool = shared_pool('BATCH_CONVERT_WORKERS', 4)    # pool ตัวเดียวทั้ง process สร้างตอนใช้ครั้งแรก
+
+_main_lock = threading.Lock()
+_worker_main = types.ModuleType('__mp_main__')
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class _WorkerProcess(SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        # สลับ __main__ เฉพาะช่วงที่สร้าง process (spawn อ่าน __main__ ตอนเตรียม preparation data)
+        with _main_lock:
+            main = sys.modules['__main__']
+            sys.modules['__main__'] = _worker_main
+            try:
+                return SpawnProcess._Popen(process_obj)
+            finally:
+                sys.modules['__main__'] = main
+
+
+class _WorkerContext(type(multiprocessing.get_context('spawn'))):
+    Process = _WorkerProcess
+
+
+def spawn_pool(workers):
+    """ ProcessPoolExecutor แบบ spawn ที่ worker ไม่ import __main__ ของ app + ปิด pool ตอนปิด server """
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=_WorkerContext())
+    atexit.register(pool.shutdown, wait=True, cancel_futures=True)
+    return pool
+
+
+def shared_pool(env, default):
+    """ pool ตัวเดียวต่อ env (สร้างตอนเรียกครั้งแรก) ขนาด = ค่าใน env ถ้าตั้งไว้ ไม่งั้น default """
+    with _pools_lock:   # หลาย request เรียกครั้งแรกพร้อมกัน -> สร้าง pool ตัวเดียว
+        pool = _pools.get(env)
+        if pool is None:
+            pool = _pools[env] = spawn_pool(int(os.getenv(env, '0')) or default)
+    return pool